@@ -1,7 +1,3 @@
-try:
-    import ujson as json
-except ImportError:
-    import json
 import warnings
 
 from contextlib import contextmanager
@@ -9,6 +5,7 @@ from gevent.local import local
 from urllib.parse import quote
 
 from disco.api.http import Routes, HTTPClient
+from disco.gateway.encoding import ENCODERS, JSONEncoder
 from disco.types.integration import UserConnection
 from disco.util.functional import optional
 from disco.util.logging import LoggingClass
@@ -65,7 +62,13 @@ class APIClient(LoggingClass):
         super(APIClient, self).__init__()
 
         self.client = client
-        self.http = HTTPClient(token, self._after_requests)
+
+        # Share the gateway's JSON backend, ETF is gateway-only
+        encoder = ENCODERS.get(client.config.encoder) if client else None
+        if not encoder or encoder.TYPE != 'json':
+            encoder = JSONEncoder
+
+        self.http = HTTPClient(token, self._after_requests, encoder)
         self.token = token
 
         self._captures = local()
@@ -92,20 +95,20 @@ class APIClient(LoggingClass):
             delattr(self._captures, 'responses')
 
     def gateway_get(self):
-        data = self.http(Routes.GATEWAY_GET).json()
+        data = self.http.json(self.http(Routes.GATEWAY_GET))
         return data
 
     def gateway_bot_get(self):
-        data = self.http(Routes.GATEWAY_BOT_GET).json()
+        data = self.http.json(self.http(Routes.GATEWAY_BOT_GET))
         return data
 
     def oauth2_applications_me_get(self):
         r = self.http(Routes.OAUTH2_APPLICATIONS_ME_GET)
-        return Application.create(self.client, r.json())
+        return Application.create(self.client, self.http.json(r))
 
     def channels_get(self, channel):
         r = self.http(Routes.CHANNELS_GET, dict(channel=channel))
-        data = r.json()
+        data = self.http.json(r)
         if 'member' in data:
             return Thread.create(self.client, data)
         return Channel.create(self.client, data)
@@ -116,14 +119,14 @@ class APIClient(LoggingClass):
             dict(channel=channel),
             json=kwargs,
             headers=_reason_header(reason))
-        return Channel.create(self.client, r.json())
+        return Channel.create(self.client, self.http.json(r))
 
     def channels_delete(self, channel, reason=None):
         r = self.http(
             Routes.CHANNELS_DELETE,
             dict(channel=channel),
             headers=_reason_header(reason))
-        return Channel.create(self.client, r.json())
+        return Channel.create(self.client, self.http.json(r))
 
     def channels_typing(self, channel):
         self.http(Routes.CHANNELS_TYPING, dict(channel=channel))
@@ -136,11 +139,11 @@ class APIClient(LoggingClass):
             limit=limit,
         ))
 
-        return Message.create_map(self.client, r.json())
+        return Message.create_map(self.client, self.http.json(r))
 
     def channels_messages_get(self, channel, message):
         r = self.http(Routes.CHANNELS_MESSAGES_GET, dict(channel=channel, message=message))
-        return Message.create(self.client, r.json())
+        return Message.create(self.client, self.http.json(r))
 
     def channels_messages_create(
             self,
@@ -222,7 +225,7 @@ class APIClient(LoggingClass):
             r = self.http(
                 Routes.CHANNELS_MESSAGES_CREATE,
                 dict(channel=channel),
-                data={'payload_json': json.dumps(payload)},
+                data={'payload_json': self.http.encoder.encode(payload)},
                 files=files,
             )
         else:
@@ -231,7 +234,7 @@ class APIClient(LoggingClass):
         # Catch API failures
         # TODO: long-term solution at higher level
         if r:
-            return Message.create(self.client, r.json())
+            return Message.create(self.client, self.http.json(r))
         else:
             return self.log.error(f'Failed to send message in channel {channel}')
 
@@ -268,7 +271,7 @@ class APIClient(LoggingClass):
         r = self.http(Routes.CHANNELS_MESSAGES_MODIFY,
                       dict(channel=channel, message=message),
                       json=payload)
-        return Message.create(self.client, r.json())
+        return Message.create(self.client, self.http.json(r))
 
     def channels_messages_delete(self, channel, message):
         self.http(Routes.CHANNELS_MESSAGES_DELETE, dict(channel=channel, message=message))
@@ -281,7 +284,7 @@ class APIClient(LoggingClass):
             Routes.CHANNELS_MESSAGES_REACTIONS_GET,
             dict(channel=channel, message=message, emoji=emoji),
             params={'after': after, 'limit': limit})
-        return User.create_map(self.client, r.json())
+        return User.create_map(self.client, self.http.json(r))
 
     def channels_messages_reactions_create(self, channel, message, emoji):
         self.http(Routes.CHANNELS_MESSAGES_REACTIONS_CREATE, dict(channel=channel, message=message, emoji=emoji))
@@ -320,7 +323,7 @@ class APIClient(LoggingClass):
 
     def channels_invites_list(self, channel):
         r = self.http(Routes.CHANNELS_INVITES_LIST, dict(channel=channel))
-        return Invite.create_map(self.client, r.json())
+        return Invite.create_map(self.client, self.http.json(r))
 
     def channels_invites_create(self, channel, max_age=86400, max_uses=0, temporary=False, unique=False,
                                 target_type=None, target_user_id=None, target_application_id=None, reason=None):
@@ -341,11 +344,11 @@ class APIClient(LoggingClass):
 
         r = self.http(Routes.CHANNELS_INVITES_CREATE, dict(channel=channel), json=payload,
                       headers=_reason_header(reason))
-        return Invite.create(self.client, r.json())
+        return Invite.create(self.client, self.http.json(r))
 
     def channels_pins_list(self, channel):
         r = self.http(Routes.CHANNELS_PINS_LIST, dict(channel=channel))
-        return Message.create_map(self.client, r.json())
+        return Message.create_map(self.client, self.http.json(r))
 
     def channels_pins_create(self, channel, message):
         self.http(Routes.CHANNELS_PINS_CREATE, dict(channel=channel, message=message))
@@ -358,11 +361,11 @@ class APIClient(LoggingClass):
             name=name,
             avatar=avatar,
         ))
-        return Webhook.create(self.client, r.json())
+        return Webhook.create(self.client, self.http.json(r))
 
     def channels_webhooks_list(self, channel):
         r = self.http(Routes.CHANNELS_WEBHOOKS_LIST, dict(channel=channel))
-        return Webhook.create_map(self.client, r.json())
+        return Webhook.create_map(self.client, self.http.json(r))
 
     def channels_forums_threads_create(
             self,
@@ -456,7 +459,7 @@ class APIClient(LoggingClass):
             r = self.http(
                 Routes.CHANNELS_THREAD_CREATE,
                 dict(channel=channel),
-                data={'payload_json': json.dumps(payload)},
+                data={'payload_json': self.http.encoder.encode(payload)},
                 files=files,
                 headers=_reason_header(reason)
             )
@@ -466,7 +469,7 @@ class APIClient(LoggingClass):
         # Catch API failures
         # TODO: long-term solution at higher level
         if r:
-            return Channel.create(self.client, r.json())
+            return Channel.create(self.client, self.http.json(r))
         else:
             return self.log.error(f'Failed to create forum thread in channel {channel}')
 
@@ -500,13 +503,13 @@ class APIClient(LoggingClass):
     #         r = self.http(
     #             Routes.CHANNELS_MESSAGES_CREATE,
     #             dict(channel=channel),
-    #             data={'payload_json': json.dumps(payload)},
+    #             data={'payload_json': self.http.encoder.encode(payload)},
     #             files=files,
     #         )
-    #         return Channel.create(self.client, r.json())
+    #         return Channel.create(self.client, self.http.json(r))
     #
     #     r = self.http(Routes.CHANNELS_THREAD_CREATE, dict(channel=channel), json=payload, headers=_reason_header(reason))
-    #     return Channel.create(self.client, r.json())
+    #     return Channel.create(self.client, self.http.json(r))
 
     def channels_messages_threads_create(self, channel, message, name, auto_archive_duration=None, rate_limit_per_user=None, reason=None):
         payload = {
@@ -519,7 +522,7 @@ class APIClient(LoggingClass):
         ))
 
         r = self.http(Routes.CHANNELS_MESSAGES_THREAD_CREATE, dict(channel=channel, message=message), json=payload, headers=_reason_header(reason))
-        return Channel.create(self.client, r.json())
+        return Channel.create(self.client, self.http.json(r))
 
     def channels_threads_create(self, channel, name, auto_archive_duration=None,
                                 invitable=None, rate_limit_per_user=None, thread_type=None, reason=None):
@@ -536,7 +539,7 @@ class APIClient(LoggingClass):
         ))
 
         r = self.http(Routes.CHANNELS_THREAD_CREATE, dict(channel=channel), json=payload, headers=_reason_header(reason))
-        return Channel.create(self.client, r.json())
+        return Channel.create(self.client, self.http.json(r))
 
     def channels_threads_list_archived(self, channel, before=None, limit=50, public=True):
         """
@@ -555,7 +558,7 @@ class APIClient(LoggingClass):
             limit=limit,
         ))
 
-        return Channel.create_map(self.client, r.json()['threads']), ThreadMember.create_map(self.client, r.json()['members']), r.json()['has_more']
+        return Channel.create_map(self.client, self.http.json(r)['threads']), ThreadMember.create_map(self.client, self.http.json(r)['members']), self.http.json(r)['has_more']
 
     def channels_threads_join(self, channel):
         self.http(Routes.CHANNELS_THREAD_JOIN, dict(channel=channel))
@@ -571,19 +574,19 @@ class APIClient(LoggingClass):
 
     def channels_threads_member_get(self, channel, member):
         r = self.http(Routes.CHANNELS_THREAD_MEMBERS_GET, dict(channel=channel, member=member))
-        return ThreadMember.create(self.client, r.json())
+        return ThreadMember.create(self.client, self.http.json(r))
 
     def channels_threads_members_list(self, channel):
         r = self.http(Routes.CHANNELS_THREAD_MEMBERS_LIST, dict(channel=channel))
-        return ThreadMember.create_map(self.client, r.json())
+        return ThreadMember.create_map(self.client, self.http.json(r))
 
     def guilds_get(self, guild):
         r = self.http(Routes.GUILDS_GET, dict(guild=guild))
-        return Guild.create(self.client, r.json())
+        return Guild.create(self.client, self.http.json(r))
 
     def guilds_modify(self, guild, reason=None, **kwargs):
         r = self.http(Routes.GUILDS_MODIFY, dict(guild=guild), json=kwargs, headers=_reason_header(reason))
-        return Guild.create(self.client, r.json())
+        return Guild.create(self.client, self.http.json(r))
 
     def guilds_delete(self, guild):
         self.http(Routes.GUILDS_DELETE, dict(guild=guild))
@@ -614,11 +617,11 @@ class APIClient(LoggingClass):
         ))
 
         r = self.http(Routes.GUILDS_CREATE, json=payload)
-        return Guild.create(self.client, r.json())
+        return Guild.create(self.client, self.http.json(r))
 
     def guilds_channels_list(self, guild):
         r = self.http(Routes.GUILDS_CHANNELS_LIST, dict(guild=guild))
-        return Channel.create_hash(self.client, 'id', r.json(), guild_id=guild)
+        return Channel.create_hash(self.client, 'id', self.http.json(r), guild_id=guild)
 
     def guilds_channels_create(
             self,
@@ -652,7 +655,7 @@ class APIClient(LoggingClass):
             dict(guild=guild),
             json=payload,
             headers=_reason_header(reason))
-        return Channel.create(self.client, r.json(), guild_id=guild)
+        return Channel.create(self.client, self.http.json(r), guild_id=guild)
 
     def guilds_channels_modify(self, guild, channel, position, reason=None):
         self.http(Routes.GUILDS_CHANNELS_MODIFY, dict(guild=guild), json={
@@ -665,11 +668,11 @@ class APIClient(LoggingClass):
             limit=limit,
             after=after,
         ))
-        return GuildMember.create_hash(self.client, 'id', r.json(), guild_id=guild)
+        return GuildMember.create_hash(self.client, 'id', self.http.json(r), guild_id=guild)
 
     def guilds_members_get(self, guild, member):
         r = self.http(Routes.GUILDS_MEMBERS_GET, dict(guild=guild, member=member))
-        return GuildMember.create(self.client, r.json(), guild_id=guild)
+        return GuildMember.create(self.client, self.http.json(r), guild_id=guild)
 
     def guilds_members_modify(self, guild, member, reason=None, **kwargs):
         self.http(
@@ -712,11 +715,11 @@ class APIClient(LoggingClass):
 
     def guilds_bans_list(self, guild):
         r = self.http(Routes.GUILDS_BANS_LIST, dict(guild=guild))
-        return GuildBan.create_hash(self.client, 'user.id', r.json())
+        return GuildBan.create_hash(self.client, 'user.id', self.http.json(r))
 
     def guilds_bans_get(self, guild, user):
         r = self.http(Routes.GUILDS_BANS_GET, dict(guild=guild, user=user))
-        return GuildBan.create(self.client, r.json())
+        return GuildBan.create(self.client, self.http.json(r))
 
     def guilds_bans_create(self, guild, user, delete_message_days=0, reason=None):
         self.http(Routes.GUILDS_BANS_CREATE, dict(guild=guild, user=user), json={
@@ -732,18 +735,18 @@ class APIClient(LoggingClass):
 
     def guilds_prune_count_get(self, guild, days=None):
         r = self.http(Routes.GUILDS_PRUNE_COUNT, dict(guild=guild), params=optional(days=days))
-        return PruneCount.create(self.client, r.json())
+        return PruneCount.create(self.client, self.http.json(r))
 
     def guilds_prune_create(self, guild, days=None, compute_prune_count=None):
         r = self.http(Routes.GUILDS_PRUNE_CREATE, dict(guild=guild), params=optional(
             days=days,
             compute_prune_count=compute_prune_count,
         ))
-        return PruneCount.create(self.client, r.json())
+        return PruneCount.create(self.client, self.http.json(r))
 
     def guilds_roles_list(self, guild):
         r = self.http(Routes.GUILDS_ROLES_LIST, dict(guild=guild))
-        return Role.create_map(self.client, r.json(), guild_id=guild)
+        return Role.create_map(self.client, self.http.json(r), guild_id=guild)
 
     def guilds_roles_create(
             self,
@@ -766,11 +769,11 @@ class APIClient(LoggingClass):
                 mentionable=mentionable,
             ),
             headers=_reason_header(reason))
-        return Role.create(self.client, r.json(), guild_id=guild)
+        return Role.create(self.client, self.http.json(r), guild_id=guild)
 
     def guilds_roles_modify_batch(self, guild, roles, reason=None):
         r = self.http(Routes.GUILDS_ROLES_BATCH_MODIFY, dict(guild=guild), json=roles, headers=_reason_header(reason))
-        return Role.create_map(self.client, r.json(), guild_id=guild)
+        return Role.create_map(self.client, self.http.json(r), guild_id=guild)
 
     def guilds_roles_modify(
             self,
@@ -796,26 +799,26 @@ class APIClient(LoggingClass):
                 mentionable=mentionable,
             ),
             headers=_reason_header(reason))
-        return Role.create(self.client, r.json(), guild_id=guild)
+        return Role.create(self.client, self.http.json(r), guild_id=guild)
 
     def guilds_roles_delete(self, guild, role, reason=None):
         self.http(Routes.GUILDS_ROLES_DELETE, dict(guild=guild, role=role), headers=_reason_header(reason))
 
     def guilds_voice_regions_list(self, guild):
         r = self.http(Routes.GUILDS_VOICE_REGIONS_LIST, dict(guild=guild))
-        return VoiceRegion.create_hash(self.client, 'id', r.json())
+        return VoiceRegion.create_hash(self.client, 'id', self.http.json(r))
 
     def guilds_invites_list(self, guild):
         r = self.http(Routes.GUILDS_INVITES_LIST, dict(guild=guild))
-        return Invite.create_map(self.client, r.json())
+        return Invite.create_map(self.client, self.http.json(r))
 
     def guilds_integrations_list(self, guild):
         r = self.http(Routes.GUILDS_INTEGRATIONS_LIST, dict(guild=guild))
-        return Integration.create_map(self.client, r.json())
+        return Integration.create_map(self.client, self.http.json(r))
 
     def guilds_integrations_create(self, guild, type, id):
         r = self.http(Routes.GUILDS_INTEGRATIONS_CREATE, dict(guild=guild), json={"type": type, "id": id})
-        return Integration.create(self.client, r.json())
+        return Integration.create(self.client, self.http.json(r))
 
     def guilds_integrations_modify(
             self,
@@ -842,11 +845,11 @@ class APIClient(LoggingClass):
 
     def guilds_vanity_url_get(self, guild):
         r = self.http(Routes.GUILDS_VANITY_URL_GET, dict(guild=guild))
-        return Invite.create(self.client, r.json())
+        return Invite.create(self.client, self.http.json(r))
 
     def guilds_widget_settings_get(self, guild):
         r = self.http(Routes.GUILDS_WIDGET_SETTINGS_GET, dict(guild=guild))
-        return GuildWidgetSettings.create(self.client, r.json())
+        return GuildWidgetSettings.create(self.client, self.http.json(r))
 
     def guilds_widget_modify(self, guild, reason=None, **kwargs):
         r = self.http(
@@ -854,19 +857,19 @@ class APIClient(LoggingClass):
             dict(guild=guild),
             json=kwargs,
             headers=_reason_header(reason))
-        return GuildWidgetSettings.create(self.client, r.json())
+        return GuildWidgetSettings.create(self.client, self.http.json(r))
 
     def guilds_webhooks_list(self, guild):
         r = self.http(Routes.GUILDS_WEBHOOKS_LIST, dict(guild=guild))
-        return Webhook.create_map(self.client, r.json())
+        return Webhook.create_map(self.client, self.http.json(r))
 
     def guilds_emojis_get(self, guild, emoji):
         r = self.http(Routes.GUILDS_EMOJIS_GET, dict(guild=guild, emoji=emoji))
-        return GuildEmoji.create(self.client, r.json())
+        return GuildEmoji.create(self.client, self.http.json(r))
 
     def guilds_emojis_list(self, guild):
         r = self.http(Routes.GUILDS_EMOJIS_LIST, dict(guild=guild))
-        return GuildEmoji.create_map(self.client, r.json())
+        return GuildEmoji.create_map(self.client, self.http.json(r))
 
     def guilds_emojis_create(self, guild, reason=None, **kwargs):
         r = self.http(
@@ -874,7 +877,7 @@ class APIClient(LoggingClass):
             dict(guild=guild),
             json=kwargs,
             headers=_reason_header(reason))
-        return GuildEmoji.create(self.client, r.json(), guild_id=guild)
+        return GuildEmoji.create(self.client, self.http.json(r), guild_id=guild)
 
     def guilds_emojis_modify(self, guild, emoji, reason=None, **kwargs):
         r = self.http(
@@ -882,7 +885,7 @@ class APIClient(LoggingClass):
             dict(guild=guild, emoji=emoji),
             json=kwargs,
             headers=_reason_header(reason))
-        return GuildEmoji.create(self.client, r.json(), guild_id=guild)
+        return GuildEmoji.create(self.client, self.http.json(r), guild_id=guild)
 
     def guilds_emojis_delete(self, guild, emoji, reason=None):
         self.http(
@@ -892,7 +895,7 @@ class APIClient(LoggingClass):
 
     def guilds_preview_get(self, guild):
         r = self.http(Routes.GUILDS_PREVIEW_GET, dict(guild=guild))
-        return GuildPreview.create(self.client, r.json())
+        return GuildPreview.create(self.client, self.http.json(r))
 
     def guilds_auditlogs_list(self, guild, before=None, user_id=None, action_type=None, limit=50):
         r = self.http(Routes.GUILDS_AUDIT_LOGS_LIST, dict(guild=guild), params=optional(
@@ -902,27 +905,27 @@ class APIClient(LoggingClass):
             limit=limit,
         ))
 
-        data = r.json()
+        data = self.http.json(r)
 
         users = User.create_hash(self.client, 'id', data['users'])
         webhooks = Webhook.create_hash(self.client, 'id', data['webhooks'])
-        return AuditLogEntry.create_map(self.client, r.json()['audit_log_entries'], users, webhooks, guild_id=guild)
+        return AuditLogEntry.create_map(self.client, self.http.json(r)['audit_log_entries'], users, webhooks, guild_id=guild)
 
     def guilds_discovery_requirements(self, guild):
         r = self.http(Routes.GUILDS_DISCOVERY_REQUIREMENTS_GET, dict(guild=guild))
-        return DiscoveryRequirements.create(self.client, r.json())
+        return DiscoveryRequirements.create(self.client, self.http.json(r))
 
     def guilds_scheduled_events_get(self, guild, with_user_count=False):
         r = self.http(Routes.GUILDS_EVENTS_GET, dict(guild=guild), params=optional(
             with_user_count=with_user_count
         ))
-        return GuildScheduledEvent.create_map(self.client, r.json())
+        return GuildScheduledEvent.create_map(self.client, self.http.json(r))
 
     def guilds_scheduled_event_get(self, guild, event, with_user_count=False):
         r = self.http(Routes.GUILDS_EVENTS_GET, dict(guild=guild, event=event), params=optional(
             with_user_count=with_user_count
         ))
-        return GuildScheduledEvent.create(self.client, r.json())
+        return GuildScheduledEvent.create(self.client, self.http.json(r))
 
     def guilds_scheduled_event_create(self, guild, name, privacy_level, scheduled_start_time, entity_type, channel=None,
                                       entity_metadata=None, scheduled_end_time=None, description=None, image=None, reason=None):
@@ -937,7 +940,7 @@ class APIClient(LoggingClass):
             entity_type=entity_type,
             image=image
         ), headers=_reason_header(reason))
-        GuildScheduledEvent.create(self.client, r.json())
+        GuildScheduledEvent.create(self.client, self.http.json(r))
 
     def guilds_scheduled_event_modify(self, guild, event, channel=None, entity_metadata=None,
                                       name=None, privacy_level=None, scheduled_start_time=None, scheduled_end_time=None,
@@ -959,7 +962,7 @@ class APIClient(LoggingClass):
         ))
 
         r = self.http(Routes.GUILDS_EVENTS_MODIFY, dict(guild=guild, event=event), json=payload, headers=_reason_header(reason))
-        GuildScheduledEvent.create(self.client, r.json())
+        GuildScheduledEvent.create(self.client, self.http.json(r))
 
     def guilds_scheduled_event_users_get(self, guild, event, limit=100, with_member=False, before=None, after=None):
         r = self.http(Routes.GUILDS_EVENT_USERS_GET, dict(guild=guild, event=event), params=optional(
@@ -968,18 +971,18 @@ class APIClient(LoggingClass):
             before=before,
             after=after,
         ))
-        return GuildScheduledEventUserObject.create_map(self.client, r.json())
+        return GuildScheduledEventUserObject.create_map(self.client, self.http.json(r))
 
     def guilds_scheduled_event_delete(self, guild, event):
         return self.http(Routes.GUILDS_EVENTS_DELETE, dict(guild=guild, event=event))
 
     def guilds_automoderation_rules_get(self, guild):
         r = self.http(Routes.GUILDS_AUTOMODERATION_RULES_GET, dict(guild=guild))
-        return AutoModerationRule.create_map(self.client, r.json())
+        return AutoModerationRule.create_map(self.client, self.http.json(r))
 
     def guilds_automoderation_rule_get(self, guild, rule):
         r = self.http(Routes.GUILDS_AUTOMODERATION_RULE_GET, dict(guild=guild, rule=rule))
-        return AutoModerationRule.create(self.client, r.json())
+        return AutoModerationRule.create(self.client, self.http.json(r))
 
     def guilds_automoderation_rule_create(self, guild, name, event_type, trigger_type, trigger_metadata, actions,
                                           exempt_roles=None, exempt_channels=None, enabled=False, reason=None):
@@ -993,7 +996,7 @@ class APIClient(LoggingClass):
             exempt_channels=exempt_channels,
             enabled=enabled,
         ), headers=_reason_header(reason))
-        return AutoModerationRule.create(self.client, r.json())
+        return AutoModerationRule.create(self.client, self.http.json(r))
 
     def guilds_automoderation_rules_modify(self, guild, rule, name=None, event_type=None, trigger_type=None,
                                            trigger_metadata=None, actions=None, exempt_roles=None, exempt_channels=None, enabled=False, reason=None):
@@ -1007,26 +1010,26 @@ class APIClient(LoggingClass):
             exempt_channels=exempt_channels,
             enabled=enabled,
         ), headers=_reason_header(reason))
-        return AutoModerationRule.create(self.client, r.json())
+        return AutoModerationRule.create(self.client, self.http.json(r))
 
     def guilds_automoderation_rules_delete(self, guild, rule, reason=None):
         return self.http(Routes.GUILDS_AUTOMODERATION_RULES_DELETE, dict(guild=guild, rule=rule), headers=_reason_header(reason))
 
     def users_get(self, user):
         r = self.http(Routes.USERS_GET, dict(user=user))
-        return User.create(self.client, r.json())
+        return User.create(self.client, self.http.json(r))
 
     def users_me_get(self):
         r = self.http(Routes.USERS_ME_GET)
-        return User.create(self.client, r.json())
+        return User.create(self.client, self.http.json(r))
 
     def users_me_modify(self, payload):
         r = self.http(Routes.USERS_ME_MODIFY, json=payload)
-        return User.create(self.client, r.json())
+        return User.create(self.client, self.http.json(r))
 
     def users_me_guilds_list(self):
         r = self.http(Routes.USERS_ME_GUILDS_LIST)
-        return Guild.create_hash(self.client, 'id', r.json())
+        return Guild.create_hash(self.client, 'id', self.http.json(r))
 
     def users_me_guilds_delete(self, guild):
         self.http(Routes.USERS_ME_GUILDS_DELETE, dict(guild=guild))
@@ -1035,48 +1038,48 @@ class APIClient(LoggingClass):
         r = self.http(Routes.USERS_ME_DMS_CREATE, json={
             'recipient_id': recipient_id,
         })
-        return Channel.create(self.client, r.json())
+        return Channel.create(self.client, self.http.json(r))
 
     def users_me_connections_list(self):
         r = self.http(Routes.USERS_ME_CONNECTIONS_LIST)
-        return UserConnection.create_map(self.client, r.json())
+        return UserConnection.create_map(self.client, self.http.json(r))
 
     def invites_get(self, invite, with_counts=None):
         r = self.http(Routes.INVITES_GET, dict(invite=invite), params=optional(with_counts=with_counts))
-        return Invite.create(self.client, r.json())
+        return Invite.create(self.client, self.http.json(r))
 
     def invites_delete(self, invite, reason=None):
         r = self.http(Routes.INVITES_DELETE, dict(invite=invite), headers=_reason_header(reason))
-        return Invite.create(self.client, r.json())
+        return Invite.create(self.client, self.http.json(r))
 
     def voice_regions_list(self):
         r = self.http(Routes.VOICE_REGIONS_LIST)
-        return VoiceRegion.create_hash(self.client, 'id', r.json())
+        return VoiceRegion.create_hash(self.client, 'id', self.http.json(r))
 
     def webhooks_get(self, webhook):
         r = self.http(Routes.WEBHOOKS_GET, dict(webhook=webhook))
-        return Webhook.create(self.client, r.json())
+        return Webhook.create(self.client, self.http.json(r))
 
     def webhooks_modify(self, webhook, name=None, avatar=None, reason=None):
         r = self.http(Routes.WEBHOOKS_MODIFY, dict(webhook=webhook), json=optional(
             name=name,
             avatar=avatar,
         ), headers=_reason_header(reason))
-        return Webhook.create(self.client, r.json())
+        return Webhook.create(self.client, self.http.json(r))
 
     def webhooks_delete(self, webhook, reason=None):
         self.http(Routes.WEBHOOKS_DELETE, dict(webhook=webhook), headers=_reason_header(reason))
 
     def webhooks_token_get(self, webhook, token):
         r = self.http(Routes.WEBHOOKS_TOKEN_GET, dict(webhook=webhook, token=token))
-        return Webhook.create(self.client, r.json())
+        return Webhook.create(self.client, self.http.json(r))
 
     def webhooks_token_modify(self, webhook, token, name=None, avatar=None):
         r = self.http(Routes.WEBHOOKS_TOKEN_MODIFY, dict(webhook=webhook, token=token), json=optional(
             name=name,
             avatar=avatar,
         ))
-        return Webhook.create(self.client, r.json())
+        return Webhook.create(self.client, self.http.json(r))
 
     def webhooks_token_delete(self, webhook, token):
         self.http(Routes.WEBHOOKS_TOKEN_DELETE, dict(webhook=webhook, token=token))
@@ -1089,15 +1092,15 @@ class APIClient(LoggingClass):
             json=optional(**data), params={'wait': int(wait)})
 
         if wait:
-            return Message.create(self.client, obj.json())
+            return Message.create(self.client, self.http.json(obj))
 
     def applications_global_commands_get(self):
         r = self.http(Routes.APPLICATIONS_GLOBAL_COMMANDS_LIST, dict(application=self.client.state.me.id))
-        return ApplicationCommand.create_map(self.client, r.json())
+        return ApplicationCommand.create_map(self.client, self.http.json(r))
 
     def applications_global_command_get(self, command):
         r = self.http(Routes.APPLICATIONS_GLOBAL_COMMANDS_GET, dict(application=self.client.state.me.id, command=command))
-        return ApplicationCommand.create_map(self.client, r.json())
+        return ApplicationCommand.create_map(self.client, self.http.json(r))
 
     def applications_global_commands_create(self, name, description, options=None, default_permission=None):
         r = self.http(Routes.APPLICATIONS_GLOBAL_COMMANDS_CREATE, dict(application=self.client.state.me.id), json=optional(
@@ -1106,7 +1109,7 @@ class APIClient(LoggingClass):
             options=options,
             default_permission=default_permission
         ))
-        return ApplicationCommand.create(self.client, r.json())
+        return ApplicationCommand.create(self.client, self.http.json(r))
 
     def applications_global_commands_modify(self, command, name=None, description=None, options=None, default_permission=None):
         r = self.http(Routes.APPLICATIONS_GLOBAL_COMMANDS_MODIFY, dict(application=self.client.state.me.id, command=command), json=optional(
@@ -1115,60 +1118,60 @@ class APIClient(LoggingClass):
             options=options,
             default_permission=default_permission,
         ))
-        return ApplicationCommand.create(self.client, r.json())
+        return ApplicationCommand.create(self.client, self.http.json(r))
 
     def applications_global_commands_delete(self, command):
         return self.http(Routes.APPLICATIONS_GLOBAL_COMMANDS_DELETE, dict(application=self.client.state.me.id, command=command))
 
     def applications_global_commands_bulk_overwrite(self, commands):
         r = self.http(Routes.APPLICATIONS_GLOBAL_COMMANDS_BULK_OVERWRITE, dict(application=self.client.state.me.id), json=commands)
-        return ApplicationCommand.create_map(self.client, r.json())
+        return ApplicationCommand.create_map(self.client, self.http.json(r))
 
     def applications_guild_commands_get(self, guild):
         r = self.http(Routes.APPLICATIONS_GUILD_COMMANDS_LIST, dict(application=self.client.state.me.id, guild=guild))
-        return ApplicationCommand.create_map(self.client, r.json())
+        return ApplicationCommand.create_map(self.client, self.http.json(r))
 
     def applications_guild_command_get(self, guild):
         r = self.http(Routes.APPLICATIONS_GUILD_COMMANDS_GET, dict(application=self.client.state.me.id, guild=guild))
-        return ApplicationCommand.create_map(self.client, r.json())
+        return ApplicationCommand.create_map(self.client, self.http.json(r))
 
     def applications_guild_commands_create(self, guild, name, data):
         r = self.http(Routes.APPLICATIONS_GUILD_COMMANDS_CREATE, dict(application=self.client.state.me.id, guild=guild, name=name), json=data)
-        return ApplicationCommand.create(self.client, r.json())
+        return ApplicationCommand.create(self.client, self.http.json(r))
 
     def applications_guild_commands_modify(self, guild, command, data):
         r = self.http(Routes.APPLICATIONS_GUILD_COMMANDS_MODIFY, dict(application=self.client.state.me.id, guild=guild, command=command), json=data)
-        return ApplicationCommand.create(self.client, r.json())
+        return ApplicationCommand.create(self.client, self.http.json(r))
 
     def applications_guild_commands_delete(self, guild, command):
         return self.http(Routes.APPLICATIONS_GUILD_COMMANDS_DELETE, dict(application=self.client.state.me.id, guild=guild, command=command))
 
     def applications_guild_commands_bulk_overwrite(self, guild, commands):
         r = self.http(Routes.APPLICATIONS_GUILD_COMMANDS_BULK_OVERWRITE, dict(application=self.client.state.me.id, guild=guild), json=commands)
-        return ApplicationCommand.create_map(self.client, r.json())
+        return ApplicationCommand.create_map(self.client, self.http.json(r))
 
     def applications_guild_commands_permissions_get(self, guild):
         r = self.http(Routes.APPLICATIONS_GUILD_COMMANDS_PERMISSIONS_LIST, dict(application=self.client.state.me.id, guild=guild))
-        return GuildApplicationCommandPermissions.create_map(self.client, r.json())
+        return GuildApplicationCommandPermissions.create_map(self.client, self.http.json(r))
 
     def applications_guild_command_permissions_get(self, guild, command):
         r = self.http(Routes.APPLICATIONS_GUILD_COMMANDS_PERMISSIONS_GET, dict(application=self.client.state.me.id, guild=guild, command=command))
-        return GuildApplicationCommandPermissions.create(self.client, r.json())
+        return GuildApplicationCommandPermissions.create(self.client, self.http.json(r))
 
     def applications_guild_command_permissions_modify(self, guild, command, permissions):
         r = self.http(Routes.APPLICATIONS_GUILD_COMMANDS_PERMISSIONS_MODIFY, dict(application=self.client.state.me.id, guild=guild, command=command), json=permissions)
-        return GuildApplicationCommandPermissions.create_map(self.client, r.json())
+        return GuildApplicationCommandPermissions.create_map(self.client, self.http.json(r))
 
     def interactions_create(self, interaction, token, type, data=None, files=None):
         r = self.http(Routes.INTERACTIONS_CREATE, dict(id=interaction, token=token), json=dict(type=type, data=data), files=files)
         if r.status_code == 204:
             rr = self.http(Routes.INTERACTIONS_ORIGINAL_RESPONSE_GET, dict(id=self.client.state.me.id, token=token))
-            return InteractionResponse.create(self.client, dict(token=token, type=type, data=data, message=rr.json()))
+            return InteractionResponse.create(self.client, dict(token=token, type=type, data=data, message=self.http.json(rr)))
 
     def interactions_edit(self, application, token, data=None):
         r = self.http(Routes.INTERACTIONS_MODIFY, dict(id=application, token=token), json=data)
         if r.status_code == 200:
-            return InteractionResponse.create(self.client, r.json())
+            return InteractionResponse.create(self.client, self.http.json(r))
 
     def interactions_delete(self, application, token):
         return self.http(Routes.INTERACTIONS_DELETE, dict(id=application, token=token))
@@ -1266,7 +1269,7 @@ class APIClient(LoggingClass):
 
     def interactions_get_original(self, application, token):
         r = self.http(Routes.INTERACTIONS_ORIGINAL_RESPONSE_GET, dict(id=application, token=token))
-        return Interaction.create(self.client, r.json())
+        return Interaction.create(self.client, self.http.json(r))
 
     def interactions_followup_create(self, application, token, content=None, username=None, avatar_url=None, tts=None, file=None, embeds=None, payload_json=None, allowed_mentions=None, components=None, flags=None):
         r = self.http(Routes.INTERACTIONS_FOLLOWUP_CREATE, dict(id=application, token=token), json=optional(
@@ -1281,7 +1284,7 @@ class APIClient(LoggingClass):
             components=components,
             flags=flags
         ))
-        return InteractionCallbackData.create(self.client, r.json())
+        return InteractionCallbackData.create(self.client, self.http.json(r))
 
     def interactions_followup_edit(self, application, token, message, content=None, embeds=None, file=None, payload_json=None, allowed_mentions=None, attachments=None, components=None, flags=None):
         r = self.http(Routes.INTERACTIONS_FOLLOWUP_MODIFY, dict(id=application, token=token, message=message), json=optional(
@@ -1294,7 +1297,7 @@ class APIClient(LoggingClass):
             components=components,
             flags=flags  # ephemeral == 64
         ))
-        return InteractionCallbackData.create(self.client, r.json())
+        return InteractionCallbackData.create(self.client, self.http.json(r))
 
     def interactions_followup_delete(self, application, token, message):
         return self.http(Routes.INTERACTIONS_FOLLOWUP_DELETE, dict(id=application, token=token, message=message))
@@ -7,6 +7,7 @@ from requests import __version__ as requests_version
 from requests.exceptions import ConnectionError
 
 from disco import VERSION as disco_version
+from disco.gateway.encoding import JSONEncoder
 from disco.util.logging import LoggingClass
 from disco.api.ratelimit import RateLimiter
 
@@ -306,17 +307,21 @@ class HTTPClient(LoggingClass):
     """
     A simple HTTP client which wraps the requests library, adding support for
     Discords rate-limit headers, authorization, and request/response validation.
+
+    JSON request bodies and responses (via `HTTPClient.json`) are handled by the
+    given JSON encoder (see :mod:`disco.gateway.encoding`) rather than by requests.
     """
     BASE_URL = 'https://discord.com/api/v9'
     MAX_RETRIES = 5
 
-    def __init__(self, token, after_request=None):
+    def __init__(self, token, after_request=None, encoder=None):
         super(HTTPClient, self).__init__()
 
         py_version = platform.python_version()
 
         self.limiter = RateLimiter()
         self.after_request = after_request
+        self.encoder = encoder or JSONEncoder
 
         self.session = requests.Session()
         self.session.headers.update({
@@ -332,6 +337,12 @@ class HTTPClient(LoggingClass):
     def __call__(self, route, args=None, **kwargs):
         return self.call(route, args, **kwargs)
 
+    def json(self, response):
+        """
+        Decodes the JSON body of a response using this client's JSON encoder.
+        """
+        return self.encoder.decode(response.content)
+
     def call(self, route, args=None, **kwargs):
         """
         Makes a request to the given route (as specified in
@@ -377,6 +388,12 @@ class HTTPClient(LoggingClass):
 
         self.log.debug('KW: %s', kwargs)
 
+        # Encode JSON bodies ourselves, requests ignores `json` for multipart bodies anyway
+        if kwargs.get('json') is not None and not kwargs.get('files'):
+            body = self.encoder.encode(kwargs.pop('json'))
+            kwargs['data'] = body.encode('utf-8') if isinstance(body, str) else body
+            kwargs['headers'] = dict(kwargs.get('headers') or {}, **{'Content-Type': 'application/json'})
+
         # Make the actual request
         url = self.BASE_URL + route[1].format(**args)
         self.log.info('%s %s %s', route[0], url, '({})'.format(kwargs.get('params')) if kwargs.get('params') else '')
@@ -82,6 +82,12 @@ class BotConfig(Config):
         The host string for the HTTP Flask server (if enabled).
     http_port : int
         The port for the HTTP Flask server (if enabled).
+    http_state_stats_path : Optional[str]
+        If set, the path the HTTP server (if enabled) serves the JSON encoded
+        `State.stats` of the client at. The `sample_size` query parameter is
+        clamped to `http_state_stats_max_sample_size`.
+    http_state_stats_max_sample_size : int
+        The largest `sample_size` the state stats endpoint accepts.
     """
     deprecated = {'commands_prefix': 'command_prefixes'}
 
@@ -118,6 +124,8 @@ class BotConfig(Config):
     http_logging = True
     http_host = '0.0.0.0'
     http_port = 7575
+    http_state_stats_path = None
+    http_state_stats_max_sample_size = 128
 
 
 class Bot(LoggingClass):
@@ -171,6 +179,8 @@ class Bot(LoggingClass):
 
             self.log.info(f'Starting HTTP server bound to {self.config.http_host}:{self.config.http_port}')
             self.http = Flask('disco')
+            if self.config.http_state_stats_path:
+                self.http.add_url_rule(self.config.http_state_stats_path, 'state_stats', self.http_state_stats)
             self.http_server = WSGIServer((self.config.http_host, self.config.http_port), self.http, log=self.log if self.config.http_logging else None)
             self.http_server_greenlet = gevent.spawn(self.http_server.serve_forever)
 
@@ -209,6 +219,17 @@ class Bot(LoggingClass):
             level = int(level) if str(level).isdigit() else get_enum_value_by_name(CommandLevels, level)
             self.config.levels[entity_id] = level
 
+    def http_state_stats(self):
+        from flask import jsonify, request
+
+        try:
+            sample_size = int(request.args.get('sample_size', 32))
+        except ValueError:
+            return jsonify({'error': '`sample_size` must be an integer'}), 400
+
+        sample_size = max(1, min(sample_size, self.config.http_state_stats_max_sample_size))
+        return jsonify(self.client.state.stats(sample_size))
+
     @classmethod
     def from_cli(cls, *plugins):
         """
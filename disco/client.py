@@ -4,6 +4,7 @@ import gevent
 from disco.state import State, StateConfig
 from disco.api.client import APIClient
 from disco.gateway.client import GatewayClient
+from disco.gateway.group import ShardGroup
 from disco.gateway.packets import OPCode
 from disco.types.user import Status, Activity
 from disco.util.config import Config
@@ -24,6 +25,9 @@ class ClientConfig(Config):
         The shard ID for the current client instance.
     shard_count : int
         The total count of shards running.
+    shard_ids : Optional[list(int)]
+        If set, all of these shards are run in this process, sharing a single
+        `State` and `APIClient` (see :class:`disco.gateway.group.ShardGroup`).
     intents : int
         Defines which events the bot will receive from the API.
     max_reconnects : int
@@ -35,14 +39,65 @@ class ClientConfig(Config):
     manhole_bind : tuple(str, int)
         A (host, port) combination which the manhole server will bind to (if it's
         enabled using :attr:`manhole_enable`).
+    metrics_enable : bool
+        Whether to record per event type decode, model construction, dispatch and
+        end-to-end latency histograms on `GatewayClient.metrics`. Dispatch and
+        latency last until the last handler returns, including the greenlets
+        spawned for default (`Priority.NONE`) priority handlers. SEQUENTIAL
+        handlers are only counted until their event is queued.
     encoder : str
         The type of encoding to use for encoding/decoding data from websockets,
-        should be either 'json' or 'etf'.
+        should be one of 'json', 'etf', 'orjson' or 'msgspec'. The JSON based
+        encoders are also used for REST request and response bodies.
+    compression : bool or str
+        The transport compression to use for the gateway connection, either
+        'zlib-stream' (or True), 'zstd-stream' (requires `zstandard`, from the
+        `performance` extra) or False.
+    lazy_dispatch : bool
+        If true, dispatched events which neither the `State` nor any listener
+        is subscribed to are counted and dropped instead of being deserialized.
+    prefilter_events_allow : list(str)
+        If set, only dispatches of these gateway event types (e.g. `MESSAGE_CREATE`)
+        are decoded, all others are dropped by peeking the raw payload.
+    prefilter_events_deny : list(str)
+        Gateway event types which are dropped before being decoded.
+    prefilter_guilds_allow : list(snowflake)
+        If set, dispatches carrying a `guild_id` outside of this list are dropped
+        before being decoded. Events without a `guild_id` are never dropped.
+        Requires the 'etf' encoder, as the JSON encoders can't find the
+        `guild_id` of a frame faster than decoding it.
+    prefilter_guilds_deny : list(snowflake)
+        Guild IDs whose dispatches are dropped before being decoded (with the
+        'etf' encoder only).
+    gateway_record_path : Optional[str]
+        If set, every raw inbound gateway frame is recorded to a journal at this
+        path, which may contain a `{shard_id}` placeholder (see
+        :mod:`disco.gateway.recorder`).
+    dispatch_queue_size : int
+        If set, frames are decoded by the websocket reader and dispatches are
+        queued (up to this many) and processed in order by a separate greenlet,
+        so slow event handlers can't stall reading from the gateway (see
+        :class:`disco.gateway.dispatch.DispatchQueue`).
+    dispatch_queue_overflow : str
+        What happens when the dispatch queue is full, either 'block' (the reader
+        waits until there's room, delaying every received packet including
+        heartbeat ACKs), 'drop_oldest' or 'drop_newest'.
+    gateway_session_path : Optional[str]
+        If set, the gateway session is persisted to this file (which may contain
+        a `{shard_id}` placeholder) periodically and on shutdown, and a new
+        process attempts to RESUME the saved session before identifying. The
+        state cache is not part of the saved session, so a process which
+        resumes starts out with an empty cache.
+    gateway_session_save_interval : int
+        Seconds between saves of the gateway session.
+    gateway_session_max_age : int
+        Saved gateway sessions older than this many seconds are not resumed.
     """
 
     token = ''
     shard_id = 0
     shard_count = 1
+    shard_ids = None
     intents = 0
     max_reconnects = 5
     log_level = 'info'
@@ -51,9 +106,23 @@ class ClientConfig(Config):
     manhole_enable = False
     manhole_bind = ('127.0.0.1', 8484)
 
+    metrics_enable = False
+
     encoder = 'json'
     compression = True
 
+    lazy_dispatch = False
+    prefilter_events_allow = []
+    prefilter_events_deny = []
+    prefilter_guilds_allow = []
+    prefilter_guilds_deny = []
+    gateway_record_path = None
+    dispatch_queue_size = 0
+    dispatch_queue_overflow = 'block'
+    gateway_session_path = None
+    gateway_session_save_interval = 5
+    gateway_session_max_age = 120
+
 
 class Client(LoggingClass):
     """
@@ -83,7 +152,8 @@ class Client(LoggingClass):
         The gateway client.
     manhole_locals : dict
         Dictionary of local variables for each manhole connection. This can be
-        modified to add/modify local variables.
+        modified to add/modify local variables. `state_stats()` reports the
+        state's memory usage, see `State.stats`.
     manhole : Optional[`BackdoorServer`]
         Gevent backdoor server (if the manhole is enabled).
     """
@@ -95,7 +165,10 @@ class Client(LoggingClass):
         self.packets = Emitter()
 
         self.api = APIClient(self.config.token, self)
-        self.gw = GatewayClient(self, self.config.max_reconnects, self.config.encoder, self.config.compression)
+        if self.config.shard_ids:
+            self.gw = ShardGroup(self, self.config.shard_ids, self.config.shard_count)
+        else:
+            self.gw = GatewayClient(self, self.config.max_reconnects, self.config.encoder, self.config.compression)
         self.state = State(self, StateConfig(self.config.get('state', {})))
 
         if self.config.manhole_enable:
@@ -104,6 +177,8 @@ class Client(LoggingClass):
                 'state': self.state,
                 'api': self.api,
                 'gw': self.gw,
+                'metrics': self.gw.metrics,
+                'state_stats': self.state.stats,
             }
 
             self.manhole = DiscoBackdoorServer(self.config.manhole_bind,
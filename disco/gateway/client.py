@@ -3,57 +3,108 @@ import platform
 import time
 import zlib
 
+from collections import defaultdict
 from websocket import ABNF, WebSocketConnectionClosedException, WebSocketTimeoutException
 
+from disco.gateway.compression import COMPRESSORS, OPTIONAL_COMPRESSORS
+from disco.gateway.dispatch import DispatchQueue
 from disco.gateway.packets import OPCode, RECV, SEND
-from disco.gateway.events import GatewayEvent
+from disco.gateway.events import GatewayEvent, EVENTS_MAP
 from disco.gateway.encoding import ENCODERS
+from disco.gateway.recorder import GatewayRecorder
+from disco.gateway.scheduler import GatewaySendScheduler
+from disco.gateway.session import SessionStore
+from disco.util.emitter import Priority
 from disco.util.websocket import Websocket
 from disco.util.logging import LoggingClass
-from disco.util.limiter import SimpleLimiter
+from disco.util.metrics import HistogramGroup, LatencyTracker
 
 TEN_MEGABYTES = 10490000
-ZLIB_SUFFIX = b'\x00\x00\xff\xff'
 
 
 class GatewayClient(LoggingClass):
     GATEWAY_VERSION = 9
 
-    def __init__(self, client, max_reconnects=5, encoder='json', zlib_stream_enabled=True, ipc=None):
+    def __init__(self, client, max_reconnects=5, encoder='json', zlib_stream_enabled=True, ipc=None,
+                 shard_id=None, shard_count=None):
         super(GatewayClient, self).__init__()
         self.client = client
         self.max_reconnects = max_reconnects
         self.encoder = ENCODERS[encoder]
-        self.zlib_stream_enabled = zlib_stream_enabled
+
+        # Several gateway clients may share one client, see `ShardGroup`
+        self.shard_id = int(client.config.shard_id if shard_id is None else shard_id)
+        self.shard_count = int(client.config.shard_count if shard_count is None else shard_count)
+
+        # Transport compression, `True` is kept as an alias for zlib-stream
+        if zlib_stream_enabled is True:
+            zlib_stream_enabled = 'zlib-stream'
+        self.compression = zlib_stream_enabled or None
+        self.zlib_stream_enabled = self.compression == 'zlib-stream'
+
+        if self.compression and self.compression not in COMPRESSORS:
+            if self.compression in OPTIONAL_COMPRESSORS:
+                raise ValueError(
+                    f'`{self.compression}` compression requires `{OPTIONAL_COMPRESSORS[self.compression]}`, '
+                    'install it with `pip install betterdisco-py[performance]`')
+            raise ValueError(f'Unknown gateway compression `{self.compression}`')
 
         self.events = client.events
         self.packets = client.packets
 
+        # Lazy dispatch, events nobody listens to are counted rather than built
+        self.lazy_dispatch = client.config.lazy_dispatch
+        self.skipped_events = defaultdict(int)
+
+        # Pre-decode filter, matching frames are dropped before being decoded
+        self.prefilter_events_allow = set(client.config.prefilter_events_allow or ())
+        self.prefilter_events_deny = set(client.config.prefilter_events_deny or ())
+        self.prefilter_guilds_allow = set(map(int, client.config.prefilter_guilds_allow or ()))
+        self.prefilter_guilds_deny = set(map(int, client.config.prefilter_guilds_deny or ()))
+        self.prefilter_guilds = bool(self.prefilter_guilds_allow or self.prefilter_guilds_deny)
+        if self.prefilter_guilds and not self.encoder.PEEKS_GUILD_ID:
+            self.log.warning(
+                f'The {self.encoder.TYPE} encoder can\'t peek guild IDs, prefilter_guilds_* are ignored (use etf)')
+            self.prefilter_guilds = False
+        self.prefilter_enabled = bool(
+            self.prefilter_events_allow or self.prefilter_events_deny or self.prefilter_guilds)
+        self.prefiltered_events = defaultdict(int)
+
         # IPC for shards
         if ipc:
             self.shards = ipc.get_shards()
             self.ipc = ipc
 
-        # Is actually 60, but 120 allows a buffer
-        self.limiter = SimpleLimiter(60, 130)
-
-        # Create emitter and bind to gateway payloads
-        self.packets.on((RECV, OPCode.DISPATCH), self.handle_dispatch)
-        self.packets.on((RECV, OPCode.HEARTBEAT), self.handle_heartbeat)
-        self.packets.on((RECV, OPCode.HEARTBEAT_ACK), self.handle_heartbeat_acknowledge)
-        self.packets.on((RECV, OPCode.RECONNECT), self.handle_reconnect)
-        self.packets.on((RECV, OPCode.INVALID_SESSION), self.handle_invalid_session)
-        self.packets.on((RECV, OPCode.HELLO), self.handle_hello)
-
-        # Bind to ready payload
-        self.events.on('Ready', self.on_ready)
-        self.events.on('Resumed', self.on_resumed)
+        # Paces sends against Discord's 120 per 60 seconds budget
+        self.scheduler = GatewaySendScheduler(self._send)
+
+        # Optionally paces IDENTIFYs across shards, see `IdentifyCoordinator`
+        self.identify_coordinator = None
+
+        # Optionally decouples dispatch processing from the websocket reader
+        self.dispatch_queue = None
+        if client.config.dispatch_queue_size:
+            self.dispatch_queue = DispatchQueue(
+                self._emit_dispatch, client.config.dispatch_queue_size, client.config.dispatch_queue_overflow,
+            )
+
+        # Create emitter and bind to gateway payloads, dispatches are handled in
+        #  order on the dispatch queue's worker when it is enabled. Received
+        #  packets are tagged with their shard, so only our own are handled.
+        self.packets.on(
+            (RECV, OPCode.DISPATCH), self.handle_dispatch, conditional=self.is_own_packet,
+            priority=Priority.AFTER if self.dispatch_queue else Priority.NONE,
+        )
+        self.packets.on((RECV, OPCode.HEARTBEAT), self.handle_heartbeat, conditional=self.is_own_packet)
+        self.packets.on((RECV, OPCode.HEARTBEAT_ACK), self.handle_heartbeat_acknowledge, conditional=self.is_own_packet)
+        self.packets.on((RECV, OPCode.RECONNECT), self.handle_reconnect, conditional=self.is_own_packet)
+        self.packets.on((RECV, OPCode.INVALID_SESSION), self.handle_invalid_session, conditional=self.is_own_packet)
+        self.packets.on((RECV, OPCode.HELLO), self.handle_hello, conditional=self.is_own_packet)
 
         # Websocket connection
         self.ws = None
         self.ws_event = gevent.event.Event()
-        self._zlib = None
-        self._buffer = None
+        self.decompressor = COMPRESSORS[self.compression]() if self.compression else None
 
         # State
         self.seq = 0
@@ -75,11 +126,84 @@ class GatewayClient(LoggingClass):
         # Latency
         self._last_heartbeat = 0
         self.latency = -1
+        self.heartbeats = LatencyTracker()
+
+        # Per event type decode/model/dispatch/latency histograms
+        self.metrics = HistogramGroup() if client.config.metrics_enable else None
+
+        # Raw traffic recorder
+        self.recorder = None
+        if self.client.config.gateway_record_path:
+            self.start_recording(self.client.config.gateway_record_path.format(shard_id=self.shard_id))
+
+        # Persisted session, allows resuming across process restarts
+        self.session_store = None
+        self._session_saved = None
+        if self.client.config.gateway_session_path:
+            self.session_store = SessionStore(
+                self.client.config.gateway_session_path.format(shard_id=self.shard_id),
+                self.client.config.gateway_session_max_age,
+            )
+            self.load_session()
+
+    def load_session(self):
+        """
+        Loads the session saved in the session store (if any), so that the next
+        connection attempts to RESUME it.
+        """
+        data = self.session_store.load(self.shard_id, self.shard_count)
+        if not data:
+            return
+
+        self.log.info(f'Loaded saved gateway session {data["session_id"]} (SEQ: {data["seq"]})')
+        self.session_id = data['session_id']
+        self.seq = data['seq']
+        self._cached_gateway_url = data['resume_gateway_url'] or self._cached_gateway_url
+        self._session_saved = (self.session_id, self.seq)
+
+    def save_session(self):
+        """
+        Writes the current session to the session store, if it changed since
+        the last save.
+        """
+        if not self.session_store or not self.session_id:
+            return
+
+        if self._session_saved == (self.session_id, self.seq):
+            return
+
+        try:
+            self.session_store.save(
+                self.session_id, self.seq, self._cached_gateway_url,
+                self.shard_id, self.shard_count,
+            )
+            self._session_saved = (self.session_id, self.seq)
+        except OSError as e:
+            self.log.warning(f'Failed to save gateway session: {e}')
+
+    def session_save_task(self, interval):
+        while True:
+            gevent.sleep(interval)
+            self.save_session()
+
+    def start_recording(self, path):
+        """
+        Start recording every raw inbound frame to a journal at the given path,
+        which can later be replayed with `disco.gateway.recorder.GatewayReplayer`.
+        """
+        self.stop_recording()
+        self.recorder = GatewayRecorder(path, self.encoder.TYPE, self.compression or '')
+        if self.ws and not self.ws.is_closed:
+            self.log.warning('Recording started mid-connection, the journal will not replay until the next reconnect')
+
+    def stop_recording(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
 
     def send(self, op, data):
         if not self.ws.is_closed:
-            self.limiter.check()
-            return self._send(op, data)
+            return self.scheduler.send(op, data)
 
     def _send(self, op, data):
         self.log.debug('GatewayClient.send %s', op)
@@ -94,38 +218,112 @@ class GatewayClient(LoggingClass):
             if not self._heartbeat_acknowledged:
                 self.log.warning('Received HEARTBEAT without HEARTBEAT_ACK, forcing a fresh reconnect')
                 self.last_conn_state = 'HEARTBEAT'
+                self.heartbeats.miss()
                 self._heartbeat_acknowledged = True
                 self.ws.close(status=1000)
-                self.client.gw.on_close(0, 'HEARTBEAT failure')
+                self.on_close(0, 'HEARTBEAT failure')
                 return
             self._last_heartbeat = time.perf_counter()
 
-            self._send(OPCode.HEARTBEAT, self.seq)
+            self.scheduler.send(OPCode.HEARTBEAT, self.seq)
             self._heartbeat_acknowledged = False
             gevent.sleep(interval / 1000)
 
+    def is_own_packet(self, packet):
+        return packet.get('shard_id', self.shard_id) == self.shard_id
+
+    def for_guild(self, guild_id):
+        """
+        The gateway client responsible for the given guild, see `ShardGroup.for_guild`.
+        """
+        return self
+
+    def is_subscribed(self, event_name):
+        """
+        Whether a dispatch of the given type (e.g. `MESSAGE_CREATE`) would be
+        consumed by the `State` or any listener on the events emitter.
+        """
+        # The session itself depends on these
+        if event_name in ('READY', 'RESUMED'):
+            return True
+
+        cls = EVENTS_MAP.get(event_name)
+        if not cls:
+            # Let `handle_dispatch` deal with unknown events
+            return True
+
+        name = cls.__name__
+        return name in self.client.state.EVENTS or self.events.has_listeners(name)
+
     def handle_dispatch(self, packet):
-        timestamp = time.perf_counter_ns()
+        if self.lazy_dispatch and not self.is_subscribed(packet['t']):
+            self.skipped_events[packet['t']] += 1
+            if self.replaying:
+                self.replayed_events += 1
+            return
+
+        start = time.perf_counter_ns()
+        # Dispatches without an object payload (e.g. `RESUMED` with a null `d`) can't carry a timestamp
+        timestamp = packet['d'].setdefault('timestamp_ns', start) if isinstance(packet['d'], dict) else start
         try:
-            packet['d']['timestamp_ns'] = timestamp
             obj = GatewayEvent.from_dispatch(self.client, packet)
         except Exception as e:
             if self.client.config.log_unknown_events:
                 return self.log.warning(f'{e.__class__.__name__}: {e}')  # this probably isn't perfect
             return
 
+        # Handled here rather than through the (possibly shared) events emitter
+        if packet['t'] == 'READY':
+            self.on_ready(obj)
+        elif packet['t'] == 'RESUMED':
+            self.on_resumed(obj)
+
+        created = time.perf_counter_ns()
         self.log.debug(f'GatewayClient.handle_dispatch {obj.__class__.__name__}')
-        self.client.events.emit(obj.__class__.__name__, obj)
+        spawned = self.client.events.emit(obj.__class__.__name__, obj)
         if self.replaying:
             self.replayed_events += 1
 
+        if self.metrics:
+            self.metrics.record(packet['t'], 'model', created - start)
+            if spawned:
+                self._record_handled(packet['t'], spawned, created, timestamp)
+            else:
+                end = time.perf_counter_ns()
+                self.metrics.record(packet['t'], 'dispatch', end - created)
+                self.metrics.record(packet['t'], 'latency', end - timestamp)
+
+    def _record_handled(self, name, greenlets, created, timestamp):
+        """
+        Records the dispatch and latency of an event once the last of the
+        greenlets spawned for its `Priority.NONE` handlers finished.
+        """
+        remaining = [len(greenlets)]
+
+        def _finished(_):
+            remaining[0] -= 1
+            if remaining[0] or not self.metrics:
+                return
+
+            end = time.perf_counter_ns()
+            self.metrics.record(name, 'dispatch', end - created)
+            self.metrics.record(name, 'latency', end - timestamp)
+
+        for greenlet in greenlets:
+            greenlet.rawlink(_finished)
+
     def handle_heartbeat(self, _):
-        self._send(OPCode.HEARTBEAT, self.seq)
+        self.scheduler.send(OPCode.HEARTBEAT, self.seq)
 
     def handle_heartbeat_acknowledge(self, _):
         self.log.debug('Received HEARTBEAT_ACK')
+        # ACKs of heartbeats requested by Discord don't have a matching send time
+        if self._heartbeat_acknowledged:
+            return
+
         self._heartbeat_acknowledged = True
         self.latency = float('{:.2f}'.format((time.perf_counter() - self._last_heartbeat) * 1000))
+        self.heartbeats.record(self.latency)
 
     def handle_reconnect(self, _):
         self.log.warning('Received RECONNECT request; resuming')
@@ -149,12 +347,15 @@ class GatewayClient(LoggingClass):
         self.session_id = ready.session_id
         self._cached_gateway_url = ready.resume_gateway_url
         self.reconnects = 0
+        self.scheduler.start()
+        self.save_session()
 
     def on_resumed(self, _):
         self.log.info(f'RESUME completed, replayed {self.replayed_events} events')
         self.reconnects = 0
         self.replaying = False
         self.resuming = False
+        self.scheduler.start()
 
     def connect_and_run(self, gateway_url=None):
         if not gateway_url:
@@ -165,55 +366,111 @@ class GatewayClient(LoggingClass):
 
         gateway_url += f'?v={self.GATEWAY_VERSION}&encoding={self.encoder.TYPE}'
 
-        if self.zlib_stream_enabled:  # transport compression may not benefit ETF?
-            gateway_url += '&compress=zlib-stream'
+        if self.compression:  # transport compression may not benefit ETF?
+            gateway_url += f'&compress={self.compression}'
 
         self.log.info(f'Opening websocket connection to `{gateway_url}`')
         self.ws = Websocket(gateway_url)
         self.ws.emitter.on('on_open', self.on_open)
         self.ws.emitter.on('on_error', self.on_error)
         self.ws.emitter.on('on_close', self.on_close)
-        self.ws.emitter.on('on_message', self.on_message)
+        # With a dispatch queue, frames are handled in the reader itself, so they're
+        #  queued strictly in order and a full queue holds the reader back
+        self.ws.emitter.on(
+            'on_message', self.on_message, priority=Priority.BEFORE if self.dispatch_queue else Priority.NONE,
+        )
 
         self.ws.run_forever()
 
-    def on_message(self, msg):
-        if self.zlib_stream_enabled:
-            if not self._buffer:
-                self._buffer = bytearray()
+    def prefilter(self, msg):
+        """
+        Peeks the raw (decompressed) frame and returns whether it should be
+        decoded. Frames which cannot be peeked are always decoded.
+        """
+        peeked = self.encoder.peek(msg, guild_id=self.prefilter_guilds)
+        if not peeked:
+            return True
 
-            self._buffer.extend(msg)
+        op, seq, event, guild_id = peeked
 
-            if len(msg) < 4:
-                return
+        # The session relies on these, and without a sequence we can't drop the frame safely
+        if op != OPCode.DISPATCH or event in (None, 'READY', 'RESUMED') or seq is None:
+            return True
+
+        drop = (
+            (self.prefilter_events_allow and event not in self.prefilter_events_allow) or
+            event in self.prefilter_events_deny or
+            (guild_id and self.prefilter_guilds_allow and guild_id not in self.prefilter_guilds_allow) or
+            (guild_id and guild_id in self.prefilter_guilds_deny)
+        )
+        if not drop:
+            return True
+
+        if seq > self.seq:
+            self.seq = seq
 
-            if msg[-4:] != ZLIB_SUFFIX:
+        self.prefiltered_events[event] += 1
+        return False
+
+    def on_message(self, msg):
+        received = time.perf_counter_ns()
+        if self.recorder:
+            self.recorder.write(msg)
+
+        if self.decompressor:
+            msg = self.decompressor.feed(msg)
+            if msg is None:
                 return
 
-            msg = self._zlib.decompress(self._buffer)
-            # If encoder is text based, decode the data as utf-8
-            if self.encoder.OPCODE == ABNF.OPCODE_TEXT:
+            # If encoder is text based and can't handle bytes, decode the data as utf-8
+            if self.encoder.OPCODE == ABNF.OPCODE_TEXT and not self.encoder.DECODES_BYTES:
                 msg = str(msg, 'utf=8')
-            self._buffer = None
         else:
             # Detect zlib, decompress
             is_erlpack = (msg[0] == 131)
             if msg[0] != '{' and not is_erlpack:
                 msg = str(zlib.decompress(msg, 15, TEN_MEGABYTES), 'utf=8')
 
+        if self.prefilter_enabled and not self.prefilter(msg):
+            return
+
+        start = time.perf_counter_ns()
         try:
             data = self.encoder.decode(msg)
         except Exception:
             self.log.exception('Failed to parse gateway message: ')
             return
+        data['decode_ns'] = time.perf_counter_ns() - start
+
+        if data['op'] == OPCode.DISPATCH:
+            if isinstance(data['d'], dict):
+                data['d']['timestamp_ns'] = received
+            if self.metrics:
+                self.metrics.record(data['t'], 'decode', data['decode_ns'])
 
         # Update sequence
         if data['s'] and data['s'] > self.seq:
             self.seq = data['s']
 
+        data['shard_id'] = self.shard_id
+
+        if self.dispatch_queue and data['op'] == OPCode.DISPATCH:
+            self.dispatch_queue.put(data, received)
+            return
+
         # Emit packet
         self.packets.emit((RECV, data['op']), data)
 
+    def in_dispatch_worker(self):
+        """
+        Whether the current greenlet is the dispatch queue's worker, which must
+        not block waiting on later dispatches.
+        """
+        return bool(self.dispatch_queue) and self.dispatch_queue.in_worker()
+
+    def _emit_dispatch(self, data):
+        self.packets.emit((RECV, OPCode.DISPATCH), data)
+
     def on_error(self, error):
         if isinstance(error, KeyboardInterrupt):
             self.shutting_down = True
@@ -228,8 +485,11 @@ class GatewayClient(LoggingClass):
 
     def on_open(self):
         self.ws.is_closed = False
-        if self.zlib_stream_enabled:
-            self._zlib = zlib.decompressobj()
+        if self.decompressor:
+            self.decompressor.reset()
+
+        if self.recorder:
+            self.recorder.mark_open()
 
         if self.seq and self.session_id:
             self.log.info(f'WS Opened: attempting resume with SID: {self.session_id} SEQ: {self.seq}')
@@ -240,6 +500,12 @@ class GatewayClient(LoggingClass):
                 'seq': self.seq,
             })
         else:
+            if self.identify_coordinator:
+                self.log.info('WS Opened: waiting for identify slot')
+                self.identify_coordinator.acquire(self.shard_id)
+                if self.ws.is_closed:
+                    return
+
             self.log.info('WS Opened: sending identify payload')
             self.send(OPCode.IDENTIFY, {
                 'token': self.client.config.token,
@@ -247,8 +513,8 @@ class GatewayClient(LoggingClass):
                 'large_threshold': 250,
                 'intents': self.client.config.intents,
                 'shard': [
-                    int(self.client.config.shard_id),
-                    int(self.client.config.shard_count),
+                    self.shard_id,
+                    self.shard_count,
                 ],
                 'properties': {
                     'os': platform.system(),
@@ -260,7 +526,9 @@ class GatewayClient(LoggingClass):
     def on_close(self, code=None, reason=None):
         # Make sure we clean up any old data
         self.ws.is_closed = True
-        self._buffer = None
+        self.scheduler.pause()
+        if self.decompressor:
+            self.decompressor.discard()
 
         # Kill heartbeater, a reconnect/resume will trigger a HELLO which will respawn it
         if self._heartbeat_task:
@@ -271,6 +539,8 @@ class GatewayClient(LoggingClass):
         # If we're quitting, just break out of here
         if self.shutting_down:
             self.log.info('WS Closed: shutting down')
+            self.stop_recording()
+            self.save_session()
             return
 
         self.replaying = False
@@ -292,6 +562,13 @@ class GatewayClient(LoggingClass):
         # Don't resume for these error codes
         if code and (4000 < code <= 4010 or code in (1000, 1001)) or (not code and not self.resuming):
             self.session_id = None
+
+        # Queued sends belong to the old session, a fresh one will redo them
+        if not self.session_id:
+            self.scheduler.clear()
+            if self.session_store:
+                self.session_store.clear()
+                self._session_saved = None
         # 4004 and all codes above 4009 are not resumable
         if code and (code == 4004 or code >= 4010):
             reason = 'Unknown.'
@@ -300,7 +577,7 @@ class GatewayClient(LoggingClass):
             if code == 4010:
                 reason = 'Invalid shard ID.'
             if code == 4011:
-                reason = 'Sharding required.' if self.client.config.shard_count == 1 else 'Further sharding required.'
+                reason = 'Sharding required.' if self.shard_count == 1 else 'Further sharding required.'
             if code == 4012:
                 reason = 'Invalid API version.'
             if code == 4013:
@@ -319,28 +596,39 @@ class GatewayClient(LoggingClass):
         self.connect_and_run(self._cached_gateway_url)
 
     def run(self):
+        if self.session_store:
+            gevent.spawn(self.session_save_task, self.client.config.gateway_session_save_interval)
+
         gevent.spawn(self.connect_and_run)
         self.ws_event.wait()
+        self.save_session()
 
-    def request_guild_members(self, guild_id, query=None, limit=0, presences=False):
+    def request_guild_members(self, guild_id, query=None, limit=0, presences=False, nonce=None):
         """
         Request a batch of Guild members from Discord. Generally this function
         can be called when initially loading Guilds to fill the local member state.
+        The optional nonce is echoed back on every resulting `GuildMembersChunk`.
         """
-        self.send(OPCode.REQUEST_GUILD_MEMBERS, {
+        payload = {
             'guild_id': guild_id,
             'limit': limit,
             'presences': presences,
             'query': query or '',
-        })
+        }
+        if nonce:
+            payload['nonce'] = nonce
+        self.send(OPCode.REQUEST_GUILD_MEMBERS, payload)
 
-    def request_guild_members_by_id(self, guild_id, user_ids, limit=0, presences=False):
+    def request_guild_members_by_id(self, guild_id, user_ids, limit=0, presences=False, nonce=None):
         """
         Request a batch of Guild members from Discord by their snowflake(s).
         """
-        self.send(OPCode.REQUEST_GUILD_MEMBERS, {
+        payload = {
             'guild_id': guild_id,
             'limit': limit,
             'presences': presences,
             'user_ids': user_ids,
-        })
+        }
+        if nonce:
+            payload['nonce'] = nonce
+        self.send(OPCode.REQUEST_GUILD_MEMBERS, payload)
@@ -0,0 +1,181 @@
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZLIB_SUFFIX = b'\x00\x00\xff\xff'
+
+
+class StreamDecompressor:
+    """
+    Base class for transport compression decompressors, which are fed raw
+    websocket frames and produce complete gateway messages.
+
+    Attributes
+    ----------
+    compressed_bytes : int
+        Total bytes received before decompressing.
+    uncompressed_bytes : int
+        Total bytes produced by decompressing.
+    inflate_time : int
+        Total time spent decompressing, in nanoseconds.
+    messages : int
+        Total number of complete messages decompressed.
+    """
+    TYPE = None
+
+    def __init__(self):
+        self.compressed_bytes = 0
+        self.uncompressed_bytes = 0
+        self.inflate_time = 0
+        self.messages = 0
+
+    @property
+    def ready(self):
+        return False
+
+    def reset(self):
+        """
+        Starts a new compression context, should be called for every new connection.
+        """
+        pass
+
+    def discard(self):
+        """
+        Drops any partially buffered message.
+        """
+        pass
+
+    def feed(self, msg):
+        """
+        Feeds a raw websocket frame to the decompressor.
+
+        Returns
+        -------
+        Optional[bytes]
+            The decompressed message, or None if the message is not yet complete.
+        """
+        raise NotImplementedError
+
+    def stats(self):
+        return {
+            'compressed_bytes': self.compressed_bytes,
+            'uncompressed_bytes': self.uncompressed_bytes,
+            'inflate_time_ms': self.inflate_time / 1e6,
+            'messages': self.messages,
+        }
+
+
+class ZlibStreamInflater(StreamDecompressor):
+    """
+    Inflates a `zlib-stream` compressed gateway connection. Messages which span
+    multiple websocket frames are accumulated in a single preallocated buffer
+    which is reused for the lifetime of the inflater, and messages which fit in
+    a single frame (the common case) are inflated without being copied at all.
+
+    Parameters
+    ----------
+    buffer_size : int
+        The initial size of the reusable frame buffer, it grows as required.
+    """
+    TYPE = 'zlib-stream'
+
+    def __init__(self, buffer_size=65536):
+        super(ZlibStreamInflater, self).__init__()
+        self._buffer = bytearray(buffer_size)
+        self._size = 0
+        self._zlib = None
+
+    @property
+    def ready(self):
+        return self._zlib is not None
+
+    def reset(self):
+        self._zlib = zlib.decompressobj()
+        self._size = 0
+
+    def discard(self):
+        self._size = 0
+
+    def feed(self, msg):
+        size = len(msg)
+        self.compressed_bytes += size
+        complete = msg.endswith(ZLIB_SUFFIX)
+
+        view = None
+        if not self._size and complete:
+            data = msg
+        else:
+            end = self._size + size
+            if end > len(self._buffer):
+                self._buffer.extend(bytes(end - len(self._buffer)))
+            self._buffer[self._size:end] = msg
+            self._size = end
+
+            if not complete:
+                return None
+
+            data = view = memoryview(self._buffer)[:end]
+
+        start = time.perf_counter_ns()
+        try:
+            msg = self._zlib.decompress(data)
+        finally:
+            if view is not None:
+                view.release()
+            self._size = 0
+
+        self.inflate_time += time.perf_counter_ns() - start
+        self.uncompressed_bytes += len(msg)
+        self.messages += 1
+        return msg
+
+
+class ZstdStreamDecompressor(StreamDecompressor):
+    """
+    Decompresses a `zstd-stream` compressed gateway connection. The whole
+    connection is a single zstd frame, and Discord flushes it at the end of
+    every message, so each websocket frame holds exactly one message.
+    """
+    TYPE = 'zstd-stream'
+
+    def __init__(self):
+        super(ZstdStreamDecompressor, self).__init__()
+        self._zstd = None
+
+    @property
+    def ready(self):
+        return self._zstd is not None
+
+    def reset(self):
+        self._zstd = zstandard.ZstdDecompressor().decompressobj()
+
+    def feed(self, msg):
+        self.compressed_bytes += len(msg)
+
+        start = time.perf_counter_ns()
+        msg = self._zstd.decompress(msg)
+        self.inflate_time += time.perf_counter_ns() - start
+
+        if not msg:
+            return None
+
+        self.uncompressed_bytes += len(msg)
+        self.messages += 1
+        return msg
+
+
+COMPRESSORS = {
+    'zlib-stream': ZlibStreamInflater,
+}
+
+# Compressors which need an optional package (from the `performance` extra)
+OPTIONAL_COMPRESSORS = {
+    'zstd-stream': 'zstandard',
+}
+
+if zstandard:
+    COMPRESSORS['zstd-stream'] = ZstdStreamDecompressor
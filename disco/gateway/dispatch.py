@@ -0,0 +1,154 @@
+import gevent
+import time
+
+from gevent.queue import Empty, Queue
+
+from disco.util.logging import LoggingClass
+
+
+class OverflowPolicy:
+    # The websocket reader waits for room in the queue
+    BLOCK = 'block'
+    # The oldest queued dispatch is dropped to make room
+    DROP_OLDEST = 'drop_oldest'
+    # The incoming dispatch is dropped
+    DROP_NEWEST = 'drop_newest'
+
+    ALL = {BLOCK, DROP_OLDEST, DROP_NEWEST}
+
+
+class DispatchQueue(LoggingClass):
+    """
+    A bounded FIFO queue between the websocket reader and dispatch processing.
+    The reader decodes frames and queues dispatches in the order they arrive,
+    and a single worker greenlet hands them to the given handler in that same
+    order, yielding between each one so the reader (and heartbeat ACKs) keep
+    being serviced while handlers lag.
+
+    `put` must be called from a single greenlet (the websocket reader), so that
+    dispatches are queued in sequence order. With the `block` overflow policy,
+    `put` blocks the reader until the worker makes room, which also delays
+    reading heartbeat ACKs. Dropping dispatches (with either of the drop
+    policies) leaves the `State` missing updates, and should only be used
+    where that's acceptable.
+
+    Parameters
+    ----------
+    handler : function
+        Called with every decoded dispatch payload.
+    maxsize : int
+        The maximum number of queued dispatches.
+    overflow : str
+        What happens when the queue is full, see `OverflowPolicy`.
+
+    Attributes
+    ----------
+    processed : int
+        The number of dispatches handed to the handler.
+    dropped : int
+        The number of dispatches dropped due to the overflow policy.
+    max_depth : int
+        The largest queue depth seen.
+    max_lag : int
+        The longest time (in nanoseconds) a dispatch spent queued.
+    """
+    def __init__(self, handler, maxsize, overflow=OverflowPolicy.BLOCK):
+        super(DispatchQueue, self).__init__()
+        if overflow not in OverflowPolicy.ALL:
+            raise ValueError(f'Unknown dispatch queue overflow policy `{overflow}`')
+
+        self.handler = handler
+        self.maxsize = maxsize
+        self.overflow = overflow
+
+        self.processed = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.max_lag = 0
+
+        self._queue = Queue(maxsize)
+        self._worker = gevent.spawn(self._run)
+
+    def __len__(self):
+        return self._queue.qsize()
+
+    def put(self, data, received=None):
+        """
+        Queues a dispatch, received at the given `time.perf_counter_ns` timestamp.
+
+        Returns
+        -------
+        bool
+            Whether the dispatch was queued.
+        """
+        item = (received or time.perf_counter_ns(), data)
+
+        if self._queue.full():
+            if self.overflow == OverflowPolicy.DROP_NEWEST:
+                self.dropped += 1
+                return False
+            elif self.overflow == OverflowPolicy.DROP_OLDEST:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except Empty:
+                    pass
+
+        # Only blocks with the `block` policy, as the drop policies made room
+        self._queue.put(item)
+
+        if self._queue.qsize() > self.max_depth:
+            self.max_depth = self._queue.qsize()
+        return True
+
+    def clear(self):
+        while True:
+            try:
+                self._queue.get_nowait()
+            except Empty:
+                return
+
+    def in_worker(self):
+        """
+        Whether the current greenlet is this queue's worker.
+        """
+        return gevent.getcurrent() is self._worker
+
+    def lag(self):
+        """
+        How long (in nanoseconds) the oldest queued dispatch has been waiting.
+        """
+        try:
+            received, _ = self._queue.peek_nowait()
+        except Empty:
+            return 0
+        return time.perf_counter_ns() - received
+
+    def _run(self):
+        while True:
+            received, data = self._queue.get()
+
+            lag = time.perf_counter_ns() - received
+            if lag > self.max_lag:
+                self.max_lag = lag
+
+            try:
+                self.handler(data)
+            except Exception:
+                self.log.exception(f'Failed to handle queued dispatch {data.get("t")}: ')
+            self.processed += 1
+
+            # Let the reader run between dispatches
+            gevent.sleep(0)
+
+    def stats(self):
+        return {
+            'depth': len(self),
+            'maxsize': self.maxsize,
+            'overflow': self.overflow,
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'max_depth': self.max_depth,
+            'oldest_ms': self.lag() / 1e6,
+            'max_lag_ms': self.max_lag / 1e6,
+        }
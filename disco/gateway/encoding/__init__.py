@@ -9,3 +9,15 @@ try:
     ENCODERS['etf'] = ETFEncoder
 except ImportError:
     pass
+
+try:
+    from .orjson import ORJSONEncoder
+    ENCODERS['orjson'] = ORJSONEncoder
+except ImportError:
+    pass
+
+try:
+    from .msgspec import MsgspecEncoder
+    ENCODERS['msgspec'] = MsgspecEncoder
+except ImportError:
+    pass
@@ -4,6 +4,10 @@ from websocket import ABNF
 class BaseEncoder:
     TYPE = None
     OPCODE = ABNF.OPCODE_TEXT
+    # Whether `decode` accepts raw bytes, avoiding an intermediate utf-8 str
+    DECODES_BYTES = False
+    # Whether `peek` extracts the `guild_id` of dispatches
+    PEEKS_GUILD_ID = False
 
     @staticmethod
     def encode(obj):
@@ -12,3 +16,19 @@ class BaseEncoder:
     @staticmethod
     def decode(obj):
         pass
+
+    @staticmethod
+    def peek(obj, guild_id=False):
+        """
+        Cheaply extract the top-level `op`, `s` and `t` fields (and optionally
+        the `guild_id` at the top level of `d`, for encoders which set
+        `PEEKS_GUILD_ID`) of an encoded payload without decoding all of it. Keys
+        of the same name in nested objects are ignored.
+
+        Returns
+        -------
+        Optional[tuple(int, Optional[int], Optional[str], Optional[int])]
+            The (op, seq, event, guild_id) of the payload, or None if the encoder
+            does not support peeking or the payload could not be peeked.
+        """
+        return None
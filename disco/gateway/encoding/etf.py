@@ -1,3 +1,5 @@
+import struct
+
 from erlpack import ErlangTermDecoder, pack  # this feels like chaos
 from websocket import ABNF
 
@@ -6,9 +8,127 @@ from disco.gateway.encoding.base import BaseEncoder
 decoder = ErlangTermDecoder(encoding='utf-8')
 
 
+PEEK_KEYS = {'op', 's', 't'}
+
+# Terms of a fixed size (after the tag)
+FIXED_SIZES = {97: 1, 98: 4, 70: 8, 99: 31, 106: 0}
+# Terms of a size given by a length prefix, to its (format, size)
+PREFIXED_SIZES = {100: ('>H', 2), 118: ('>H', 2), 115: ('B', 1), 119: ('B', 1), 109: ('>I', 4), 107: ('>H', 2)}
+
+
+def _skip_term(data, pos):
+    """
+    Returns the position following the term at `pos`, raising `ValueError` for
+    unsupported terms.
+    """
+    tag = data[pos]
+    pos += 1
+
+    if tag in FIXED_SIZES:
+        return pos + FIXED_SIZES[tag]
+    elif tag in PREFIXED_SIZES:
+        fmt, size = PREFIXED_SIZES[tag]
+        return pos + size + struct.unpack_from(fmt, data, pos)[0]
+    elif tag == 110:  # SMALL_BIG_EXT
+        return pos + 2 + data[pos]
+    elif tag == 111:  # LARGE_BIG_EXT
+        return pos + 5 + struct.unpack_from('>I', data, pos)[0]
+    elif tag == 116:  # MAP_EXT
+        count = struct.unpack_from('>I', data, pos)[0] * 2
+        pos += 4
+    elif tag == 108:  # LIST_EXT, followed by its tail
+        count = struct.unpack_from('>I', data, pos)[0] + 1
+        pos += 4
+    elif tag == 104:  # SMALL_TUPLE_EXT
+        count = data[pos]
+        pos += 1
+    elif tag == 105:  # LARGE_TUPLE_EXT
+        count = struct.unpack_from('>I', data, pos)[0]
+        pos += 4
+    else:
+        raise ValueError(f'Unsupported term {tag}')
+
+    for _ in range(count):
+        pos = _skip_term(data, pos)
+    return pos
+
+
+def _map_items(data, pos):
+    """
+    Yields the (key, value position) of every entry of the map at `pos`.
+    """
+    if data[pos] != 116:
+        return
+
+    count = struct.unpack_from('>I', data, pos + 1)[0]
+    pos += 5
+    for _ in range(count):
+        key = _read_simple_term(data, pos)
+        value = _skip_term(data, pos)
+        yield key, value
+        pos = _skip_term(data, value)
+
+
+def _peek(data, guild_id):
+    """
+    Reads the top-level `op`, `s` and `t` and (optionally) the `guild_id` at the
+    top level of `d`, skipping over every other value.
+    """
+    found = {}
+    if not data or data[0] != 131:
+        return found
+
+    for key, pos in _map_items(data, 1):
+        if key in PEEK_KEYS:
+            found[key] = _read_simple_term(data, pos)
+        elif key == 'd' and guild_id:
+            for d_key, d_pos in _map_items(data, pos):
+                if d_key == 'guild_id':
+                    found['guild_id'] = _read_simple_term(data, d_pos)
+                    break
+
+        if PEEK_KEYS.issubset(found) and (not guild_id or 'guild_id' in found):
+            break
+    return found
+
+
+def _read_simple_term(data, pos):
+    """
+    Reads the integer, atom or binary term at `pos`, returning None for any
+    other (or malformed) term.
+    """
+    try:
+        tag = data[pos]
+        if tag == 97:  # SMALL_INTEGER_EXT
+            return data[pos + 1]
+        elif tag == 98:  # INTEGER_EXT
+            return struct.unpack_from('>i', data, pos + 1)[0]
+        elif tag == 110:  # SMALL_BIG_EXT
+            size, sign = data[pos + 1], data[pos + 2]
+            value = int.from_bytes(data[pos + 3:pos + 3 + size], 'little')
+            return -value if sign else value
+        elif tag == 109:  # BINARY_EXT
+            size, = struct.unpack_from('>I', data, pos + 1)
+            return bytes(data[pos + 5:pos + 5 + size]).decode('utf-8')
+        elif tag in (100, 118):  # ATOM_EXT, ATOM_UTF8_EXT
+            size, = struct.unpack_from('>H', data, pos + 1)
+            value = bytes(data[pos + 3:pos + 3 + size]).decode('utf-8')
+        elif tag in (115, 119):  # SMALL_ATOM_EXT, SMALL_ATOM_UTF8_EXT
+            size = data[pos + 1]
+            value = bytes(data[pos + 2:pos + 2 + size]).decode('utf-8')
+        else:
+            return None
+    except (IndexError, struct.error, UnicodeDecodeError):
+        return None
+
+    return None if value == 'nil' else value
+
+
 class ETFEncoder(BaseEncoder):
     TYPE = 'etf'
     OPCODE = ABNF.OPCODE_BINARY
+    DECODES_BYTES = True
+    PEEKS_GUILD_ID = True
 
     @staticmethod
     def encode(obj):
@@ -17,3 +137,22 @@ class ETFEncoder(BaseEncoder):
     @staticmethod
     def decode(obj):
         return decoder.loads(obj)
+
+    @staticmethod
+    def peek(obj, guild_id=False):
+        try:
+            found = _peek(obj, guild_id)
+        except (IndexError, ValueError, struct.error):
+            return None
+
+        op, seq, event = found.get('op'), found.get('s'), found.get('t')
+        if not isinstance(op, int):
+            return None
+
+        guild_id = found.get('guild_id')
+        return (
+            op,
+            seq if isinstance(seq, int) else None,
+            event if isinstance(event, str) else None,
+            int(guild_id) if isinstance(guild_id, (int, str)) and str(guild_id).isdigit() else None,
+        )
@@ -2,12 +2,25 @@ try:
     import ujson as json
 except ImportError:
     import json
+import re
 
 from disco.gateway.encoding.base import BaseEncoder
 
+# The top-level keys of a frame in the order Discord sends them, read with a
+#  single match. `d`, which always comes last, isn't scanned for its `guild_id`
+#  as doing so in Python costs more than decoding the whole frame
+PEEK_FRAME = r'\{\s*"t"\s*:\s*(?:"([A-Z0-9_]+)"|null)\s*,\s*"s"\s*:\s*(\d+|null)\s*,\s*"op"\s*:\s*(\d+)\s*,\s*"d"\s*:'
+
+# Compiled for both str and bytes payloads
+PEEK_RE = {
+    str: re.compile(PEEK_FRAME),
+    bytes: re.compile(PEEK_FRAME.encode('utf-8')),
+}
+
 
 class JSONEncoder(BaseEncoder):
     TYPE = 'json'
+    DECODES_BYTES = True
 
     @staticmethod
     def encode(obj):
@@ -16,3 +29,14 @@ class JSONEncoder(BaseEncoder):
     @staticmethod
     def decode(obj):
         return json.loads(obj)
+
+    @staticmethod
+    def peek(obj, guild_id=False):
+        match = PEEK_RE[str if isinstance(obj, str) else bytes].match(obj)
+        if not match:
+            return None
+
+        event, seq, op = (
+            value.decode('utf-8') if isinstance(value, bytes) else value for value in match.groups()
+        )
+        return int(op), int(seq) if seq != 'null' else None, event, None
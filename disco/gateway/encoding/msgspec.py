@@ -0,0 +1,18 @@
+from msgspec.json import Decoder, Encoder
+
+from disco.gateway.encoding.json import JSONEncoder
+
+encoder = Encoder()
+decoder = Decoder()
+
+
+class MsgspecEncoder(JSONEncoder):
+    TYPE = 'json'
+
+    @staticmethod
+    def encode(obj):
+        return encoder.encode(obj)
+
+    @staticmethod
+    def decode(obj):
+        return decoder.decode(obj)
@@ -0,0 +1,15 @@
+from orjson import dumps, loads, OPT_NON_STR_KEYS
+
+from disco.gateway.encoding.json import JSONEncoder
+
+
+class ORJSONEncoder(JSONEncoder):
+    TYPE = 'json'
+
+    @staticmethod
+    def encode(obj):
+        return dumps(obj, option=OPT_NON_STR_KEYS)
+
+    @staticmethod
+    def decode(obj):
+        return loads(obj)
@@ -58,17 +58,23 @@ class GatewayEvent(with_metaclass(GatewayEventMeta, Model)):
         """
         cls.raw_data = obj
 
-        # If this event is wrapping a model, pull its fields
+        # If this event is wrapping a model, build the model straight from the
+        #  payload, and only load the event's own fields on top of it
         if hasattr(cls, '_wraps_model'):
             alias, model = cls._wraps_model
 
-            data = {
-                k: obj.pop(k) for k in model._fields.keys() if k in obj
-            }
+            wrapped = cls.create_wrapped(model, obj, client)
+            obj = cls.__new__(cls)
+            obj.client = client
+            setattr(obj, alias, wrapped)
 
-            obj[alias] = data
-
-        obj = cls(obj, client)
+            own, shadowed = cls._get_wrapped_fields()
+            cls.load_into(obj, cls.raw_data, fields=own)
+            # Fields shared with the model are the model's, so they load as missing
+            cls.load_into(obj, {}, fields=shadowed)
+            obj.validate()
+        else:
+            obj = cls(obj, client)
 
         if cls._attach:
             for item in cls._attach:
@@ -80,6 +86,29 @@ class GatewayEvent(with_metaclass(GatewayEventMeta, Model)):
 
             return obj
 
+    @classmethod
+    def create_wrapped(cls, model, obj, client):
+        """
+        Builds the model wrapped by this event from the payload.
+        """
+        return model(obj, client)
+
+    @classmethod
+    def _get_wrapped_fields(cls):
+        """
+        Splits the fields of a model-wrapping event into those which are its own
+        and those which are shadowed by a field of the wrapped model.
+        """
+        fields = cls.__dict__.get('_split_fields')
+        if fields is None:
+            alias, model = cls._wraps_model
+            own, shadowed = {}, {}
+            for k, v in cls._fields.items():
+                if k != alias:
+                    (shadowed if k in model._fields else own)[k] = v
+            fields = cls._split_fields = (own, shadowed)
+        return fields
+
     def __getattr__(self, name):
         try:
             _proxy = object.__getattribute__(self, '_proxy')
@@ -201,6 +230,15 @@ class GuildCreate(GatewayEvent):
     unavailable = Field(bool)
     presences = ListField(Presence)
 
+    @classmethod
+    def create_wrapped(cls, model, obj, client):
+        # The state may keep the guild's collections (and presences) encoded
+        #  until they are first needed, see `StateConfig.lazy_guilds`
+        state = getattr(client, 'state', None)
+        if state and state.config.lazy_guilds and not obj.get('unavailable'):
+            return state.create_lazy_guild(obj)
+        return model(obj, client)
+
     @property
     def created(self):
         """
@@ -522,9 +560,22 @@ class MessageUpdate(GatewayEvent):
         The message being updated.
     guild_id : snowflake
         The ID of the guild this message exists in.
+    before : Optional[:class:`disco.types.message.Message`]
+        The message as it was cached before this update, if the state's
+        message cache is enabled and held it.
     """
     guild_id = Field(snowflake)
 
+    before = None
+
+    @classmethod
+    def create(cls, obj, client):
+        event = super(MessageUpdate, cls).create(obj, client)
+        # Edits only carry the changed fields, so the payload is kept per event
+        #  rather than only on the class
+        event.raw_data = obj
+        return event
+
 
 class MessageDelete(GatewayEvent):
     """
@@ -538,11 +589,15 @@ class MessageDelete(GatewayEvent):
         The ID of the channel the message was deleted in.
     guild_id : snowflake
         The ID of the guild this message existed in.
+    cached_message : Optional[:class:`disco.types.message.Message`]
+        The deleted message, if the state's message cache is enabled and held it.
     """
     id = Field(snowflake)
     channel_id = Field(snowflake)
     guild_id = Field(snowflake)
 
+    cached_message = None
+
     @property
     def channel(self):
         return self.client.state.channels.get(self.channel_id)
@@ -564,11 +619,15 @@ class MessageDeleteBulk(GatewayEvent):
         The channel the messages are being deleted in.
     ids : list[snowflake]
         List of messages being deleted in the channel.
+    cached_messages : list[:class:`disco.types.message.Message`]
+        The deleted messages which the state's message cache held, if enabled.
     """
     guild_id = Field(snowflake)
     channel_id = Field(snowflake)
     ids = ListField(snowflake)
 
+    cached_messages = ()
+
     @property
     def channel(self):
         return self.client.state.channels.get(self.channel_id)
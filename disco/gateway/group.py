@@ -0,0 +1,120 @@
+import gevent
+
+from disco.gateway.client import GatewayClient
+from disco.gateway.scheduler import IdentifyCoordinator
+from disco.util.logging import LoggingClass
+from disco.util.metrics import LatencyTracker
+from disco.util.snowflake import calculate_shard
+
+
+class ShardGroup(LoggingClass):
+    """
+    Runs several shards in a single process. Every shard has its own
+    `GatewayClient` (and websocket connection), while they all share the
+    client's `State`, `APIClient` (and thus its rate limiter) and emitters.
+
+    A `ShardGroup` stands in for the client's `GatewayClient` (as `client.gw`)
+    when `ClientConfig.shard_ids` is set. Sends which target a guild are routed
+    to the shard responsible for it, other sends (e.g. presence updates) go to
+    every shard. Received packets are tagged with the `shard_id` they arrived on.
+
+    Parameters
+    ----------
+    client : :class:`disco.client.Client`
+        The client the shards share.
+    shard_ids : list(int)
+        The shards to run in this process.
+    shard_count : int
+        The total number of shards.
+
+    Attributes
+    ----------
+    shards : dict(int, :class:`GatewayClient`)
+        The gateway client of every shard in this group.
+    identify_coordinator : :class:`IdentifyCoordinator`
+        Paces the IDENTIFYs of the shards in this group.
+    """
+    def __init__(self, client, shard_ids, shard_count):
+        super(ShardGroup, self).__init__()
+        self.client = client
+        self.shard_count = int(shard_count)
+        self.events = client.events
+        self.packets = client.packets
+
+        self.shards = {
+            int(shard_id): GatewayClient(
+                client,
+                client.config.max_reconnects,
+                client.config.encoder,
+                client.config.compression,
+                shard_id=shard_id,
+                shard_count=shard_count,
+            ) for shard_id in shard_ids
+        }
+
+        # Updated with the session start limit when the group is run
+        self.identify_coordinator = IdentifyCoordinator()
+        for gw in self.shards.values():
+            gw.identify_coordinator = self.identify_coordinator
+
+    def for_guild(self, guild_id):
+        """
+        The gateway client of the shard responsible for the given guild.
+        """
+        shard_id = calculate_shard(self.shard_count, int(guild_id))
+        if shard_id not in self.shards:
+            raise KeyError(f'Guild {guild_id} belongs to shard {shard_id}, which is not part of this group')
+        return self.shards[shard_id]
+
+    @property
+    def session_id(self):
+        """
+        The session id of the first shard, for compatibility with `GatewayClient`.
+        Use `for_guild` to check whether a given guild's shard is connected.
+        """
+        return self.shards[min(self.shards)].session_id
+
+    @property
+    def metrics(self):
+        return {shard_id: gw.metrics for shard_id, gw in self.shards.items()}
+
+    @property
+    def latency(self):
+        return {shard_id: gw.latency for shard_id, gw in self.shards.items()}
+
+    def heartbeat_stats(self):
+        """
+        Heartbeat latency of every shard in this group, along with an aggregate
+        over all of them (under the `all` key), see `LatencyTracker`.
+        """
+        stats = {shard_id: gw.heartbeats.to_dict() for shard_id, gw in self.shards.items()}
+        stats['all'] = LatencyTracker.aggregate(stats.values())
+        return stats
+
+    def send(self, op, data):
+        if isinstance(data, dict) and data.get('guild_id'):
+            return self.for_guild(data['guild_id']).send(op, data)
+
+        for gw in self.shards.values():
+            gw.send(op, data)
+
+    def request_guild_members(self, guild_id, *args, **kwargs):
+        self.for_guild(guild_id).request_guild_members(guild_id, *args, **kwargs)
+
+    def request_guild_members_by_id(self, guild_id, *args, **kwargs):
+        self.for_guild(guild_id).request_guild_members_by_id(guild_id, *args, **kwargs)
+
+    def start_recording(self, path):
+        for shard_id, gw in self.shards.items():
+            gw.start_recording(path.format(shard_id=shard_id))
+
+    def stop_recording(self):
+        for gw in self.shards.values():
+            gw.stop_recording()
+
+    def run(self):
+        max_concurrency = self.client.api.gateway_bot_get().get('session_start_limit', {}).get('max_concurrency', 1)
+        self.identify_coordinator.max_concurrency = max(1, int(max_concurrency))
+
+        self.log.info(f'Starting shards {sorted(self.shards)} of {self.shard_count}')
+        gevent.joinall([gevent.spawn(gw.run) for gw in self.shards.values()])
@@ -0,0 +1,282 @@
+"""
+Utilities for recording raw gateway traffic to an on-disk journal, and replaying
+a recorded journal through a network-less client for benchmarking.
+
+A journal can be replayed from the command line like so:
+
+`python -m disco.gateway.recorder gateway.journal`
+"""
+import gevent
+import struct
+import sys
+import time
+
+from collections import defaultdict
+
+from disco.gateway.packets import OPCode, RECV
+from disco.util.emitter import Priority
+from disco.util.logging import LoggingClass
+
+JOURNAL_MAGIC = b'DGWJ'
+JOURNAL_VERSION = 1
+
+# kind (uint8), arrival timestamp in ns (uint64), length (uint32)
+FRAME_HEADER = struct.Struct('<BQI')
+
+
+class FrameKind:
+    # Marks a (re)opened websocket connection, the decompression context is reset
+    OPEN = 0
+    TEXT = 1
+    BINARY = 2
+
+
+class GatewayRecorder:
+    """
+    Appends every raw inbound gateway frame (before any decompression) and its
+    arrival timestamp to a compact binary journal.
+
+    Parameters
+    ----------
+    path : str
+        The path of the journal file to write.
+    encoder : str
+        The encoder type (e.g. 'json' or 'etf') frames are encoded with.
+    compression : str
+        The transport compression frames are sent with, or an empty string.
+
+    Attributes
+    ----------
+    frames : int
+        The number of frames written to the journal.
+    """
+    def __init__(self, path, encoder, compression):
+        self.path = path
+        self.frames = 0
+
+        self._file = open(path, 'wb')
+        self._file.write(JOURNAL_MAGIC + struct.pack('<B', JOURNAL_VERSION))
+        for value in (encoder, compression):
+            value = value.encode('utf-8')
+            self._file.write(struct.pack('<B', len(value)) + value)
+
+    def mark_open(self):
+        self._file.write(FRAME_HEADER.pack(FrameKind.OPEN, time.time_ns(), 0))
+
+    def write(self, msg):
+        if isinstance(msg, str):
+            kind, msg = FrameKind.TEXT, msg.encode('utf-8')
+        else:
+            kind = FrameKind.BINARY
+
+        self._file.write(FRAME_HEADER.pack(kind, time.time_ns(), len(msg)))
+        self._file.write(msg)
+        self.frames += 1
+
+    def close(self):
+        self._file.flush()
+        self._file.close()
+
+
+def _read_header(f):
+    if f.read(4) != JOURNAL_MAGIC:
+        raise ValueError(f'{f.name} is not a gateway journal')
+
+    version, = struct.unpack('<B', f.read(1))
+    if version != JOURNAL_VERSION:
+        raise ValueError(f'Unsupported gateway journal version {version}')
+
+    header = []
+    for _ in range(2):
+        size, = struct.unpack('<B', f.read(1))
+        header.append(f.read(size).decode('utf-8'))
+    return header
+
+
+def read_journal(path):
+    """
+    Reads a journal written by `GatewayRecorder`.
+
+    Returns
+    -------
+    tuple(str, str, generator)
+        The encoder type, transport compression and a generator of
+        (kind, timestamp_ns, frame) tuples.
+    """
+    f = open(path, 'rb')
+    try:
+        header = _read_header(f)
+    except Exception:
+        f.close()
+        raise
+
+    def _frames():
+        with f:
+            while True:
+                raw = f.read(FRAME_HEADER.size)
+                if len(raw) < FRAME_HEADER.size:
+                    return
+
+                kind, timestamp, size = FRAME_HEADER.unpack(raw)
+                frame = f.read(size)
+                if kind == FrameKind.TEXT:
+                    frame = frame.decode('utf-8')
+                yield kind, timestamp, frame
+
+    return header[0], header[1], _frames()
+
+
+def _peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class NullWebsocket:
+    """
+    Stand-in for `disco.util.websocket.Websocket` which discards all sends, used
+    so the gateway client can be driven without a network connection.
+    """
+    is_closed = False
+
+    def send(self, *args, **kwargs):
+        pass
+
+    def close(self, *args, **kwargs):
+        pass
+
+
+class GatewayReplayer(LoggingClass):
+    """
+    Feeds a recorded journal through `GatewayClient.on_message` (and thus the
+    dispatch handlers and `State`) of a client at full speed.
+
+    Parameters
+    ----------
+    client : :class:`disco.client.Client`
+        The client to replay into. Its gateway encoder and compression must
+        match those the journal was recorded with.
+    """
+    def __init__(self, client):
+        super(GatewayReplayer, self).__init__()
+        self.client = client
+        self._current = None
+        self._decode_ns = 0
+        self.client.packets.on((RECV, OPCode.DISPATCH), self._on_dispatch, priority=Priority.BEFORE)
+
+    def _on_dispatch(self, packet):
+        self._current = packet['t']
+        self._decode_ns = packet.get('decode_ns', 0)
+
+    def replay(self, path):
+        """
+        Replays the journal at the given path.
+
+        Returns
+        -------
+        dict
+            Replay statistics: frame and event counts, total duration, events/sec,
+            peak RSS (in kilobytes, None where unavailable) and per-event-type
+            count, handling time and the part of it spent decoding.
+        """
+        _, _, frames = read_journal(path)
+        gw = self.client.gw
+        gw.ws = NullWebsocket()
+
+        per_event = defaultdict(lambda: [0, 0, 0])
+        frame_count = 0
+        event_count = 0
+
+        start = time.perf_counter_ns()
+        for kind, _, frame in frames:
+            if kind == FrameKind.OPEN:
+                gw.on_open()
+                continue
+
+            # A stream recorded mid-connection can't be inflated until the next open
+            if gw.decompressor and not gw.decompressor.ready:
+                continue
+
+            frame_count += 1
+            self._current = None
+            frame_start = time.perf_counter_ns()
+            gw.on_message(frame)
+            # Dispatch handlers run on spawned greenlets, wait for them to finish
+            gevent.idle()
+            elapsed = time.perf_counter_ns() - frame_start
+
+            # No network, the heartbeater would only ever time out
+            if gw._heartbeat_task:
+                gw._heartbeat_task.kill()
+                gw._heartbeat_task = None
+
+            if self._current:
+                event_count += 1
+                per_event[self._current][0] += 1
+                per_event[self._current][1] += elapsed
+                per_event[self._current][2] += self._decode_ns
+
+        duration = (time.perf_counter_ns() - start) / 1e9
+
+        return {
+            'frames': frame_count,
+            'events': event_count,
+            'duration': duration,
+            'events_per_second': event_count / duration if duration else 0,
+            'peak_rss_kb': _peak_rss_kb(),
+            'event_types': {
+                name: {
+                    'count': count,
+                    'total_ms': total / 1e6,
+                    'mean_us': total / count / 1e3,
+                    'decode_ms': decode / 1e6,
+                    'decode_mean_us': decode / count / 1e3,
+                } for name, (count, total, decode) in per_event.items()
+            },
+        }
+
+
+def replay(path, state=None):
+    """
+    Builds a network-less client matching the journal at the given path and
+    replays the journal into it.
+
+    Parameters
+    ----------
+    path : str
+        The journal to replay.
+    state : Optional[dict]
+        `StateConfig` options for the replay client.
+    """
+    from disco.client import Client, ClientConfig
+
+    with open(path, 'rb') as f:
+        encoder, compression = _read_header(f)
+
+    client = Client(ClientConfig({
+        'encoder': encoder,
+        'compression': compression or False,
+        'state': state or {},
+    }))
+    return GatewayReplayer(client).replay(path)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Replay a recorded gateway journal')
+    parser.add_argument('journal', help='Path to the journal to replay')
+    args = parser.parse_args()
+
+    stats = replay(args.journal)
+    rss = stats['peak_rss_kb']
+    sys.stdout.write('{} frames, {} events in {:.2f}s ({:.0f} events/sec), peak RSS {}\n'.format(
+        stats['frames'], stats['events'], stats['duration'], stats['events_per_second'],
+        f'{rss} KB' if rss is not None else 'n/a'))
+
+    for name, info in sorted(stats['event_types'].items(), key=lambda i: -i[1]['total_ms']):
+        sys.stdout.write('  {:<36} {:>8} {:>12.2f}ms {:>10.1f}us/event {:>10.1f}us/decode\n'.format(
+            name, info['count'], info['total_ms'], info['mean_us'], info['decode_mean_us']))
@@ -0,0 +1,185 @@
+import gevent
+import time
+
+from collections import defaultdict, deque
+from gevent.event import Event
+from gevent.lock import Semaphore
+
+from disco.gateway.packets import OPCode
+from disco.util.limiter import SlidingWindowLimiter
+from disco.util.logging import LoggingClass
+
+
+class SendLane:
+    PRIORITY = 'priority'
+    PRESENCE = 'presence'
+    DEFAULT = 'default'
+    MEMBERS = 'members'
+
+    # Queued lanes, in the order they are drained
+    QUEUED = (PRESENCE, DEFAULT, MEMBERS)
+
+
+LANE_OPCODES = {
+    OPCode.HEARTBEAT: SendLane.PRIORITY,
+    OPCode.IDENTIFY: SendLane.PRIORITY,
+    OPCode.RESUME: SendLane.PRIORITY,
+    OPCode.STATUS_UPDATE: SendLane.PRESENCE,
+    OPCode.REQUEST_GUILD_MEMBERS: SendLane.MEMBERS,
+}
+
+
+class GatewaySendScheduler(LoggingClass):
+    """
+    Schedules gateway sends against Discord's per-connection send budget, split
+    into lanes:
+
+    - `priority`: HEARTBEAT, IDENTIFY and RESUME are sent immediately and may use
+      a reserved part of the budget which the other lanes can't touch.
+    - `presence`: status updates, only the most recent pending update is kept.
+    - `default`: everything else, in order.
+    - `members`: REQUEST_GUILD_MEMBERS, drained only once the other lanes are empty.
+
+    Queued lanes are only drained while the scheduler is running, i.e. once the
+    session is established (READY/RESUMED) and until the connection closes.
+
+    Parameters
+    ----------
+    send : function
+        Function taking (op, data) which performs the actual send.
+    limit : int
+        The number of sends allowed within any `per` seconds. Priority sends
+        are never held back, so they may briefly exceed it if they don't fit
+        into the reserved part of the budget.
+    per : int
+        The budget window, in seconds.
+    reserved : int
+        Sends of every window kept back for the priority lane, the queued lanes
+        share the other `limit - reserved`.
+    """
+    def __init__(self, send, limit=120, per=60, reserved=5):
+        super(GatewaySendScheduler, self).__init__()
+        self._send = send
+        self.budget = SlidingWindowLimiter(limit, per)
+        self.queued_budget = SlidingWindowLimiter(limit - reserved, per)
+        self.reserved = reserved
+
+        self.lanes = {lane: deque() for lane in SendLane.QUEUED}
+        self.sent = {lane: 0 for lane in (SendLane.PRIORITY, ) + SendLane.QUEUED}
+        self.coalesced = 0
+
+        self._running = Event()
+        self._pending = Event()
+        self._worker = gevent.spawn(self._run)
+
+    def start(self):
+        self._running.set()
+
+    def pause(self):
+        self._running.clear()
+
+    def clear(self):
+        """
+        Drops all queued sends.
+        """
+        for queue in self.lanes.values():
+            queue.clear()
+
+    def send(self, op, data):
+        lane = LANE_OPCODES.get(op, SendLane.DEFAULT)
+
+        if lane == SendLane.PRIORITY:
+            self.budget.acquire()
+            self.sent[lane] += 1
+            return self._send(op, data)
+
+        queue = self.lanes[lane]
+        if lane == SendLane.PRESENCE and queue:
+            queue[-1] = (op, data)
+            self.coalesced += 1
+        else:
+            queue.append((op, data))
+        self._pending.set()
+
+    def try_acquire(self):
+        """
+        Takes a slot of the budget for a queued send, if one is free.
+        """
+        if self.budget.available() < 1 or self.queued_budget.available() < 1:
+            return False
+
+        self.budget.acquire()
+        self.queued_budget.acquire()
+        return True
+
+    def delay(self):
+        """
+        Seconds until a queued send can take a slot of the budget.
+        """
+        return max(self.budget.delay(), self.queued_budget.delay())
+
+    def _next(self):
+        for lane in SendLane.QUEUED:
+            if self.lanes[lane]:
+                return lane
+        return None
+
+    def _run(self):
+        while True:
+            self._pending.wait()
+            self._running.wait()
+
+            lane = self._next()
+            if not lane:
+                self._pending.clear()
+                continue
+
+            if not self.try_acquire():
+                gevent.sleep(self.delay())
+                continue
+
+            op, data = self.lanes[lane].popleft()
+            try:
+                self._send(op, data)
+                self.sent[lane] += 1
+            except Exception:
+                self.log.exception(f'Failed to send queued {lane} payload (op {op}): ')
+
+    def stats(self):
+        return {
+            'running': self._running.is_set(),
+            'available': min(self.budget.available(), self.queued_budget.available()),
+            'queued': {lane: len(queue) for lane, queue in self.lanes.items()},
+            'sent': dict(self.sent),
+            'coalesced': self.coalesced,
+        }
+
+
+class IdentifyCoordinator:
+    """
+    Paces IDENTIFYs across shards according to Discord's session start limit,
+    which allows one IDENTIFY every 5 seconds per rate limit bucket, where a
+    shard's bucket is `shard_id % max_concurrency`.
+
+    Parameters
+    ----------
+    max_concurrency : int
+        The `max_concurrency` of the bot's session start limit.
+    """
+    IDENTIFY_INTERVAL = 5
+
+    def __init__(self, max_concurrency=1):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._locks = defaultdict(Semaphore)
+        self._last = defaultdict(float)
+
+    def acquire(self, shard_id):
+        """
+        Blocks until the given shard is allowed to IDENTIFY.
+        """
+        bucket = int(shard_id) % self.max_concurrency
+        with self._locks[bucket]:
+            delay = self._last[bucket] + self.IDENTIFY_INTERVAL - time.monotonic()
+            if delay > 0:
+                gevent.sleep(delay)
+            self._last[bucket] = time.monotonic()
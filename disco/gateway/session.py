@@ -0,0 +1,87 @@
+import json
+import os
+import tempfile
+import time
+
+from disco.util.logging import LoggingClass
+
+
+class SessionStore(LoggingClass):
+    """
+    Persists the resumable parts of a gateway session (session id, sequence
+    and resume gateway URL) to a JSON file, so that a fresh process can RESUME
+    the previous process's session instead of sending a new IDENTIFY.
+
+    Writes are atomic: the state is written to a temporary file in the same
+    directory which then replaces the store.
+
+    Parameters
+    ----------
+    path : str
+        The path of the store file.
+    max_age : int
+        Saved sessions older than this many seconds are ignored on load, as
+        Discord will have invalidated them by then.
+    """
+    def __init__(self, path, max_age=120):
+        super(SessionStore, self).__init__()
+        self.path = path
+        self.max_age = max_age
+
+    def load(self, shard_id, shard_count):
+        """
+        Loads a saved session for the given shard.
+
+        Returns
+        -------
+        Optional[dict]
+            The saved `session_id`, `seq` and `resume_gateway_url`, or None if
+            there is no usable saved session.
+        """
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self.log.warning(f'Failed to load gateway session from {self.path}: {e}')
+            return None
+
+        if data.get('shard') != [int(shard_id), int(shard_count)]:
+            return None
+
+        if time.time() - data.get('saved_at', 0) > self.max_age:
+            self.log.info('Saved gateway session is too old to resume')
+            return None
+
+        if not data.get('session_id') or not data.get('seq'):
+            return None
+
+        return data
+
+    def save(self, session_id, seq, resume_gateway_url, shard_id, shard_count):
+        data = {
+            'session_id': session_id,
+            'seq': seq,
+            'resume_gateway_url': resume_gateway_url,
+            'shard': [int(shard_id), int(shard_count)],
+            'saved_at': time.time(),
+        }
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.session-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except Exception:
+            os.unlink(tmp)
+            raise
+
+    def clear(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
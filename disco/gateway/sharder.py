@@ -7,7 +7,9 @@ from disco.client import Client
 from disco.bot import Bot, BotConfig
 from disco.api.client import APIClient
 from disco.gateway.ipc import GIPCProxy
+from disco.gateway.scheduler import IdentifyCoordinator
 from disco.util.logging import setup_logging, LOG_FORMAT
+from disco.util.metrics import LatencyTracker
 from disco.util.snowflake import calculate_shard
 from disco.util.serializer import dump_function, load_function
 
@@ -23,9 +25,22 @@ def run_shard(config, shard_id, pipe):
     bot = Bot(client, BotConfig(config.bot))
     bot.sharder = GIPCProxy(bot, pipe)
     bot.shards = ShardHelper(config.shard_count, bot)
+    client.gw.identify_coordinator = RemoteIdentifyCoordinator(bot.sharder)
     bot.run_forever()
 
 
+class RemoteIdentifyCoordinator:
+    """
+    Proxies `IdentifyCoordinator.acquire` calls to the `AutoSharder` process,
+    so IDENTIFYs (including re-identifies) are paced across all shard processes.
+    """
+    def __init__(self, sharder):
+        self.sharder = sharder
+
+    def acquire(self, shard_id):
+        self.sharder.call(('identify_coordinator', 'acquire'), shard_id).wait()
+
+
 class ShardHelper:
     def __init__(self, count, bot):
         self.count = count
@@ -57,25 +72,41 @@ class ShardHelper:
         shard = calculate_shard(self.count, sid)
         return self.on(shard, func)
 
+    def heartbeat_stats(self, timeout=None):
+        """
+        Gateway heartbeat latency of every shard, along with an aggregate over
+        all shards (under the `all` key), see `LatencyTracker`.
+        """
+        stats = self.all(lambda bot: bot.client.gw.heartbeats.to_dict(), timeout=timeout)
+        stats['all'] = LatencyTracker.aggregate(stats.values())
+        return stats
+
 
 class AutoSharder:
     def __init__(self, config):
         self.config = config
         self.client = APIClient(config.token)
         self.shards = {}
-        self.config.shard_count = self.client.gateway_bot_get()['shards'] if not hasattr(config, 'shard_count') else config.shard_count
+
+        gateway = self.client.gateway_bot_get()
+        self.config.shard_count = gateway['shards'] if not hasattr(config, 'shard_count') else config.shard_count
+        self.max_concurrency = gateway.get('session_start_limit', {}).get('max_concurrency', 1)
+        self.identify_coordinator = IdentifyCoordinator(self.max_concurrency)
 
     def run_on(self, sid, raw):
         func = load_function(raw)
         return self.shards[sid].execute(func).wait(timeout=15)
 
     def run(self):
+        # Shards start in waves of one shard per identify bucket, the coordinator
+        #  does the actual pacing (and also covers later re-identifies)
         for shard_id in range(self.config.shard_count):
             if self.config.manhole_enable and shard_id != 0:
                 self.config.manhole_enable = False
 
             self.start_shard(shard_id)
-            gevent.sleep(6)
+            if (shard_id + 1) % self.max_concurrency == 0:
+                gevent.sleep(IdentifyCoordinator.IDENTIFY_INTERVAL)
 
         setup_logging(
             level=logging.INFO,
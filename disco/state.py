@@ -1,12 +1,31 @@
-from collections import deque, namedtuple
-from gevent.event import Event
+from array import array
+from collections import OrderedDict, namedtuple
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta, UTC
+from gevent.event import AsyncResult, Event
+import gevent
+import heapq
+import functools
+import itertools
+import sys
+import time
 import weakref
+import zlib
 
 from disco.types.channel import Thread, Channel
+from disco.types.guild import Guild, GuildEmoji, GuildMember, GuildMemberFlagValue
+from disco.types.message import Message
+from disco.gateway.packets import OPCode, RECV
+from disco.types.user import Presence, User
+from disco.types.voice import VoiceState
+from disco.util.buffer import IndexedBuffer
 from disco.util.config import Config
 from disco.util.string import underscore
-from disco.util.hashmap import HashMap, DefaultHashMap
+from disco.util.hashmap import HashMap, BoundedHashMap, DefaultHashMap, IndexedHashMap, LazyHashMap
 from disco.util.emitter import Priority
+from disco.util.logging import LoggingClass
+from disco.util.metrics import deep_sizeof
+from disco.util.snapshot import SnapshotReader, SnapshotWriter
 
 
 class StackMessage(namedtuple('StackMessage', ['id', 'channel_id', 'author_id'])):
@@ -36,12 +55,13 @@ class StateConfig(Config):
         Message tracking allows for multiple higher-level shortcuts and can be
         highly useful when developing bots that need to delete their own messages.
 
-        Message tracking is implemented using a deque and a namedtuple, meaning
-        it should generally not have a high impact on memory, however users who
+        Message tracking is implemented using an `IndexedBuffer` (a bounded
+        buffer indexed by message id) and a namedtuple, meaning it should
+        generally not have a high impact on memory, however users who
         find that they do not need and may be experiencing memory pressure can
         disable this feature entirely using this attribute.
     track_messages_size : int
-        The size of the messages deque for each channel. This value can be used
+        The size of the messages buffer for each channel. This value can be used
         to calculate the total number of possible `StackMessage` objects kept in
         memory, simply: `total_messages_size * total_channels`. This value can
         be tweaked based on usage and to help prevent memory pressure.
@@ -51,12 +71,931 @@ class StateConfig(Config):
         50 guilds will notice this operation can take a while to complete, and may want
         to batch requests using the underlying `GatewayClient.request_guild_members`
         interface.
+    sync_guild_members_on_startup : bool
+        If true, guilds with missing members are queued on the `GuildMemberSync`
+        scheduler when they are loaded.
+    sync_guild_members_max_inflight : int
+        The maximum number of guild member requests awaiting their chunks at once.
+    sync_guild_members_timeout : int
+        Seconds after which an incomplete guild member request is retried.
+    resolve_members_window : float
+        Seconds `MemberResolver` collects member cache misses for a guild before
+        requesting them in a single gateway request.
+    resolve_members_timeout : int
+        Seconds after which unanswered `MemberResolver` lookups resolve to None.
+    compact_members_threshold : int
+        If set, guilds with at least this many members keep their members in a
+        `CompactMemberStore` rather than a dict of `GuildMember` objects.
+    cache_users_size : int
+        If set, at most this many users are cached, least recently used users
+        are evicted first (the current user is never evicted).
+    cache_users_ttl : int
+        If set, users which weren't used for this many seconds are evicted.
+    cache_members_size : int
+        If set, at most this many members are cached per guild, least recently
+        used members are evicted first. Members in a voice channel and the
+        current user are never evicted. Doesn't apply to guilds using a
+        `CompactMemberStore`.
+    cache_members_ttl : int
+        If set, members which weren't used for this many seconds are evicted.
+    lazy_guilds : bool
+        If true, the collections of a guild (channels, roles, members, etc.) and
+        its presences are kept encoded when it is created, and only built the
+        first time one of them is used or an event for the guild arrives. Until
+        then, the guild's objects are missing from the state-wide collections
+        (e.g. `State.channels`).
+    cache_messages_size : int
+        If set, the contents of up to this many recent messages are cached per
+        channel in a `MessageCache`, which edits, deletes and reactions keep up
+        to date. Events for edited and deleted messages then carry the message
+        as it was cached (see `MessageUpdate.before`, `MessageDelete.cached_message`
+        and `MessageDeleteBulk.cached_messages`).
+    cache_messages_max_bytes : int
+        If set, the approximate number of bytes the message cache may use
+        across all channels. Once exceeded, the oldest messages of the least
+        recently active channels are evicted.
+    compact_presences : bool
+        If true, presences are kept in a `PresenceStore` (as `State.presences`)
+        which is updated straight from the raw PRESENCE_UPDATE payloads, and
+        the state no longer builds `PresenceUpdate` events or sets `User.presence`.
+    compact_presences_activity : bool
+        Whether the `PresenceStore` keeps the primary activity of every user.
     """
     track_messages = False
     track_messages_size = 100
 
     sync_guild_members = True
     sync_guild_members_on_startup = True
+    sync_guild_members_max_inflight = 4
+    sync_guild_members_timeout = 60
+
+    resolve_members_window = 0.05
+    resolve_members_timeout = 10
+
+    compact_members_threshold = 0
+
+    cache_users_size = 0
+    cache_users_ttl = 0
+    cache_members_size = 0
+    cache_members_ttl = 0
+
+    lazy_guilds = False
+
+    cache_messages_size = 0
+    cache_messages_max_bytes = 0
+
+    compact_presences = False
+    compact_presences_activity = False
+
+
+class GuildMemberSync(LoggingClass):
+    """
+    Schedules the requests used to fill the member cache of guilds as they load.
+    Only a handful of requests are outstanding at any one time, and completion
+    is tracked by nonce and `chunk_index`/`chunk_count` of the resulting
+    `GuildMembersChunk` events. Smaller guilds, and guilds which see activity
+    while queued, are synced first.
+
+    Attributes
+    ----------
+    queued : dict(snowflake, tuple)
+        Guilds waiting to be requested, mapped to their current priority.
+    inflight : dict(str, dict)
+        Outstanding requests keyed by nonce.
+    completed : int
+        The number of guilds which finished syncing.
+    """
+    def __init__(self, state):
+        super(GuildMemberSync, self).__init__()
+        self.state = state
+        self.queued = {}
+        self.inflight = {}
+        self.completed = 0
+        self.retried = 0
+
+        self._heap = []
+        self._counter = itertools.count()
+        self._wake = Event()
+        self._worker = None
+
+    def queue(self, guild):
+        """
+        Queues a guild to have its members requested.
+        """
+        if guild.id in self.queued or any(i['guild_id'] == guild.id for i in self.inflight.values()):
+            return
+
+        self._push(guild.id, (1, guild.member_count or 0, next(self._counter)))
+
+        if not self._worker:
+            self._worker = gevent.spawn(self._run)
+
+    def prioritize(self, guild_id):
+        """
+        Moves a queued guild to the front of the queue, e.g. when it sees activity.
+        """
+        priority = self.queued.get(guild_id)
+        if priority and priority[0]:
+            self._push(guild_id, (0, ) + priority[1:])
+
+    def _push(self, guild_id, priority):
+        self.queued[guild_id] = priority
+        heapq.heappush(self._heap, (priority, guild_id))
+        self._wake.set()
+
+    def _pop(self):
+        while self._heap:
+            priority, guild_id = heapq.heappop(self._heap)
+            # Entries are invalidated lazily when a guild is re-prioritized
+            if self.queued.get(guild_id) == priority:
+                del self.queued[guild_id]
+                return guild_id
+        return None
+
+    def on_chunk(self, event):
+        request = self.inflight.get(event.nonce)
+        if not request:
+            return
+
+        request['chunks'] += 1
+        request['chunk_count'] = event.chunk_count
+        if event.chunk_index >= event.chunk_count - 1 or request['chunks'] >= event.chunk_count:
+            del self.inflight[event.nonce]
+            self.completed += 1
+            self._wake.set()
+
+    def _expire(self):
+        now = time.monotonic()
+        for nonce, request in tuple(self.inflight.items()):
+            if now - request['started'] > self.state.config.sync_guild_members_timeout:
+                self.log.debug(f'Member sync for guild {request["guild_id"]} timed out, retrying')
+                del self.inflight[nonce]
+                self.retried += 1
+                if request['guild_id'] in self.state.guilds:
+                    self.queue(self.state.guilds[request['guild_id']])
+
+    def _run(self):
+        while True:
+            self._wake.wait(timeout=5)
+            self._wake.clear()
+            self._expire()
+
+            while self.queued and len(self.inflight) < self.state.config.sync_guild_members_max_inflight:
+                guild_id = self._pop()
+                if guild_id is None or guild_id not in self.state.guilds:
+                    continue
+
+                nonce = f'sync:{next(self._counter)}'
+                self.inflight[nonce] = {
+                    'guild_id': guild_id,
+                    'started': time.monotonic(),
+                    'chunks': 0,
+                    'chunk_count': None,
+                }
+                self.state.guilds[guild_id].request_guild_members(nonce=nonce)
+
+    def progress(self):
+        return {
+            'queued': len(self.queued),
+            'inflight': len(self.inflight),
+            'completed': self.completed,
+            'retried': self.retried,
+            'chunks': {
+                request['guild_id']: (request['chunks'], request['chunk_count'])
+                for request in self.inflight.values()
+            },
+        }
+
+
+class MemberResolver(LoggingClass):
+    """
+    Resolves members missing from the cache over the gateway. Lookups for a
+    guild made within `StateConfig.resolve_members_window` seconds of each
+    other are coalesced into nonce-tagged requests of up to `MAX_USER_IDS`
+    users, and every lookup is resolved from the matching `GuildMembersChunk`,
+    or with None once its request completed without the member or timed out.
+
+    Attributes
+    ----------
+    pending : dict(snowflake, dict(snowflake, AsyncResult))
+        Lookups waiting for their guild's window to close.
+    inflight : dict(str, dict)
+        Sent requests keyed by nonce.
+    resolved : int
+        The number of lookups resolved with a member.
+    timed_out : int
+        The number of requests which timed out.
+    """
+    MAX_USER_IDS = 100
+
+    def __init__(self, state):
+        super(MemberResolver, self).__init__()
+        self.state = state
+        self.pending = {}
+        self.inflight = {}
+        self.resolved = 0
+        self.timed_out = 0
+
+        self._counter = itertools.count()
+
+    def resolve(self, guild_id, user_id):
+        """
+        Looks up a guild member over the gateway.
+
+        Returns
+        -------
+        `AsyncResult`
+            Resolves to the :class:`disco.types.guild.GuildMember`, or None if
+            the member wasn't found.
+        """
+        # Lookups of a member which was already requested share its result
+        for request in self.inflight.values():
+            if request['guild_id'] == guild_id and user_id in request['results']:
+                return request['results'][user_id]
+
+        pending = self.pending.get(guild_id)
+        if pending is None:
+            pending = self.pending[guild_id] = {}
+            gevent.spawn_later(self.state.config.resolve_members_window, self._flush, guild_id)
+
+        if user_id not in pending:
+            pending[user_id] = AsyncResult()
+        result = pending[user_id]
+
+        if len(pending) >= self.MAX_USER_IDS:
+            self._flush(guild_id)
+        return result
+
+    def _flush(self, guild_id):
+        pending = self.pending.pop(guild_id, None)
+        if not pending:
+            return
+
+        user_ids = list(pending)
+        for i in range(0, len(user_ids), self.MAX_USER_IDS):
+            batch = user_ids[i:i + self.MAX_USER_IDS]
+            nonce = f'resolve:{next(self._counter)}'
+            self.inflight[nonce] = {
+                'guild_id': guild_id,
+                'results': {user_id: pending[user_id] for user_id in batch},
+                'chunks': 0,
+            }
+            gevent.spawn_later(self.state.config.resolve_members_timeout, self._complete, nonce, True)
+
+            try:
+                self.state.client.gw.request_guild_members_by_id(guild_id, batch, nonce=nonce)
+            except Exception:
+                self.log.exception(f'Failed to request members of guild {guild_id}: ')
+                self._complete(nonce)
+
+    def on_chunk(self, event):
+        request = self.inflight.get(event.nonce)
+        if not request:
+            return
+
+        for member in event.members:
+            result = request['results'].pop(member.id, None)
+            if result is not None:
+                result.set(member)
+                self.resolved += 1
+
+        chunk_count = event.chunk_count or 1
+        request['chunks'] += 1
+        if (event.chunk_index or 0) >= chunk_count - 1 or request['chunks'] >= chunk_count:
+            self._complete(event.nonce)
+
+    def _complete(self, nonce, timed_out=False):
+        request = self.inflight.pop(nonce, None)
+        if not request:
+            return
+
+        if timed_out:
+            self.log.debug(f'Member lookup {nonce} for guild {request["guild_id"]} timed out')
+            self.timed_out += 1
+
+        for result in request['results'].values():
+            result.set(None)
+
+
+class CompactPresence(namedtuple('CompactPresence', ['status', 'client_status', 'activity'])):
+    """
+    A user's presence as kept by the `PresenceStore`.
+
+    Attributes
+    ----------
+    status : str
+        The user's status, one of `online`, `idle`, `dnd` or `offline`.
+    client_status : tuple(str, str, str)
+        The user's status on desktop, mobile and web, None where they aren't
+        connected.
+    activity : Optional[tuple(int, str, str, str)]
+        The type, name, state and details of the user's primary activity, if
+        activities are tracked (see `StateConfig.compact_presences_activity`).
+    """
+
+
+OFFLINE_PRESENCE = CompactPresence('offline', (None, None, None), None)
+
+
+def _presence_value(value):
+    value = getattr(value, 'value', value)
+    return sys.intern(value.lower()) if isinstance(value, str) else value
+
+
+class PresenceStore(LoggingClass):
+    """
+    Keeps the presences of users as `CompactPresence` tuples keyed by user id,
+    updated straight from raw PRESENCE_UPDATE payloads. Users without a stored
+    presence are offline, so offline presences aren't stored at all.
+
+    Updates which don't change a user's stored presence (e.g. the same update
+    arriving for every guild the user shares with the bot) are skipped.
+
+    Parameters
+    ----------
+    track_activity : bool
+        Whether to keep the user's primary activity.
+
+    Attributes
+    ----------
+    updates : int
+        The number of presence updates received.
+    duplicates : int
+        The number of presence updates which didn't change a stored presence.
+    """
+    def __init__(self, track_activity=False):
+        super(PresenceStore, self).__init__()
+        self.track_activity = track_activity
+        self.presences = {}
+
+        self.updates = 0
+        self.duplicates = 0
+
+    def __len__(self):
+        return len(self.presences)
+
+    def __contains__(self, user_id):
+        return user_id in self.presences
+
+    def get(self, user_id):
+        """
+        The presence of a user, `OFFLINE_PRESENCE` if none is stored.
+        """
+        return self.presences.get(user_id, OFFLINE_PRESENCE)
+
+    def _activity(self, activities):
+        if not self.track_activity or not activities:
+            return None
+
+        activity = activities[0]
+        return (
+            _presence_value(activity.get('type')),
+            activity.get('name'),
+            activity.get('state'),
+            activity.get('details'),
+        )
+
+    def update(self, user_id, payload):
+        """
+        Applies a raw presence (e.g. the data of a PRESENCE_UPDATE dispatch)
+        to the given user.
+
+        Returns
+        -------
+        bool
+            Whether the user's stored presence changed.
+        """
+        self.updates += 1
+
+        status = _presence_value(payload.get('status')) or 'offline'
+        client_status = payload.get('client_status') or {}
+        presence = CompactPresence(
+            status,
+            (
+                _presence_value(client_status.get('desktop')),
+                _presence_value(client_status.get('mobile')),
+                _presence_value(client_status.get('web')),
+            ),
+            self._activity(payload.get('activities')),
+        )
+
+        if presence == self.presences.get(user_id, OFFLINE_PRESENCE):
+            self.duplicates += 1
+            return False
+
+        if presence.status == 'offline':
+            self.presences.pop(user_id, None)
+        else:
+            self.presences[user_id] = presence
+        return True
+
+    def update_presence(self, presence):
+        """
+        Applies a `Presence` model (e.g. from a GUILD_CREATE) to its user.
+        """
+        return self.update(presence.user.id, presence.to_payload())
+
+    def stats(self):
+        return {
+            'size': len(self.presences),
+            'updates': self.updates,
+            'duplicates': self.duplicates,
+        }
+
+
+# Events which keep the `MessageCache` up to date
+MESSAGE_CACHE_EVENTS = (
+    'MessageUpdate', 'MessageDelete', 'MessageDeleteBulk', 'MessageReactionAdd', 'MessageReactionRemove',
+    'MessageReactionRemoveAll', 'MessageReactionRemoveEmoji',
+)
+
+# Guild collections which `StateConfig.lazy_guilds` defers building
+LAZY_GUILD_FIELDS = (
+    'channels', 'threads', 'roles', 'emojis', 'stickers', 'members', 'voice_states',
+    'stage_instances', 'guild_scheduled_events', 'soundboard_sounds',
+)
+
+# Frequent events which don't need the guild's collections
+LAZY_GUILD_IGNORED_EVENTS = {'PRESENCE_UPDATE', 'TYPING_START', 'GUILD_CREATE', 'GUILD_DELETE'}
+
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def _pack_datetime(value):
+    if value is None:
+        return 0
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return (value - EPOCH) // MICROSECOND
+
+
+def _unpack_datetime(value):
+    return EPOCH + timedelta(microseconds=value) if value else None
+
+
+class CompactMemberStore(MutableMapping):
+    """
+    A mapping of user ids to the members of a single guild which stores the
+    members in columns (arrays of ids, timestamps and flags, a packed array of
+    role ids and lists of interned nicknames and shared `User` objects) instead
+    of as individual `GuildMember` objects.
+
+    Reading a member materializes a new `GuildMember` from the columns, so
+    changes made to it are only kept once it is assigned back to the store.
+
+    Parameters
+    ----------
+    client : :class:`disco.client.Client`
+        The client materialized members are bound to.
+    guild_id : snowflake
+        The guild the members belong to.
+    members : Optional[dict(snowflake, `GuildMember`)]
+        Members to initially store.
+    """
+    DEAF = 1 << 0
+    MUTE = 1 << 1
+    PENDING = 1 << 2
+    HAS_FLAGS = 1 << 3
+
+    # Rarely set fields, kept per member only when present
+    SPARSE_FIELDS = ('avatar', 'permissions', 'hoisted_role', 'unusual_dm_activity_until')
+
+    find = HashMap.find
+    find_one = HashMap.find_one
+    select = HashMap.select
+    select_one = HashMap.select_one
+    filter = HashMap.filter
+    map = HashMap.map
+
+    def __init__(self, client, guild_id, members=None):
+        self.client = client
+        self.guild_id = guild_id
+
+        self._rows = {}
+        self._free = []
+
+        self._ids = array('Q')
+        self._users = []
+        self._nicks = []
+        self._joined_at = array('q')
+        self._premium_since = array('q')
+        self._timeout_until = array('q')
+        self._flags = array('L')
+        self._bits = array('B')
+        self._role_start = array('L')
+        self._role_count = array('H')
+        self._role_data = array('Q')
+        self._role_garbage = 0
+        self._sparse = {}
+
+        if members:
+            self.update(members)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __contains__(self, user_id):
+        return user_id in self._rows
+
+    def __getitem__(self, user_id):
+        return self._materialize(self._rows[user_id])
+
+    def __delitem__(self, user_id):
+        row = self._rows.pop(user_id)
+        self._ids[row] = 0
+        self._users[row] = None
+        self._nicks[row] = None
+        self._role_garbage += self._role_count[row]
+        self._role_count[row] = 0
+        self._sparse.pop(row, None)
+        self._free.append(row)
+
+    def __setitem__(self, user_id, member):
+        row = self._rows.get(user_id)
+        if row is None:
+            row = self._allocate(user_id)
+
+        self._users[row] = member.user
+        self._nicks[row] = sys.intern(member.nick) if member.nick else None
+        self._joined_at[row] = _pack_datetime(member.joined_at)
+        self._premium_since[row] = _pack_datetime(member.premium_since)
+        self._timeout_until[row] = _pack_datetime(member.communication_disabled_until)
+        self._flags[row] = member.flags.value if member.flags is not None else 0
+        self._bits[row] = (
+            (self.DEAF if member.deaf else 0) |
+            (self.MUTE if member.mute else 0) |
+            (self.PENDING if member.pending else 0) |
+            (self.HAS_FLAGS if member.flags is not None else 0)
+        )
+        self._set_roles(row, member.roles or ())
+
+        sparse = {name: getattr(member, name) for name in self.SPARSE_FIELDS if getattr(member, name) is not None}
+        if sparse:
+            self._sparse[row] = sparse
+        else:
+            self._sparse.pop(row, None)
+
+    def _allocate(self, user_id):
+        if self._free:
+            row = self._free.pop()
+            self._ids[row] = user_id
+        else:
+            row = len(self._ids)
+            self._ids.append(user_id)
+            self._users.append(None)
+            self._nicks.append(None)
+            for column in (self._joined_at, self._premium_since, self._timeout_until,
+                           self._flags, self._bits, self._role_start, self._role_count):
+                column.append(0)
+
+        self._rows[user_id] = row
+        return row
+
+    def _set_roles(self, row, roles):
+        start, count = self._role_start[row], self._role_count[row]
+
+        # Reuse the member's existing slice if the new roles fit into it
+        if len(roles) <= count:
+            self._role_data[start:start + len(roles)] = array('Q', roles)
+            self._role_garbage += count - len(roles)
+        else:
+            self._role_garbage += count
+            self._role_start[row] = len(self._role_data)
+            self._role_data.extend(roles)
+        self._role_count[row] = len(roles)
+
+        if self._role_garbage > 1024 and self._role_garbage * 2 > len(self._role_data):
+            self._compact_roles()
+
+    def _compact_roles(self):
+        data = array('Q')
+        for row in self._rows.values():
+            start, count = self._role_start[row], self._role_count[row]
+            self._role_start[row] = len(data)
+            data.extend(self._role_data[start:start + count])
+        self._role_data = data
+        self._role_garbage = 0
+
+    def _materialize(self, row):
+        bits = self._bits[row]
+        start = self._role_start[row]
+
+        member = GuildMember.__new__(GuildMember)
+        member.client = self.client
+        member.guild_id = self.guild_id
+        member.user = self._users[row]
+        member.nick = self._nicks[row]
+        member.roles = list(self._role_data[start:start + self._role_count[row]])
+        member.joined_at = _unpack_datetime(self._joined_at[row])
+        member.premium_since = _unpack_datetime(self._premium_since[row])
+        member.communication_disabled_until = _unpack_datetime(self._timeout_until[row])
+        member.deaf = bool(bits & self.DEAF)
+        member.mute = bool(bits & self.MUTE)
+        member.pending = bool(bits & self.PENDING)
+        member.flags = GuildMemberFlagValue(self._flags[row]) if bits & self.HAS_FLAGS else None
+
+        sparse = self._sparse.get(row, {})
+        for name in self.SPARSE_FIELDS:
+            setattr(member, name, sparse.get(name))
+        return member
+
+    def has_role(self, user_id, role_id):
+        """
+        Whether the given member has the given role, without materializing them.
+        """
+        row = self._rows[user_id]
+        start = self._role_start[row]
+        return role_id in self._role_data[start:start + self._role_count[row]]
+
+    def remove_role(self, role_id):
+        """
+        Removes the given role from every member.
+        """
+        for row in self._rows.values():
+            start, count = self._role_start[row], self._role_count[row]
+            roles = self._role_data[start:start + count]
+            if role_id in roles:
+                roles.remove(role_id)
+                self._set_roles(row, roles)
+
+
+class MessageCache(LoggingClass):
+    """
+    A cache of the most recent messages of every channel, kept up to date by
+    message edits, deletes and reactions, see `StateConfig.cache_messages_size`.
+
+    Messages are stored encoded (without their empty fields, their `member`
+    and their `referenced_message`), and only rebuilt into `Message` objects
+    when read. Encoded messages larger than `COMPRESS_THRESHOLD` bytes (e.g.
+    ones with several embeds) are zlib compressed.
+
+    Parameters
+    ----------
+    client : :class:`disco.client.Client`
+        The client messages are created for.
+    max_per_channel : int
+        The maximum number of messages kept per channel, oldest messages are
+        evicted first.
+    max_bytes : int
+        If set, the approximate number of bytes all cached messages may use.
+        Once exceeded, the oldest messages of the least recently active
+        channels are evicted.
+
+    Attributes
+    ----------
+    channels : OrderedDict(snowflake, OrderedDict(snowflake, tuple(bytes, bool)))
+        The encoded messages (and whether they're compressed) of every
+        channel, from least to most recently active channel and from oldest
+        to newest message.
+    size : int
+        The approximate number of bytes used by all cached messages.
+    """
+    # Approximate bytes used by the bookkeeping of a single cached message
+    ENTRY_OVERHEAD = 160
+    COMPRESS_THRESHOLD = 512
+
+    # Fields which are either cached elsewhere in the state or too large to keep
+    IGNORED_FIELDS = ('member', 'referenced_message')
+
+    # Keys of a raw MESSAGE_UPDATE payload which aren't message fields
+    UPDATE_IGNORED_KEYS = ('timestamp_ns', )
+
+    def __init__(self, client, max_per_channel, max_bytes=0):
+        super(MessageCache, self).__init__()
+        self.client = client
+        self.max_per_channel = max_per_channel
+        self.max_bytes = max_bytes
+
+        self.channels = OrderedDict()
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def encoder(self):
+        return self.client.api.http.encoder
+
+    def __len__(self):
+        return sum(len(messages) for messages in self.channels.values())
+
+    def __contains__(self, message_id):
+        return any(message_id in messages for messages in self.channels.values())
+
+    def _encode(self, payload):
+        blob = self.encoder.encode({
+            k: v for k, v in payload.items() if k not in self.IGNORED_FIELDS and v not in (None, [], {}, False)
+        })
+        if isinstance(blob, str):
+            blob = blob.encode('utf-8')
+
+        if len(blob) > self.COMPRESS_THRESHOLD:
+            return zlib.compress(blob), True
+        return blob, False
+
+    def _decode(self, entry):
+        blob, compressed = entry
+        return self.encoder.decode(zlib.decompress(blob) if compressed else blob)
+
+    @classmethod
+    def _entry_size(cls, entry):
+        return len(entry[0]) + cls.ENTRY_OVERHEAD
+
+    def _store(self, channel_id, message_id, payload):
+        messages = self.channels.get(channel_id)
+        if messages is None:
+            messages = self.channels[channel_id] = OrderedDict()
+        else:
+            self.channels.move_to_end(channel_id)
+
+        entry = self._encode(payload)
+        if message_id in messages:
+            self.size -= self._entry_size(messages[message_id])
+        messages[message_id] = entry
+        self.size += self._entry_size(entry)
+
+        while len(messages) > self.max_per_channel:
+            self.size -= self._entry_size(messages.popitem(last=False)[1])
+            self.evictions += 1
+
+        if self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        while self.size > self.max_bytes and self.channels:
+            channel_id, messages = next(iter(self.channels.items()))
+            self.size -= self._entry_size(messages.popitem(last=False)[1])
+            self.evictions += 1
+
+            if not messages:
+                del self.channels[channel_id]
+
+    def _message(self, payload):
+        return Message(payload, self.client)
+
+    def put(self, message):
+        """
+        Caches a new message.
+        """
+        self._store(message.channel_id, message.id, message.to_payload())
+
+    def get(self, channel_id, message_id):
+        """
+        A cached message, rebuilt from its encoded form.
+
+        Returns
+        -------
+        Optional[:class:`disco.types.message.Message`]
+            The message, or None if it isn't cached.
+        """
+        entry = self.channels.get(channel_id, {}).get(message_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return self._message(self._decode(entry))
+
+    def history(self, channel_id):
+        """
+        All cached messages of a channel, from oldest to newest.
+        """
+        return [self._message(self._decode(entry)) for entry in self.channels.get(channel_id, {}).values()]
+
+    def update(self, channel_id, message_id, data):
+        """
+        Applies an edit to a cached message. Only the fields present in the
+        raw MESSAGE_UPDATE payload are replaced, fields missing from it keep
+        their cached value. Messages which aren't cached are ignored, as they're
+        older than any cached message of their channel.
+
+        Returns
+        -------
+        Optional[:class:`disco.types.message.Message`]
+            The message as it was cached before the edit.
+        """
+        entry = self.channels.get(channel_id, {}).get(message_id)
+        if entry is None:
+            return None
+
+        previous = self._decode(entry)
+        payload = dict(previous)
+        payload.update((k, v) for k, v in data.items() if k not in self.UPDATE_IGNORED_KEYS)
+        self._store(channel_id, message_id, payload)
+        return self._message(previous)
+
+    def delete(self, channel_id, message_id):
+        """
+        Removes a message from the cache.
+
+        Returns
+        -------
+        Optional[:class:`disco.types.message.Message`]
+            The removed message, or None if it wasn't cached.
+        """
+        messages = self.channels.get(channel_id)
+        if not messages or message_id not in messages:
+            return None
+
+        entry = messages.pop(message_id)
+        self.size -= self._entry_size(entry)
+        if not messages:
+            del self.channels[channel_id]
+        return self._message(self._decode(entry))
+
+    def delete_bulk(self, channel_id, message_ids):
+        """
+        Removes several messages of a channel from the cache.
+
+        Returns
+        -------
+        list(:class:`disco.types.message.Message`)
+            The removed messages which were cached.
+        """
+        removed = (self.delete(channel_id, message_id) for message_id in message_ids)
+        return [message for message in removed if message is not None]
+
+    def remove_channel(self, channel_id):
+        """
+        Removes all cached messages of a channel.
+        """
+        messages = self.channels.pop(channel_id, None)
+        if messages:
+            self.size -= sum(self._entry_size(entry) for entry in messages.values())
+
+    def _update_reactions(self, channel_id, message_id, func):
+        entry = self.channels.get(channel_id, {}).get(message_id)
+        if entry is None:
+            return
+
+        payload = self._decode(entry)
+        payload['reactions'] = func(payload.get('reactions', []))
+        self._store(channel_id, message_id, payload)
+
+    @staticmethod
+    def _same_emoji(payload, emoji):
+        if emoji.id:
+            return payload.get('id') == emoji.id
+        return not payload.get('id') and payload.get('name') == emoji.name
+
+    def add_reaction(self, channel_id, message_id, emoji, me=False):
+        def _add(reactions):
+            for reaction in reactions:
+                if self._same_emoji(reaction['emoji'], emoji):
+                    reaction['count'] = reaction.get('count', 0) + 1
+                    reaction['me'] = reaction.get('me') or me
+                    break
+            else:
+                reactions.append({'emoji': emoji.to_payload(), 'count': 1, 'me': me})
+            return reactions
+
+        self._update_reactions(channel_id, message_id, _add)
+
+    def remove_reaction(self, channel_id, message_id, emoji, me=False):
+        def _remove(reactions):
+            for reaction in reactions:
+                if self._same_emoji(reaction['emoji'], emoji):
+                    reaction['count'] = reaction.get('count', 1) - 1
+                    if me:
+                        reaction['me'] = False
+            return [reaction for reaction in reactions if reaction['count'] > 0]
+
+        self._update_reactions(channel_id, message_id, _remove)
+
+    def clear_reactions(self, channel_id, message_id, emoji=None):
+        """
+        Removes all reactions of a message, or all reactions of a single emoji.
+        """
+        def _clear(reactions):
+            if emoji is None:
+                return []
+            return [reaction for reaction in reactions if not self._same_emoji(reaction['emoji'], emoji)]
+
+        self._update_reactions(channel_id, message_id, _clear)
+
+    def stats(self):
+        return {
+            'channels': len(self.channels),
+            'messages': len(self),
+            'bytes': self.size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+# Objects held by one of the state's collections, which the byte estimates of
+#  the other collections (see `State.stats`) don't count
+STATS_EXCLUDED_TYPES = (Guild, Channel, User, GuildMember, GuildEmoji, VoiceState, CompactMemberStore)
+
+# The collections reported by `State.stats`
+STATS_COLLECTIONS = ('guilds', 'channels', 'threads', 'users', 'members', 'emojis', 'voice_states', 'messages')
 
 
 class State:
@@ -77,16 +1016,22 @@ class State:
         The currently logged-in user.
     guilds : dict(snowflake, `Guild`)
         Mapping of all known/loaded Guilds.
-    channels : dict(snowflake, `Channel`)
-        Weak mapping of all known/loaded Channels.
+    channels : `IndexedHashMap`(snowflake, `Channel`)
+        Mapping of all known/loaded guild Channels, indexed by guild (e.g.
+        `state.channels.select_indexed(guild_id)`). `threads`, `emojis` and
+        `stickers` are indexed the same way.
     users : dict(snowflake, `User`)
         Weak mapping of all known/loaded Users.
     voice_clients : dict(str, 'VoiceClient')
         Weak mapping of all known voice clients.
-    voice_states : dict(str, `VoiceState`)
-        Weak mapping of all known/active Voice States.
-    messages : Optional[dict(snowflake, deque)]
-        Mapping of channel ids to dequeue containing `StackMessage` objects.
+    voice_states : `IndexedHashMap`(str, `VoiceState`)
+        Mapping of all known/active Voice States, indexed by guild.
+    messages : Optional[dict(snowflake, `IndexedBuffer`)]
+        Mapping of channel ids to buffers containing `StackMessage` objects.
+    message_cache : Optional[`MessageCache`]
+        The contents of recent messages, see `StateConfig.cache_messages_size`.
+    presences : Optional[`PresenceStore`]
+        The presences of users, see `StateConfig.compact_presences`.
     """
     EVENTS = [
         'Ready', 'GuildCreate', 'GuildUpdate', 'GuildDelete', 'GuildMemberAdd', 'GuildMemberUpdate',
@@ -108,20 +1053,56 @@ class State:
 
         self.me = None
         self.guilds = HashMap()
-        self.channels = HashMap(weakref.WeakValueDictionary())
+        self.channels = IndexedHashMap('guild_id')
         self.commands = HashMap()
         self.dms = HashMap(weakref.WeakValueDictionary())
-        self.emojis = HashMap(weakref.WeakValueDictionary())
-        self.stickers = HashMap(weakref.WeakValueDictionary())
-        self.threads = HashMap(weakref.WeakValueDictionary())
-        self.users = HashMap(weakref.WeakValueDictionary())
+        self.emojis = IndexedHashMap('guild_id')
+        self.stickers = IndexedHashMap('guild_id')
+        self.threads = IndexedHashMap('guild_id')
+        if self.config.cache_users_size or self.config.cache_users_ttl:
+            self.users = BoundedHashMap(
+                self.config.cache_users_size, self.config.cache_users_ttl, self._is_pinned_user,
+            )
+        else:
+            self.users = HashMap(weakref.WeakValueDictionary())
         self.voice_clients = HashMap(weakref.WeakValueDictionary())
-        self.voice_states = HashMap(weakref.WeakValueDictionary())
+        self.voice_states = IndexedHashMap('guild_id')
+
+        # Guilds loaded by `restore` which haven't been replaced by a GUILD_CREATE
+        self.restored_guilds = set()
+
+        # Encoded collections of lazily created guilds, see `StateConfig.lazy_guilds`
+        self.lazy_guilds = {}
+        self.lazy_guilds_created = 0
+        self.lazy_guilds_hydrated = 0
+        self._guild_eager_fields = {
+            name: field for name, field in Guild._fields.items() if name not in LAZY_GUILD_FIELDS
+        }
+
+        # Paces the member requests made as guilds load
+        self.member_sync = GuildMemberSync(self)
+
+        # Batches on-demand member lookups into gateway requests
+        self.member_resolver = MemberResolver(self)
 
         # If message tracking is enabled, listen to those events
         if self.config.track_messages:
-            self.messages = DefaultHashMap(lambda: deque(maxlen=self.config.track_messages_size))
-            self.EVENTS += ['MessageDelete', 'MessageDeleteBulk']
+            self.messages = DefaultHashMap(lambda: IndexedBuffer(self.config.track_messages_size))
+            self.EVENTS = self.EVENTS + ['MessageDelete', 'MessageDeleteBulk']
+
+        # If message caching is enabled, listen to everything which changes a message
+        self.message_cache = None
+        if self.config.cache_messages_size:
+            self.message_cache = MessageCache(
+                self.client, self.config.cache_messages_size, self.config.cache_messages_max_bytes,
+            )
+            self.EVENTS = self.EVENTS + [event for event in MESSAGE_CACHE_EVENTS if event not in self.EVENTS]
+
+        # Presences are read from the raw dispatches instead of `PresenceUpdate` events
+        self.presences = None
+        if self.config.compact_presences:
+            self.presences = PresenceStore(self.config.compact_presences_activity)
+            self.EVENTS = [event for event in self.EVENTS if event != 'PresenceUpdate']
 
         # The bound listener objects
         self.listeners = []
@@ -145,6 +1126,228 @@ class State:
             func = 'on_' + underscore(event)
             self.listeners.append(self.client.events.on(event, getattr(self, func), priority=Priority.AFTER))
 
+        if self.config.lazy_guilds:
+            self.listeners.append(self.client.packets.on(
+                (RECV, OPCode.DISPATCH), self._hydrate_for_dispatch, priority=Priority.BEFORE,
+            ))
+
+        if self.presences is not None:
+            self.listeners.append(self.client.packets.on(
+                (RECV, OPCode.DISPATCH), self._presence_for_dispatch, priority=Priority.BEFORE,
+            ))
+
+    def _is_pinned_user(self, user_id, _):
+        return self.me is not None and user_id == self.me.id
+
+    def _member_pinner(self, guild_id):
+        def _is_pinned(user_id, _):
+            if self._is_pinned_user(user_id, None):
+                return True
+
+            guild = self.guilds.get(guild_id)
+            return bool(guild) and any(vs.user_id == user_id for vs in guild.voice_states.values())
+        return _is_pinned
+
+    def cache_stats(self):
+        """
+        Hit, miss and eviction counters of the bounded user and member caches
+        and the message cache, how many presence updates were duplicates, and
+        how many lazily created guilds were hydrated.
+        """
+        stats = {'users': self.users.stats() if isinstance(self.users, BoundedHashMap) else None}
+
+        members = [guild.members.stats() for guild in self.guilds.values() if isinstance(guild.members, BoundedHashMap)]
+        stats['members'] = {
+            key: sum(s[key] for s in members) for key in ('size', 'hits', 'misses', 'evictions')
+        } if members else None
+
+        stats['messages'] = self.message_cache.stats() if self.message_cache is not None else None
+        stats['presences'] = self.presences.stats() if self.presences is not None else None
+
+        stats['lazy_guilds'] = {
+            'created': self.lazy_guilds_created,
+            'hydrated': self.lazy_guilds_hydrated,
+            'pending': len(self.lazy_guilds),
+        } if self.config.lazy_guilds else None
+        return stats
+
+    @staticmethod
+    def _sample_bytes(values, sample_size):
+        sample = list(itertools.islice(values, sample_size))
+        if not sample:
+            return 0
+        return sum(deep_sizeof(value, STATS_EXCLUDED_TYPES) for value in sample) / len(sample)
+
+    def _guild_channel_ids(self, guild_id):
+        return self.channels.keys_for(guild_id) | self.threads.keys_for(guild_id)
+
+    def stats(self, sample_size=32):
+        """
+        Entry counts, approximate retained bytes and hit/miss counters of the
+        state's collections (guilds, channels, threads, users, members, emojis,
+        voice states and messages), in total and per guild.
+
+        Bytes are estimated from the `deep_sizeof` of up to `sample_size`
+        entries of every collection, without the objects another collection
+        holds (e.g. a member's user), and should be treated as rough figures.
+        Hits and misses are only tracked by the bounded user and member caches
+        and the message cache, and are None for other collections. Guilds which
+        are still lazy (see `StateConfig.lazy_guilds`) report the size of their
+        encoded collections rather than per collection figures.
+
+        Returns
+        -------
+        dict
+            `total` maps every collection to its `count`, `bytes`, `hits` and
+            `misses`, and `guilds` maps guild ids to the `count` and `bytes` of
+            each of the guild's collections.
+        """
+        loaded = [guild for guild in self.guilds.values() if guild.id not in self.lazy_guilds]
+        compact = {guild.id: guild.members for guild in loaded if isinstance(guild.members, CompactMemberStore)}
+
+        sizes = {
+            'guilds': self._sample_bytes(iter(loaded), sample_size),
+            'channels': self._sample_bytes(iter(self.channels.values()), sample_size),
+            'threads': self._sample_bytes(iter(self.threads.values()), sample_size),
+            'users': self._sample_bytes(iter(self.users.values()), sample_size),
+            'emojis': self._sample_bytes(iter(self.emojis.values()), sample_size),
+            'voice_states': self._sample_bytes(iter(self.voice_states.values()), sample_size),
+            'members': self._sample_bytes(itertools.chain.from_iterable(
+                guild.members.values() for guild in loaded if guild.id not in compact
+            ), sample_size),
+        }
+
+        if self.message_cache is not None:
+            sizes['messages'] = self.message_cache.size / max(len(self.message_cache), 1)
+        elif self.config.track_messages:
+            sizes['messages'] = self._sample_bytes(itertools.chain.from_iterable(self.messages.values()), sample_size)
+        else:
+            sizes['messages'] = 0
+
+        compact_bytes = {guild_id: deep_sizeof(store, STATS_EXCLUDED_TYPES) for guild_id, store in compact.items()}
+
+        guilds = {}
+        for guild in self.guilds.values():
+            if guild.id in self.lazy_guilds:
+                guilds[guild.id] = {'lazy': True, 'bytes': len(self.lazy_guilds[guild.id])}
+                continue
+
+            counts = {
+                'channels': len(guild.channels),
+                'threads': len(guild.threads),
+                'members': len(guild.members),
+                'emojis': len(guild.emojis),
+                'voice_states': len(guild.voice_states),
+                'messages': 0,
+            }
+            for channel_id in self._guild_channel_ids(guild.id):
+                if self.message_cache is not None:
+                    counts['messages'] += len(self.message_cache.channels.get(channel_id, ()))
+                elif self.config.track_messages and channel_id in self.messages:
+                    counts['messages'] += len(self.messages[channel_id])
+
+            stats = {name: {'count': count, 'bytes': int(count * sizes[name])} for name, count in counts.items()}
+            if guild.id in compact_bytes:
+                stats['members']['bytes'] = compact_bytes[guild.id]
+            stats['guild'] = {'count': 1, 'bytes': int(sizes['guilds'])}
+            guilds[guild.id] = stats
+
+        if self.message_cache is not None:
+            messages = len(self.message_cache)
+        elif self.config.track_messages:
+            messages = sum(len(buf) for buf in self.messages.values())
+        else:
+            messages = 0
+
+        counts = {
+            'guilds': len(self.guilds),
+            'channels': len(self.channels),
+            'threads': len(self.threads),
+            'users': len(self.users),
+            'members': sum(len(guild.members) for guild in loaded),
+            'emojis': len(self.emojis),
+            'voice_states': len(self.voice_states),
+            'messages': messages,
+        }
+
+        total = {}
+        for name in STATS_COLLECTIONS:
+            total[name] = {'count': counts[name], 'bytes': int(counts[name] * sizes[name]), 'hits': None, 'misses': None}
+
+        # Members of compact stores are measured rather than estimated
+        compact_members = sum(len(store) for store in compact.values())
+        total['members']['bytes'] = int((counts['members'] - compact_members) * sizes['members'])
+        total['members']['bytes'] += sum(compact_bytes.values())
+        total['guilds']['bytes'] += sum(len(blob) for blob in self.lazy_guilds.values())
+
+        if isinstance(self.users, BoundedHashMap):
+            total['users'].update(hits=self.users.hits, misses=self.users.misses)
+
+        bounded = [guild.members for guild in loaded if isinstance(guild.members, BoundedHashMap)]
+        if bounded:
+            total['members'].update(
+                hits=sum(members.hits for members in bounded),
+                misses=sum(members.misses for members in bounded),
+            )
+
+        if self.message_cache is not None:
+            total['messages'].update(
+                bytes=self.message_cache.size, hits=self.message_cache.hits, misses=self.message_cache.misses,
+            )
+
+        total['all'] = {'bytes': sum(stats['bytes'] for stats in total.values())}
+        return {'total': total, 'guilds': guilds}
+
+    def snapshot(self, path):
+        """
+        Writes the current user and every cached guild (with its channels,
+        threads, roles, members, emojis, stickers and voice states) to a
+        snapshot file at the given path (see :mod:`disco.util.snapshot`),
+        which `restore` can load into a fresh state.
+
+        Returns
+        -------
+        int
+            The number of guilds written.
+        """
+        meta = {
+            'me': self.me.to_payload() if self.me else None,
+            'created_at': time.time(),
+        }
+
+        with SnapshotWriter(path, self.client.api.http.encoder, meta) as writer:
+            for guild in tuple(self.guilds.values()):
+                writer.write(guild.id, guild.to_payload())
+        return len(writer.index)
+
+    def restore(self, path):
+        """
+        Loads a snapshot written by `snapshot`, rebuilding the guilds it holds
+        straight from their models. Restored guilds are replaced when Discord
+        sends a fresh GUILD_CREATE for them (e.g. when a resume fails), and
+        the state is marked as ready once the snapshot is loaded.
+
+        Returns
+        -------
+        int
+            The number of guilds restored.
+        """
+        with SnapshotReader(path, self.client.api.http.encoder) as reader:
+            if reader.meta.get('me'):
+                self.me = User(reader.meta['me'], self.client)
+
+            for guild_id, payload in reader:
+                if guild_id in self.guilds:
+                    continue
+
+                self._add_guild(Guild(payload, self.client), sync=False)
+                self.restored_guilds.add(guild_id)
+
+            restored = len(reader)
+
+        self.ready.set()
+        return restored
+
     def fill_messages(self, channel):
         for message in reversed(next(channel.messages_iter(bulk=True))):
             self.messages[channel.id].append(
@@ -152,13 +1355,20 @@ class State:
 
     def on_ready(self, event):
         self.me = event.user
-        self.guilds_waiting_sync = len(event.guilds)
+
+        # Shards of a `ShardGroup` share the state, so their pending guilds add up
+        if self.ready.is_set():
+            self.guilds_waiting_sync = 0
+        self.guilds_waiting_sync += len(event.guilds)
         self.ready.clear()
 
     def on_user_update(self, event):
         self.me.inplace_update(event.user)
 
     def on_message_create(self, event):
+        if event.message.guild_id in self.member_sync.queued:
+            self.member_sync.prioritize(event.message.guild_id)
+
         if event.message.author.id not in self.users:
             self.users[event.message.author.id] = event.message.author
 
@@ -171,6 +1381,9 @@ class State:
             self.messages[event.message.channel_id].append(
                 StackMessage(event.message.id, event.message.channel_id, event.message.author.id))
 
+        if self.message_cache is not None:
+            self.message_cache.put(event.message)
+
         # in the event we gain access to a thread or channel suddenly...
         if event.message.channel_id not in self.channels and event.message.channel_id not in self.threads:
             channel = event.message.channel
@@ -196,24 +1409,38 @@ class State:
         if event.message.channel_id in self.dms:
             self.dms[event.message.channel_id].last_message_id = event.message.id
 
-    def on_message_delete(self, event):
-        if event.message.channel_id not in self.messages:
-            return
+    def on_message_update(self, event):
+        event.before = self.message_cache.update(event.message.channel_id, event.message.id, event.raw_data)
 
-        sm = next((i for i in self.messages[event.message.channel_id] if i.id == event.id), None)
-        if not sm:
-            return
+    def on_message_delete(self, event):
+        if self.message_cache is not None:
+            event.cached_message = self.message_cache.delete(event.channel_id, event.id)
 
-        self.messages[event.message.channel_id].remove(sm)
+        if self.config.track_messages and event.channel_id in self.messages:
+            self.messages[event.channel_id].discard(event.id)
 
     def on_message_delete_bulk(self, event):
-        if event.channel_id not in self.messages:
-            return
+        if self.message_cache is not None:
+            event.cached_messages = self.message_cache.delete_bulk(event.channel_id, event.ids)
+
+        if self.config.track_messages and event.channel_id in self.messages:
+            self.messages[event.channel_id].discard_many(event.ids)
+
+    def on_message_reaction_add(self, event):
+        self.message_cache.add_reaction(
+            event.channel_id, event.message_id, event.emoji, self.me is not None and event.user_id == self.me.id,
+        )
+
+    def on_message_reaction_remove(self, event):
+        self.message_cache.remove_reaction(
+            event.channel_id, event.message_id, event.emoji, self.me is not None and event.user_id == self.me.id,
+        )
 
-        # TODO: performance
-        for sm in tuple(self.messages[event.channel_id]):
-            if sm.id in event.ids:
-                self.messages[event.channel_id].remove(sm)
+    def on_message_reaction_remove_all(self, event):
+        self.message_cache.clear_reactions(event.channel_id, event.message_id)
+
+    def on_message_reaction_remove_emoji(self, event):
+        self.message_cache.clear_reactions(event.channel_id, event.message_id, event.emoji)
 
     def on_interaction_create(self, event):
         if event.interaction.user.id not in self.users:
@@ -238,35 +1465,141 @@ class State:
                 self.ready.set()
 
         if event.guild.id in self.guilds:
+            # Guilds restored from a snapshot are replaced with the fresh copy
+            if event.guild.id not in self.restored_guilds:
+                return
+            self._remove_guild(event.guild.id)
+
+        self._add_guild(event.guild, event.presences)
+
+    def create_lazy_guild(self, obj):
+        """
+        Creates a guild from a GUILD_CREATE payload without building its
+        collections, which are encoded and kept until the guild is hydrated.
+        """
+        encoder = self.client.api.http.encoder
+        raw = {name: obj.pop(name) for name in LAZY_GUILD_FIELDS + ('presences', ) if name in obj}
+        blob = encoder.encode(raw)
+        if isinstance(blob, str):
+            blob = blob.encode('utf-8')
+
+        guild = Guild.__new__(Guild)
+        guild.client = self.client
+        Guild.load_into(guild, obj, fields=self._guild_eager_fields)
+
+        loader = functools.partial(self.hydrate_guild, guild)
+        for name in LAZY_GUILD_FIELDS:
+            setattr(guild, name, LazyHashMap(loader))
+
+        self.lazy_guilds[guild.id] = blob
+        self.lazy_guilds_created += 1
+        return guild
+
+    def hydrate_guild(self, guild):
+        """
+        Builds the collections of a lazily created guild and adds its objects
+        to the state-wide collections. Does nothing for hydrated guilds.
+        """
+        blob = self.lazy_guilds.pop(guild.id, None)
+        if blob is None:
+            return
+
+        raw = self.client.api.http.encoder.decode(blob)
+        for name in LAZY_GUILD_FIELDS:
+            lazy = getattr(guild, name)
+            # Already replaced with a fresh copy, e.g. the roles of a GUILD_UPDATE
+            if not isinstance(lazy, LazyHashMap):
+                continue
+
+            value = Guild._fields[name].try_convert(raw[name], self.client) if name in raw else HashMap()
+            Guild.attach(value.values(), {'guild_id': guild.id})
+
+            setattr(guild, name, value)
+            # References to the lazy map handed out earlier see the same items
+            lazy.fill(value)
+
+        self.lazy_guilds_hydrated += 1
+
+        if self.guilds.get(guild.id) is guild:
+            if self.presences is not None:
+                for presence in raw.get('presences', ()):
+                    self.presences.update(int(presence['user']['id']), presence)
+                presences = ()
+            else:
+                presences = [Presence(presence, self.client) for presence in raw.get('presences', ())]
+            self._index_guild(guild, presences)
+
+    def _hydrate_for_dispatch(self, packet):
+        if not self.lazy_guilds or packet['t'] in LAZY_GUILD_IGNORED_EVENTS:
+            return
+
+        data = packet['d']
+        guild_id = data.get('guild_id') if isinstance(data, dict) else None
+        if guild_id and int(guild_id) in self.lazy_guilds and int(guild_id) in self.guilds:
+            self.hydrate_guild(self.guilds[int(guild_id)])
+
+    def _add_guild(self, guild, presences=(), sync=True):
+        self.guilds[guild.id] = guild
+
+        # Lazily created guilds are indexed once they are hydrated
+        if guild.id in self.lazy_guilds:
             return
 
-        self.guilds[event.guild.id] = event.guild
-        self.channels.update(event.guild.channels)
-        self.threads.update(event.guild.threads)
-        self.emojis.update(event.guild.emojis)
-        self.stickers.update(event.guild.stickers)
+        self._index_guild(guild, presences, sync)
+
+    def _index_guild(self, guild, presences=(), sync=True):
+        if self.config.compact_members_threshold and guild.member_count >= self.config.compact_members_threshold:
+            guild.members = CompactMemberStore(self.client, guild.id, guild.members)
+        elif self.config.cache_members_size or self.config.cache_members_ttl:
+            guild.members = BoundedHashMap(
+                self.config.cache_members_size, self.config.cache_members_ttl,
+                self._member_pinner(guild.id), guild.members,
+            )
+
+        self.channels.update(guild.channels)
+        self.threads.update(guild.threads)
+        self.emojis.update(guild.emojis)
+        self.stickers.update(guild.stickers)
 
-        for voice_state in event.guild.voice_states.values():
+        for voice_state in guild.voice_states.values():
             self.voice_states[voice_state.session_id] = voice_state
 
-        for member in event.guild.members.values():
+        for member in guild.members.values():
             if member.user.id not in self.users:
                 self.users[member.user.id] = member.user
 
-        for presence in event.presences:
-            if presence.user.id in self.users:
+        for presence in presences:
+            if self.presences is not None:
+                self.presences.update_presence(presence)
+            elif presence.user.id in self.users:
                 self.users[presence.user.id].presence = presence
 
-        # TODO: better performance on large guild sync
-        if self.config.sync_guild_members_on_startup and len(self.guilds[event.guild.id].members) < event.guild.member_count:
-            event.guild.request_guild_members()
+        # Bounded member caches are filled on demand rather than synced
+        if (sync and self.config.sync_guild_members_on_startup and not isinstance(guild.members, BoundedHashMap)
+                and len(guild.members) < guild.member_count):
+            self.member_sync.queue(guild)
         else:
-            for voice_state in event.guild.voice_states.values():
-                if voice_state.user_id not in self.guilds[event.guild.id].members:
-                    self.guilds[event.guild.id].members[voice_state.user_id] = voice_state.member
-                if voice_state.user_id not in self.users and voice_state.member.user:
+            for voice_state in guild.voice_states.values():
+                if voice_state.user_id not in guild.members and voice_state.member:
+                    guild.members[voice_state.user_id] = voice_state.member
+                if voice_state.user_id not in self.users and voice_state.member and voice_state.member.user:
                     self.users[voice_state.user_id] = voice_state.member.user
 
+    def _remove_guild(self, guild_id):
+        self.guilds.pop(guild_id, None)
+        self.restored_guilds.discard(guild_id)
+        self.lazy_guilds.pop(guild_id, None)
+
+        if self.message_cache is not None:
+            for channel_id in self.channels.keys_for(guild_id) | self.threads.keys_for(guild_id):
+                self.message_cache.remove_channel(channel_id)
+
+        self.channels.remove_indexed(guild_id)
+        self.threads.remove_indexed(guild_id)
+        self.emojis.remove_indexed(guild_id)
+        self.stickers.remove_indexed(guild_id)
+        self.voice_states.remove_indexed(guild_id)
+
     def on_guild_update(self, event):
         ignored = ['channels', 'emojis', 'members', 'stickers', 'threads', 'voice_states', 'presences']
         if not hasattr(event.guild, 'widget_enabled'):
@@ -279,36 +1612,10 @@ class State:
             if event.unavailable:
                 return
 
-        if event.id in self.guilds:
-            del self.guilds[event.id]
-
         if event.id in self.voice_clients:
             self.voice_clients[event.id].disconnect()
 
-        channels = tuple(self.channels.keys())
-        for channel in channels:
-            if self.channels[channel].guild_id == event.id:
-                del self.channels[channel]
-
-        threads = tuple(self.threads.keys())
-        for thread in threads:
-            if self.threads[thread].guild_id == event.id:
-                del self.threads[thread]
-
-        emojis = tuple(self.emojis.keys())
-        for emoji in emojis:
-            if self.emojis[emoji].guild_id == event.id:
-                del self.emojis[emoji]
-
-        stickers = tuple(self.stickers.keys())
-        for sticker in stickers:
-            if self.stickers[sticker].guild_id == event.id:
-                del self.stickers[sticker]
-
-        voice_states = tuple(self.voice_states.keys())
-        for vstate in voice_states:
-            if self.voice_states[vstate].guild_id == event.id:
-                del self.voice_states[vstate]
+        self._remove_guild(event.id)
 
     def on_channel_create(self, event):
         if event.channel.is_guild and event.channel.guild_id in self.guilds:
@@ -328,6 +1635,9 @@ class State:
             del event.channel.guild.channels[event.channel.id]
             del self.channels[event.channel.id]
 
+        if self.message_cache is not None:
+            self.message_cache.remove_channel(event.channel.id)
+
     def on_thread_create(self, event):
         if event.thread.guild_id in self.guilds:
             self.guilds[event.thread.guild_id].threads[event.thread.id] = event.thread
@@ -355,6 +1665,9 @@ class State:
         if event.thread.id in self.threads:
             del self.threads[event.thread.id]
 
+        if self.message_cache is not None:
+            self.message_cache.remove_channel(event.thread.id)
+
     def on_thread_list_sync(self, event):
         if event.guild_id in self.guilds:
             for thread in event.threads:
@@ -437,13 +1750,18 @@ class State:
             self.users[event.member.user.id].inplace_update(event.member.user)
 
         if self.config.sync_guild_members:
-            if event.member.user.id not in self.guilds[event.guild_id].members:
-                self.guilds[event.guild_id].members[event.member.user.id] = event.member
+            members = self.guilds[event.guild_id].members
+            if event.member.user.id not in members:
+                members[event.member.user.id] = event.member
             else:
-                self.guilds[event.guild_id].members[event.member.user.id].inplace_update(event.member)
+                member = members[event.member.user.id]
+                member.inplace_update(event.member)
+
+                if event.member.roles:  # ???
+                    member.roles = event.member.roles
 
-            if event.member.roles:  # ???
-                self.guilds[event.guild_id].members[event.member.user.id].roles = event.member.roles
+                # Members of a `CompactMemberStore` are copies, store the update
+                members[event.member.user.id] = member
 
     def on_guild_member_remove(self, event):
         if event.guild_id not in self.guilds:
@@ -454,22 +1772,34 @@ class State:
             del self.guilds[event.guild_id].members[event.user.id]
 
     def on_guild_members_chunk(self, event):
+        if event.nonce:
+            self.member_sync.on_chunk(event)
+
         if event.guild_id not in self.guilds:
             return
 
         guild = self.guilds[event.guild_id]
         for member in event.members:
             member.guild_id = guild.id
-            guild.members[member.id] = member
 
             if member.id not in self.users:
                 self.users[member.id] = member.user
             else:
                 member.user = self.users[member.id]
 
+            guild.members[member.id] = member
+
+        if event.nonce:
+            self.member_resolver.on_chunk(event)
+
         if not event.presences:
             return
 
+        if self.presences is not None:
+            for presence in event.presences:
+                self.presences.update_presence(presence)
+            return
+
         for presence in event.presences:
             # TODO: this matches the recursive, hackfix method found in on_presence_update
             user = presence.user
@@ -498,7 +1828,12 @@ class State:
         del self.guilds[event.guild_id].roles[event.role_id]
 
         # This _should_ update roles on each user when a role is removed
-        for member in self.guilds[event.guild_id].members.values():
+        members = self.guilds[event.guild_id].members
+        if isinstance(members, CompactMemberStore):
+            members.remove_role(event.role_id)
+            return
+
+        for member in members.values():
             if member and event.role_id in member.roles:
                 member.roles.remove(event.role_id)
 
@@ -511,9 +1846,8 @@ class State:
 
         self.guilds[event.guild_id].emojis = HashMap({i.id: i for i in event.emojis})
 
-        self.emojis = {}
-        for guild in self.guilds.values():
-            self.emojis.update(guild.emojis)
+        self.emojis.remove_indexed(event.guild_id)
+        self.emojis.update(self.guilds[event.guild_id].emojis)
 
     def on_guild_stickers_update(self, event):
         if event.guild_id not in self.guilds or not hasattr(event, 'stickers'):
@@ -524,9 +1858,23 @@ class State:
 
         self.guilds[event.guild_id].stickers = HashMap({i.id: i for i in event.stickers})
 
-        self.stickers = {}
-        for guild in self.guilds.values():
-            self.stickers.update(guild.stickers)
+        self.stickers.remove_indexed(event.guild_id)
+        self.stickers.update(self.guilds[event.guild_id].stickers)
+
+    def _presence_for_dispatch(self, packet):
+        if packet['t'] != 'PRESENCE_UPDATE':
+            return
+
+        user = packet['d'].get('user') or {}
+        if 'id' not in user:
+            return
+
+        user_id = int(user['id'])
+        self.presences.update(user_id, packet['d'])
+
+        # The user object only carries more than the id when the user changed
+        if len(user) > 1 and user_id in self.users:
+            self.users[user_id].inplace_update(User(user, self.client))
 
     def on_presence_update(self, event):
         # TODO: this is recursive, we hackfix in Model
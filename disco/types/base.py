@@ -347,8 +347,8 @@ class Model(with_metaclass(ModelMeta, Chainable)):
         return self.load_into(self, *args, **kwargs)
 
     @classmethod
-    def load_into(cls, inst, obj, consume=False):
-        for name, field in cls._fields.items():
+    def load_into(cls, inst, obj, consume=False, fields=None):
+        for name, field in (cls._fields if fields is None else fields).items():
             try:
                 raw = obj[field.src_name]
 
@@ -401,6 +401,29 @@ class Model(with_metaclass(ModelMeta, Chainable)):
             obj[name] = field.serialize(getattr(self, name), field)
         return obj
 
+    def to_payload(self):
+        """
+        Serializes this model into the raw shape it is loaded from (e.g. lists
+        for `AutoDictField`s and source field names), so that
+        `type(self)(model.to_payload(), client)` rebuilds an equivalent model.
+        """
+        payload = {}
+        for name, field in self.__class__._fields.items():
+            value = getattr(self, name, None)
+            if value is None:
+                continue
+
+            if isinstance(field, AutoDictField):
+                value = [_to_payload(i) for i in value.values()]
+            elif isinstance(field, DictField):
+                value = {k: _to_payload(v) for k, v in value.items()}
+            elif isinstance(field, ListField):
+                value = [_to_payload(i) for i in value]
+            else:
+                value = _to_payload(value)
+            payload[field.src_name] = value
+        return payload
+
     @classmethod
     def create(cls, client, data, **kwargs):
         data.update(kwargs)
@@ -429,6 +452,16 @@ class Model(with_metaclass(ModelMeta, Chainable)):
                     pass
 
 
+def _to_payload(value):
+    if isinstance(value, Model):
+        return value.to_payload()
+    elif isinstance(value, real_datetime):
+        return value.isoformat()
+    elif isinstance(value, (BitsetValue, EnumAttr)):
+        return value.value
+    return value
+
+
 class SlottedModel(Model):
     __slots__ = ['client']
 
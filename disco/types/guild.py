@@ -743,7 +743,15 @@ class Guild(SlottedModel, Permissible):
 
     def get_member(self, user):
         """
-        Attempt to get a member from a given user.
+        Attempt to get a member from a given user. Uncached members are requested
+        over the gateway when connected (batched with other lookups, see
+        `disco.state.MemberResolver`), otherwise over the API.
+
+        Uncached lookups block until the member arrives (for up to
+        `StateConfig.resolve_members_timeout` seconds). When called from the
+        dispatch queue's worker (e.g. in a BEFORE or AFTER priority handler with
+        `ClientConfig.dispatch_queue_size` set), which would have to process the
+        response itself, the member is fetched over the API instead.
 
         Returns
         -------
@@ -753,10 +761,17 @@ class Guild(SlottedModel, Permissible):
         user = to_snowflake(user)
 
         if user not in self.members:
-            try:
-                self.members[user] = self.client.api.guilds_members_get(self.id, user)
-            except APIException:
-                return
+            gw = self.client.gw.for_guild(self.id)
+            if gw.session_id and not gw.in_dispatch_worker():
+                member = self.client.state.member_resolver.resolve(self.id, user).get()
+                if member is None:
+                    return
+                self.members.setdefault(user, member)
+            else:
+                try:
+                    self.members[user] = self.client.api.guilds_members_get(self.id, user)
+                except APIException:
+                    return
 
         return self.members.get(user)
 
@@ -789,11 +804,11 @@ class Guild(SlottedModel, Permissible):
 
         return self.client.api.guilds_roles_modify(self.id, to_snowflake(role), **kwargs)
 
-    def request_guild_members(self, query=None, limit=0, presences=True):
-        self.client.gw.request_guild_members(self.id, query, limit, presences)
+    def request_guild_members(self, query=None, limit=0, presences=True, nonce=None):
+        self.client.gw.request_guild_members(self.id, query, limit, presences, nonce)
 
-    def request_guild_members_by_id(self, user_id, limit=0, presences=True):
-        self.client.gw.request_guild_members_by_id(self.id, user_id, limit, presences)
+    def request_guild_members_by_id(self, user_id, limit=0, presences=True, nonce=None):
+        self.client.gw.request_guild_members_by_id(self.id, user_id, limit, presences, nonce)
 
     def get_bans(self):
         return self.client.api.guilds_bans_list(self.id)
@@ -0,0 +1,166 @@
+"""
+A bounded, insertion ordered buffer of objects indexed by an id, used for the
+`StackMessage` objects tracked by `State` (see `StateConfig.track_messages`).
+
+The buffer can be benchmarked against the `deque` it replaces from the command
+line like so:
+
+`python -m disco.util.buffer`
+"""
+import sys
+import time
+
+from collections import deque, namedtuple, OrderedDict
+from operator import attrgetter
+
+
+class IndexedBuffer:
+    """
+    A drop-in replacement for a bounded `deque` which also indexes its items
+    by a key (their `id` by default). Appending, removing a single item and
+    removing `k` items by key are O(1), O(1) and O(k), where a `deque` has to
+    scan itself for every removal.
+
+    Items are kept in an `OrderedDict`, so the oldest item is evicted in O(1)
+    once the buffer is full. Appending an item whose key is already buffered
+    replaces it in place.
+
+    Parameters
+    ----------
+    maxlen : int
+        The maximum number of buffered items.
+    key : function
+        Returns the key of an item.
+    """
+    __slots__ = ('maxlen', 'key', '_items')
+
+    def __init__(self, maxlen, key=attrgetter('id')):
+        self.maxlen = maxlen
+        self.key = key
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def __reversed__(self):
+        return reversed(self._items.values())
+
+    def __contains__(self, item):
+        return self.key(item) in self._items
+
+    def __repr__(self):
+        return f'IndexedBuffer({list(self._items.values())!r}, maxlen={self.maxlen})'
+
+    def append(self, item):
+        self._items[self.key(item)] = item
+        if len(self._items) > self.maxlen:
+            self._items.popitem(last=False)
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def get(self, key, default=None):
+        return self._items.get(key, default)
+
+    def remove(self, item):
+        """
+        Removes an item, raising `ValueError` (like a `deque`) if it isn't buffered.
+        """
+        if self._items.pop(self.key(item), None) is None:
+            raise ValueError('IndexedBuffer.remove(x): x not in buffer')
+
+    def discard(self, key):
+        """
+        Removes the item with the given key.
+
+        Returns
+        -------
+        object
+            The removed item, or None if no item has the key.
+        """
+        return self._items.pop(key, None)
+
+    def discard_many(self, keys):
+        """
+        Removes the items with the given keys.
+
+        Returns
+        -------
+        list
+            The removed items.
+        """
+        removed = (self._items.pop(key, None) for key in keys)
+        return [item for item in removed if item is not None]
+
+    def clear(self):
+        self._items.clear()
+
+
+# Shaped like `disco.state.StackMessage`, without importing the state (and gevent)
+_BenchMessage = namedtuple('_BenchMessage', ['id', 'channel_id', 'author_id'])
+
+
+def _bench(setup, func, rounds):
+    total = 0
+    for _ in range(rounds):
+        buf = setup()
+        start = time.perf_counter_ns()
+        func(buf)
+        total += time.perf_counter_ns() - start
+    return total / rounds / 1e3
+
+
+def benchmark(size=1000, bulk=100, rounds=200):
+    """
+    Times single and bulk deletes from a full `IndexedBuffer` against the
+    linear scans of a `deque` (as done by `State` before).
+
+    Returns
+    -------
+    dict(str, float)
+        The mean time (in microseconds) of every operation.
+    """
+    messages = [_BenchMessage(i, 1, 1) for i in range(size)]
+    ids = set(range(0, size, max(size // bulk, 1)))
+    middle = messages[size // 2]
+
+    def fill_deque():
+        return deque(messages, maxlen=size)
+
+    def fill_buffer():
+        buf = IndexedBuffer(size)
+        buf.extend(messages)
+        return buf
+
+    def deque_delete(buf):
+        sm = next((i for i in buf if i.id == middle.id), None)
+        buf.remove(sm)
+
+    def deque_delete_bulk(buf):
+        for sm in tuple(buf):
+            if sm.id in ids:
+                buf.remove(sm)
+
+    return {
+        'deque_delete_us': _bench(fill_deque, deque_delete, rounds),
+        'deque_delete_bulk_us': _bench(fill_deque, deque_delete_bulk, rounds),
+        'buffer_delete_us': _bench(fill_buffer, lambda buf: buf.discard(middle.id), rounds),
+        'buffer_delete_bulk_us': _bench(fill_buffer, lambda buf: buf.discard_many(ids), rounds),
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark deletes from tracked message buffers')
+    parser.add_argument('--size', type=int, default=1000, help='Number of buffered messages')
+    parser.add_argument('--bulk', type=int, default=100, help='Number of messages in a bulk delete')
+    parser.add_argument('--rounds', type=int, default=200, help='Number of rounds per operation')
+    args = parser.parse_args()
+
+    for name, value in benchmark(args.size, args.bulk, args.rounds).items():
+        sys.stdout.write('  {:<24} {:>10.2f}us\n'.format(name, value))
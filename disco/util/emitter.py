@@ -115,6 +115,14 @@ class Emitter(LoggingClass):
         }
 
     def emit(self, name, *args, **kwargs):
+        """
+        Calls all handlers of the given event name.
+
+        Returns
+        -------
+        list(`gevent.Greenlet`)
+            The greenlets spawned for the `Priority.NONE` handlers.
+        """
         # First execute all BEFORE handlers sequentially
         for listener in self.event_handlers[Priority.BEFORE].get(name, []):
             try:
@@ -155,9 +163,10 @@ class Emitter(LoggingClass):
                 ))
 
         # Finally just spawn for everything else
+        spawned = []
         for listener in self.event_handlers[Priority.NONE].get(name, []):
             try:
-                gevent.spawn(listener, *args, **kwargs)
+                spawned.append(gevent.spawn(listener, *args, **kwargs))
             except Exception as e:
                 self.log.warning('{} event handler `{}` raised {}: {}'.format(
                     name,
@@ -166,6 +175,15 @@ class Emitter(LoggingClass):
                     e,
                 ))
 
+        return spawned
+
+    def has_listeners(self, name):
+        """
+        Whether any listener (of any priority) is currently subscribed to the
+        given event name.
+        """
+        return any(handlers.get(name) for handlers in self.event_handlers.values())
+
     def on(self, *args, **kwargs):
         return EmitterSubscription(args[:-1], args[-1], **kwargs).attach(self)
 
@@ -1,4 +1,6 @@
-from collections import defaultdict
+import time
+
+from collections import defaultdict, OrderedDict
 
 
 class HashMap(dict):
@@ -44,3 +46,307 @@ class HashMap(dict):
 
 class DefaultHashMap(defaultdict, HashMap):
     pass
+
+
+class IndexedHashMap(HashMap):
+    """
+    A `HashMap` which maintains a secondary index from an attribute of its
+    values (e.g. `guild_id`) to the keys of the values sharing it, so that all
+    values for a given attribute can be found (or removed) without a scan.
+
+    Parameters
+    ----------
+    attr : str
+        The attribute of the values to index by.
+    """
+    __slots__ = ('attr', 'index')
+
+    def __init__(self, attr, *args, **kwargs):
+        super(IndexedHashMap, self).__init__()
+        self.attr = attr
+        self.index = {}
+        self.update(*args, **kwargs)
+
+    def _link(self, key, value):
+        self.index.setdefault(getattr(value, self.attr, None), set()).add(key)
+
+    def _unlink(self, key, value):
+        indexed = getattr(value, self.attr, None)
+        keys = self.index.get(indexed)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.index[indexed]
+
+    def __setitem__(self, key, value):
+        if key in self:
+            self._unlink(key, dict.__getitem__(self, key))
+        dict.__setitem__(self, key, value)
+        self._link(key, value)
+
+    def __delitem__(self, key):
+        self._unlink(key, dict.__getitem__(self, key))
+        dict.__delitem__(self, key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def pop(self, key, *args):
+        if key in self:
+            self._unlink(key, dict.__getitem__(self, key))
+        return dict.pop(self, key, *args)
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        self._unlink(key, value)
+        return key, value
+
+    def clear(self):
+        dict.clear(self)
+        self.index.clear()
+
+    def keys_for(self, value):
+        """
+        The keys of all values whose indexed attribute equals the given value.
+        """
+        return frozenset(self.index.get(value, ()))
+
+    def select_indexed(self, value):
+        """
+        All values whose indexed attribute equals the given value.
+        """
+        return [dict.__getitem__(self, key) for key in self.index.get(value, ())]
+
+    def remove_indexed(self, value):
+        """
+        Removes all values whose indexed attribute equals the given value.
+        """
+        for key in self.index.pop(value, ()):
+            dict.__delitem__(self, key)
+
+
+class BoundedHashMap(OrderedDict, HashMap):
+    """
+    A `HashMap` bounded by size (least recently used entries are evicted first)
+    and/or by time since an entry was last set or read.
+
+    Parameters
+    ----------
+    maxsize : int
+        The maximum number of entries, or 0 for no limit.
+    ttl : int
+        Seconds after which an entry which hasn't been used (set, read or
+        checked with `in`) expires, or 0 for no expiry.
+    pinned : Optional[function]
+        Called with (key, value) for every entry about to be evicted, entries
+        for which it returns True are kept (and count as recently used).
+
+    Attributes
+    ----------
+    hits : int
+        Lookups which found an entry.
+    misses : int
+        Lookups which found no (or an expired) entry.
+    evictions : int
+        Entries evicted due to the size limit or expiry.
+    """
+    def __init__(self, maxsize=0, ttl=0, pinned=None, *args, **kwargs):
+        super(BoundedHashMap, self).__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.pinned = pinned
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._touched = {}
+        self.update(*args, **kwargs)
+
+    def _expired(self, key, now):
+        return self.ttl and now - self._touched.get(key, now) > self.ttl
+
+    def __contains__(self, key):
+        if not OrderedDict.__contains__(self, key):
+            return False
+
+        if self.ttl:
+            now = time.monotonic()
+            if self._expired(key, now):
+                self.evictions += 1
+                del self[key]
+                return False
+            # Keeps the entry alive for a lookup right after the check
+            self._touched[key] = now
+        return True
+
+    def __getitem__(self, key):
+        try:
+            value = OrderedDict.__getitem__(self, key)
+        except KeyError:
+            self.misses += 1
+            raise
+
+        if self.ttl:
+            now = time.monotonic()
+            if self._expired(key, now):
+                self.misses += 1
+                self.evictions += 1
+                del self[key]
+                raise KeyError(key)
+            self._touched[key] = now
+
+        self.hits += 1
+        self.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, value):
+        OrderedDict.__setitem__(self, key, value)
+        self.move_to_end(key)
+        if self.ttl:
+            self._touched[key] = time.monotonic()
+        self.evict()
+
+    def __delitem__(self, key):
+        OrderedDict.__delitem__(self, key)
+        self._touched.pop(key, None)
+
+    def pop(self, key, *args):
+        self._touched.pop(key, None)
+        return OrderedDict.pop(self, key, *args)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return OrderedDict.__getitem__(self, key)
+
+    def clear(self):
+        OrderedDict.clear(self)
+        self._touched.clear()
+
+    def evict(self):
+        """
+        Evicts entries over the size limit and expired entries, starting with
+        the least recently used.
+        """
+        now = time.monotonic()
+        checked = 0
+        while checked < len(self):
+            key = next(iter(self))
+            if not self._expired(key, now) and (not self.maxsize or len(self) <= self.maxsize):
+                break
+
+            checked += 1
+            if self.pinned and self.pinned(key, OrderedDict.__getitem__(self, key)):
+                self.move_to_end(key)
+                if self.ttl:
+                    self._touched[key] = now
+                continue
+
+            del self[key]
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            'size': len(self),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class LazyHashMap(HashMap):
+    """
+    A `HashMap` which is filled by calling `loader` the first time it is used.
+    The loader is expected to call `fill` (on this and any related maps).
+    """
+    __slots__ = ('loader', 'loaded')
+
+    def __init__(self, loader):
+        super(LazyHashMap, self).__init__()
+        self.loader = loader
+        self.loaded = False
+
+    def fill(self, items):
+        self.loaded = True
+        self.loader = None
+        dict.update(self, items)
+
+    def _load(self):
+        if not self.loaded:
+            self.loader()
+            self.loaded = True
+
+    def __getitem__(self, key):
+        self._load()
+        return dict.__getitem__(self, key)
+
+    def __setitem__(self, key, value):
+        self._load()
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self._load()
+        dict.__delitem__(self, key)
+
+    def __contains__(self, key):
+        self._load()
+        return dict.__contains__(self, key)
+
+    def __iter__(self):
+        self._load()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self._load()
+        return dict.__len__(self)
+
+    def __repr__(self):
+        return dict.__repr__(self) if self.loaded else '<LazyHashMap (not loaded)>'
+
+    def get(self, key, default=None):
+        self._load()
+        return dict.get(self, key, default)
+
+    def keys(self):
+        self._load()
+        return dict.keys(self)
+
+    def values(self):
+        self._load()
+        return dict.values(self)
+
+    def items(self):
+        self._load()
+        return dict.items(self)
+
+    def pop(self, key, *args):
+        self._load()
+        return dict.pop(self, key, *args)
+
+    def setdefault(self, key, default=None):
+        self._load()
+        return dict.setdefault(self, key, default)
+
+    def update(self, *args, **kwargs):
+        self._load()
+        dict.update(self, *args, **kwargs)
+
+    def copy(self):
+        self._load()
+        return HashMap(self)
@@ -1,21 +1,64 @@
-import gevent
+import time
 
+from collections import deque
 
-class SimpleLimiter:
-    def __init__(self, total, per):
-        self.total = total
+
+class SlidingWindowLimiter:
+    """
+    Allows up to `limit` acquisitions within any `per` second window, by keeping
+    the time of every acquisition made in the last window. Unlike a token
+    bucket, the whole limit can be used in a burst while the sustained rate is
+    still the full `limit` every `per` seconds.
+
+    Parameters
+    ----------
+    limit : int
+        The number of acquisitions allowed within any `per` seconds.
+    per : float
+        The window, in seconds.
+    """
+    def __init__(self, limit, per):
+        self.limit = limit
         self.per = per
-        self._lock = gevent.lock.Semaphore(total)
+        self._taken = deque()
+
+    def _expire(self):
+        now = time.monotonic()
+        cutoff = now - self.per
+        while self._taken and self._taken[0] <= cutoff:
+            self._taken.popleft()
+        return now
+
+    def available(self):
+        self._expire()
+        return self.limit - len(self._taken)
 
-        self.count = 0
-        self.reset_at = 0
-        self.event = None
+    def delay(self, count=1):
+        """
+        Seconds until `count` acquisitions fit into the window.
+        """
+        now = self._expire()
+        excess = len(self._taken) + count - self.limit
+        if excess <= 0:
+            return 0
+        if excess > len(self._taken):
+            return self.per
+        return max(0, self._taken[excess - 1] + self.per - now)
 
-    def check(self):
-        self._lock.acquire()
+    def try_acquire(self, count=1):
+        """
+        Acquires `count` times if doing so stays within the limit.
+        """
+        if self.available() < count:
+            return False
 
-        def _release_lock():
-            gevent.sleep(self.per)
-            self._lock.release()
+        self.acquire(count)
+        return True
 
-        gevent.spawn(_release_lock)
+    def acquire(self, count=1):
+        """
+        Acquires `count` times regardless of the limit, which may then be
+        exceeded until the window moves past them.
+        """
+        now = self._expire()
+        self._taken.extend([now] * count)
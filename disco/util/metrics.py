@@ -0,0 +1,257 @@
+import sys
+import types
+
+from array import array
+from bisect import bisect_left
+from collections import defaultdict, deque
+
+# Objects which are never walked into by `deep_sizeof`
+_SIZEOF_SKIPPED = (type, types.ModuleType, types.FunctionType, types.MethodType, types.BuiltinFunctionType)
+_SIZEOF_ATOMIC = (str, bytes, bytearray, int, float, bool, array)
+
+# Bucket upper bounds in nanoseconds, from 10us up to 1s
+DEFAULT_BUCKETS = tuple(int(us * 1000) for us in (
+    10, 25, 50, 100, 250, 500,
+    1000, 2500, 5000, 10000, 25000, 50000,
+    100000, 250000, 500000, 1000000,
+))
+
+
+class Histogram:
+    """
+    A fixed-bucket histogram of durations (in nanoseconds). Recording a value
+    is O(log buckets) and never allocates.
+
+    Attributes
+    ----------
+    buckets : tuple(int)
+        The (inclusive) upper bound of each bucket, values over the last bound
+        are counted in an overflow bucket.
+    counts : list(int)
+        The number of values recorded in each bucket (plus the overflow bucket).
+    count : int
+        Total number of recorded values.
+    total : int
+        Sum of all recorded values.
+    max : int
+        The largest recorded value.
+    """
+    __slots__ = ('buckets', 'counts', 'count', 'total', 'max')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, pct):
+        """
+        The upper bound of the bucket containing the given percentile, or the
+        largest recorded value if it falls into the overflow bucket.
+        """
+        if not self.count:
+            return 0
+
+        target = self.count * pct / 100.0
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                break
+
+        if index >= len(self.buckets):
+            return self.max
+        return min(self.buckets[index], self.max)
+
+    def to_dict(self):
+        """
+        Summary of this histogram, with all durations in milliseconds.
+        """
+        return {
+            'count': self.count,
+            'mean': (self.total / self.count / 1e6) if self.count else 0,
+            'max': self.max / 1e6,
+            'p50': self.percentile(50) / 1e6,
+            'p95': self.percentile(95) / 1e6,
+            'p99': self.percentile(99) / 1e6,
+            'buckets': {
+                bound / 1e6: count for bound, count in zip(self.buckets + (float('inf'), ), self.counts)
+            },
+        }
+
+
+class HistogramGroup:
+    """
+    A set of histograms keyed by name (e.g. event type) and stage (e.g. decode),
+    created on first use.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.histograms = defaultdict(dict)
+
+    def record(self, name, stage, value):
+        stages = self.histograms[name]
+        histogram = stages.get(stage)
+        if histogram is None:
+            histogram = stages[stage] = Histogram(self.buckets)
+        histogram.record(value)
+
+    def get(self, name, stage):
+        return self.histograms.get(name, {}).get(stage)
+
+    def reset(self):
+        self.histograms.clear()
+
+    def summary(self, name=None):
+        """
+        Summaries of all histograms (or those of a single name), see `Histogram.to_dict`.
+        """
+        if name is not None:
+            return {stage: h.to_dict() for stage, h in self.histograms.get(name, {}).items()}
+
+        return {
+            name: {stage: h.to_dict() for stage, h in stages.items()}
+            for name, stages in self.histograms.items()
+        }
+
+
+class LatencyTracker:
+    """
+    A ring buffer of the most recent heartbeat round trip times (in
+    milliseconds), and a count of heartbeats which were never acknowledged.
+
+    Attributes
+    ----------
+    samples : deque(float)
+        The most recent round trip times.
+    acks : int
+        Total number of acknowledged heartbeats.
+    misses : int
+        Total number of heartbeats which were never acknowledged.
+    """
+    def __init__(self, size=128):
+        self.samples = deque(maxlen=size)
+        self.acks = 0
+        self.misses = 0
+
+    def record(self, rtt):
+        self.samples.append(rtt)
+        self.acks += 1
+
+    def miss(self):
+        self.misses += 1
+
+    @staticmethod
+    def _percentile(ordered, pct):
+        if not ordered:
+            return 0
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100.0))]
+
+    @staticmethod
+    def _jitter(samples):
+        # Mean absolute difference between consecutive samples
+        if len(samples) < 2:
+            return 0
+        return sum(abs(b - a) for a, b in zip(samples, samples[1:])) / (len(samples) - 1)
+
+    def to_dict(self):
+        samples = list(self.samples)
+        ordered = sorted(samples)
+        return {
+            'last': samples[-1] if samples else -1,
+            'p50': self._percentile(ordered, 50),
+            'p95': self._percentile(ordered, 95),
+            'p99': self._percentile(ordered, 99),
+            'jitter': self._jitter(samples),
+            'acks': self.acks,
+            'misses': self.misses,
+            'samples': samples,
+        }
+
+    @classmethod
+    def aggregate(cls, stats):
+        """
+        Combines the `to_dict` output of several trackers (e.g. one per shard)
+        into a single summary over all of their samples.
+        """
+        stats = [s for s in stats if s]
+        ordered = sorted(sample for s in stats for sample in s['samples'])
+        return {
+            'p50': cls._percentile(ordered, 50),
+            'p95': cls._percentile(ordered, 95),
+            'p99': cls._percentile(ordered, 99),
+            'max': ordered[-1] if ordered else -1,
+            'jitter': max((s['jitter'] for s in stats), default=0),
+            'acks': sum(s['acks'] for s in stats),
+            'misses': sum(s['misses'] for s in stats),
+        }
+
+
+def deep_sizeof(obj, exclude=(), skip_attrs=('client', )):
+    """
+    Approximates the number of bytes retained by an object, by summing the
+    `sys.getsizeof` of everything reachable from it (through containers,
+    `__slots__` and `__dict__`), counting every object once.
+
+    Parameters
+    ----------
+    obj : object
+        The object to size.
+    exclude : tuple(type)
+        Types of (nested) objects which aren't counted, e.g. because they're
+        accounted for elsewhere.
+    skip_attrs : tuple(str)
+        Attributes which aren't followed, e.g. references to shared objects.
+
+    Returns
+    -------
+    int
+        The approximate size in bytes.
+    """
+    seen = set()
+    size = 0
+    stack = [obj]
+
+    while stack:
+        item = stack.pop()
+        if item is None or id(item) in seen or isinstance(item, _SIZEOF_SKIPPED):
+            continue
+        if item is not obj and exclude and isinstance(item, exclude):
+            continue
+
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+
+        if isinstance(item, _SIZEOF_ATOMIC):
+            continue
+        elif isinstance(item, dict):
+            # Bypasses overridden accessors, e.g. ones which load or reorder the map
+            stack.extend(dict.keys(item))
+            stack.extend(dict.values(item))
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            stack.extend(item)
+
+        for cls in type(item).__mro__:
+            slots = cls.__dict__.get('__slots__', ())
+            for slot in ((slots, ) if isinstance(slots, str) else slots):
+                if slot not in skip_attrs and slot != '__weakref__':
+                    stack.append(getattr(item, slot, None))
+
+        attrs = getattr(item, '__dict__', None)
+        if isinstance(attrs, dict):
+            seen.add(id(attrs))
+            size += sys.getsizeof(attrs)
+            stack.extend(v for k, v in attrs.items() if k not in skip_attrs)
+
+    return size
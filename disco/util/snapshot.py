@@ -0,0 +1,179 @@
+"""
+A compact, versioned file format holding encoded objects keyed by an integer
+id (e.g. guilds keyed by their id), used by `State.snapshot` and `State.restore`.
+
+The file is laid out as a header, a metadata blob, one (optionally compressed)
+blob per object, an index of (key, offset, length) entries and a fixed size
+trailer locating the index. Readers memory-map the file and only decode the
+blobs they are asked for.
+"""
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+
+SNAPSHOT_MAGIC = b'DSNP'
+SNAPSHOT_VERSION = 1
+
+FLAG_ZLIB = 1 << 0
+
+# magic, version (uint8), flags (uint8), encoder type length (uint8)
+HEADER = struct.Struct('<4sBBB')
+# key (uint64), offset (uint64), length (uint32)
+INDEX_ENTRY = struct.Struct('<QQI')
+# index offset (uint64), entry count (uint32), metadata offset (uint64), metadata length (uint32)
+TRAILER = struct.Struct('<QIQI')
+
+
+class SnapshotWriter:
+    """
+    Writes a snapshot file, atomically replacing `path` once closed.
+
+    Parameters
+    ----------
+    path : str
+        The path of the snapshot to write.
+    encoder : :class:`disco.gateway.encoding.base.BaseEncoder`
+        The encoder used to encode every object.
+    meta : dict
+        Metadata stored alongside the objects.
+    compress : bool
+        Whether to zlib compress every blob.
+    """
+    def __init__(self, path, encoder, meta=None, compress=True):
+        self.path = path
+        self.encoder = encoder
+        self.compress = compress
+        self.index = []
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, self._tmp = tempfile.mkstemp(dir=directory, prefix='.snapshot-')
+        self._file = os.fdopen(fd, 'wb')
+
+        encoder_type = encoder.TYPE.encode('utf-8')
+        self._file.write(HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, FLAG_ZLIB if compress else 0, len(encoder_type)))
+        self._file.write(encoder_type)
+        self._meta = self._write_blob(meta or {})
+
+    def _write_blob(self, obj):
+        data = self.encoder.encode(obj)
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if self.compress:
+            data = zlib.compress(data)
+
+        offset = self._file.tell()
+        self._file.write(data)
+        return offset, len(data)
+
+    def write(self, key, obj):
+        offset, length = self._write_blob(obj)
+        self.index.append((key, offset, length))
+
+    def close(self):
+        index_offset = self._file.tell()
+        for entry in self.index:
+            self._file.write(INDEX_ENTRY.pack(*entry))
+        self._file.write(TRAILER.pack(index_offset, len(self.index), *self._meta))
+
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        self._file.close()
+        os.unlink(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type:
+            self.abort()
+        else:
+            self.close()
+
+
+class SnapshotReader:
+    """
+    Reads a snapshot file written by `SnapshotWriter`, decoding objects on demand.
+
+    Parameters
+    ----------
+    path : str
+        The path of the snapshot to read.
+    encoder : :class:`disco.gateway.encoding.base.BaseEncoder`
+        The encoder used to decode objects, which must be of the same type as
+        the one the snapshot was written with.
+
+    Attributes
+    ----------
+    meta : dict
+        The snapshot's metadata.
+    index : dict(int, tuple(int, int))
+        The offset and length of every object by key.
+    """
+    def __init__(self, path, encoder):
+        self.path = path
+        self.encoder = encoder
+
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, version, flags, encoder_size = HEADER.unpack_from(self._mmap, 0)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f'{path} is not a state snapshot')
+            if version != SNAPSHOT_VERSION:
+                raise ValueError(f'Unsupported state snapshot version {version}')
+
+            encoder_type = self._mmap[HEADER.size:HEADER.size + encoder_size].decode('utf-8')
+            if encoder_type != encoder.TYPE:
+                raise ValueError(f'State snapshot was written with a `{encoder_type}` encoder, not `{encoder.TYPE}`')
+
+            self.compressed = bool(flags & FLAG_ZLIB)
+
+            index_offset, count, meta_offset, meta_length = TRAILER.unpack_from(
+                self._mmap, len(self._mmap) - TRAILER.size)
+            self.index = {}
+            for i in range(count):
+                key, offset, length = INDEX_ENTRY.unpack_from(self._mmap, index_offset + i * INDEX_ENTRY.size)
+                self.index[key] = (offset, length)
+
+            self.meta = self._read_blob(meta_offset, meta_length)
+        except Exception:
+            self.close()
+            raise
+
+    def _read_blob(self, offset, length):
+        data = self._mmap[offset:offset + length]
+        if self.compressed:
+            data = zlib.decompress(data)
+        return self.encoder.decode(data)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __iter__(self):
+        for key, (offset, length) in self.index.items():
+            yield key, self._read_blob(offset, length)
+
+    def keys(self):
+        return self.index.keys()
+
+    def read(self, key):
+        return self._read_blob(*self.index[key])
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
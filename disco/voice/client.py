@@ -9,6 +9,7 @@ from disco.gateway.packets import OPCode
 from disco.types.base import cached_property
 from disco.util.emitter import Emitter
 from disco.util.logging import LoggingClass
+from disco.util.metrics import LatencyTracker
 from disco.util.websocket import Websocket
 from disco.voice.packets import VoiceOPCode
 from disco.voice.udp import AudioCodecs, RTPPayloadTypes, UDPVoiceClient
@@ -122,6 +123,7 @@ class VoiceClient(LoggingClass):
         # Latency
         self._last_heartbeat = 0
         self.latency = -1
+        self.heartbeats = LatencyTracker()
 
         # SSRCs
         self.audio_ssrcs = {}
@@ -201,6 +203,7 @@ class VoiceClient(LoggingClass):
         while True:
             if not self._heartbeat_acknowledged:
                 self.log.warning('[{}] WS Received HEARTBEAT without HEARTBEAT_ACK, reconnecting...'.format(self.channel_id))
+                self.heartbeats.miss()
                 self._heartbeat_acknowledged = True
                 self.ws.close(status=4000)
                 self.on_close(0, 'HEARTBEAT failure')
@@ -216,8 +219,12 @@ class VoiceClient(LoggingClass):
 
     def handle_heartbeat_acknowledge(self, _):
         self.log.debug('[{}] Received WS HEARTBEAT_ACK'.format(self.channel_id))
+        if self._heartbeat_acknowledged:
+            return
+
         self._heartbeat_acknowledged = True
         self.latency = float('{:.2f}'.format((time.perf_counter() - self._last_heartbeat) * 1000))
+        self.heartbeats.record(self.latency)
 
     def set_speaking(self, voice=False, soundshare=False, priority=False, delay=0):
         value = SpeakingFlags.NONE
@@ -17,10 +17,13 @@ extras_require = {
     'music': ['yt-dlp>=2022.3.8.2'],
     'performance': [
         'erlpack>=1.0.0',
+        'msgspec>=0.18.0',
+        'orjson>=3.9.10',
         'regex>=2022.3.15',
         'pylibyaml>=0.1.0',
         'ujson>=5.2.0',
         'wsaccel>=0.6.3',
+        'zstandard>=0.22.0',
     ],
     'sharding': ['gipc>=1.6.0', 'dill>=0.3.6'],
 }
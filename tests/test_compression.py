@@ -0,0 +1,24 @@
+import pytest
+
+from disco.client import Client, ClientConfig
+from disco.gateway import compression
+
+
+def make_client(value):
+    return Client(ClientConfig({'compression': value}))
+
+
+def test_missing_optional_compressor_names_the_extra(monkeypatch):
+    monkeypatch.delitem(compression.COMPRESSORS, 'zstd-stream', raising=False)
+
+    with pytest.raises(ValueError, match=r'zstandard.*\[performance\]'):
+        make_client('zstd-stream')
+
+
+def test_unknown_compression_is_rejected():
+    with pytest.raises(ValueError, match='Unknown gateway compression'):
+        make_client('brotli')
+
+
+def test_zlib_stream_alias():
+    assert make_client(True).gw.compression == 'zlib-stream'
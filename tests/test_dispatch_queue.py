@@ -0,0 +1,61 @@
+import gevent
+
+from disco.gateway.dispatch import DispatchQueue, OverflowPolicy
+
+
+def make_queue(maxsize, overflow, delay=0):
+    handled = []
+
+    def handler(data):
+        if delay:
+            gevent.sleep(delay)
+        handled.append(data['s'])
+
+    return DispatchQueue(handler, maxsize, overflow), handled
+
+
+def test_block_keeps_order_and_bounds_the_queue():
+    queue, handled = make_queue(5, OverflowPolicy.BLOCK, delay=0.001)
+
+    def reader():
+        for seq in range(100):
+            queue.put({'t': 'TEST', 's': seq})
+            assert len(queue) <= 5
+
+    gevent.spawn(reader).join(timeout=5)
+    gevent.sleep(0.2)
+
+    assert handled == list(range(100))
+    assert queue.max_depth <= 5
+    assert queue.dropped == 0
+
+
+def test_block_holds_the_reader_back():
+    queue, handled = make_queue(2, OverflowPolicy.BLOCK, delay=10)
+    reader = gevent.spawn(lambda: [queue.put({'t': 'TEST', 's': seq}) for seq in range(10)])
+    gevent.sleep(0.05)
+
+    # One dispatch is being handled, two are queued and the reader waits on the fourth
+    assert not reader.ready()
+    assert len(queue) == 2
+    reader.kill()
+
+
+def test_drop_newest():
+    queue, handled = make_queue(3, OverflowPolicy.DROP_NEWEST)
+    results = [queue.put({'t': 'TEST', 's': seq}) for seq in range(5)]
+    gevent.sleep(0.05)
+
+    assert results == [True, True, True, False, False]
+    assert handled == [0, 1, 2]
+    assert queue.dropped == 2
+
+
+def test_drop_oldest():
+    queue, handled = make_queue(3, OverflowPolicy.DROP_OLDEST)
+    for seq in range(5):
+        queue.put({'t': 'TEST', 's': seq})
+    gevent.sleep(0.05)
+
+    assert handled == [2, 3, 4]
+    assert queue.dropped == 2
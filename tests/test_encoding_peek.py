@@ -0,0 +1,77 @@
+import pytest
+
+from disco.gateway.encoding.json import JSONEncoder
+
+CROSSPOST = {
+    'op': 0,
+    's': 42,
+    't': 'MESSAGE_CREATE',
+    'd': {
+        'id': '100',
+        'message_reference': {'guild_id': '999', 'channel_id': '20', 'message_id': '30'},
+        'content': 'not a key: "guild_id": "888", {"op": 7}',
+        'guild_id': '123',
+    },
+}
+
+# `d` first, as with ETF payloads whose top-level keys come after it
+D_FIRST = {
+    'd': {'members': [{'guild_id': '999'}], 'guild_id': '123', 'op': 9},
+    'op': 0,
+    's': 43,
+    't': 'GUILD_MEMBERS_CHUNK',
+}
+
+
+def etf_encoder():
+    try:
+        from disco.gateway.encoding.etf import ETFEncoder
+    except ImportError:
+        pytest.skip('erlpack is not installed')
+    return ETFEncoder
+
+
+def encode(encoder, obj):
+    data = encoder.encode(obj)
+    return data.encode('utf-8') if isinstance(data, str) else data
+
+
+@pytest.mark.parametrize('payload', [CROSSPOST, D_FIRST], ids=['crosspost', 'd_first'])
+def test_etf_peek_ignores_nested_guild_ids(payload):
+    encoder = etf_encoder()
+    assert encoder.peek(encode(encoder, payload), guild_id=True) == (
+        0, payload['s'], payload['t'], 123,
+    )
+
+
+def test_etf_peek_without_top_level_guild_id():
+    encoder = etf_encoder()
+    payload = {'op': 0, 's': 1, 't': 'MESSAGE_CREATE', 'd': {'message_reference': {'guild_id': '999'}}}
+    assert encoder.peek(encode(encoder, payload), guild_id=True) == (0, 1, 'MESSAGE_CREATE', None)
+
+
+def test_etf_peek_non_dispatch():
+    encoder = etf_encoder()
+    assert encoder.peek(encode(encoder, {'op': 11, 'd': None, 's': None, 't': None}), guild_id=True) == (
+        11, None, None, None,
+    )
+
+
+@pytest.mark.parametrize('separators', [(',', ':'), (', ', ': ')], ids=['compact', 'spaced'])
+def test_json_peek_discord_layout(separators):
+    import json
+    # Discord sends `t`, `s`, `op` and `d` in this order
+    payload = {key: CROSSPOST[key] for key in ('t', 's', 'op', 'd')}
+    frame = json.dumps(payload, separators=separators).encode('utf-8')
+    # The guild ID is never peeked from JSON, which would cost more than decoding
+    assert JSONEncoder.peek(frame, guild_id=True) == (0, 42, 'MESSAGE_CREATE', None)
+    assert JSONEncoder.peek(frame.decode('utf-8')) == (0, 42, 'MESSAGE_CREATE', None)
+
+
+def test_json_peek_non_dispatch():
+    assert JSONEncoder.peek(b'{"t":null,"s":null,"op":11,"d":null}') == (11, None, None, None)
+
+
+def test_json_peek_other_layouts_are_not_peeked():
+    assert JSONEncoder.peek(encode(JSONEncoder, D_FIRST)) is None
+    assert JSONEncoder.peek(b'{"s":1,"t":"MESSAGE_CREATE","op":0,"d":{}}') is None
@@ -0,0 +1,47 @@
+import gevent
+
+from disco.client import Client, ClientConfig
+
+
+TYPING_START = {
+    't': 'TYPING_START',
+    's': 1,
+    'op': 0,
+    'd': {'channel_id': '10', 'user_id': '5', 'timestamp': 1700000000},
+}
+
+
+def make_client():
+    return Client(ClientConfig({'metrics_enable': True}))
+
+
+def dispatch(client):
+    packet = dict(TYPING_START, d=dict(TYPING_START['d']))
+    client.gw.handle_dispatch(packet)
+
+
+def test_latency_includes_spawned_handlers():
+    client = make_client()
+    client.events.on('TypingStart', lambda event: gevent.sleep(0.05))
+
+    dispatch(client)
+    assert client.gw.metrics.get('TYPING_START', 'latency') is None
+
+    gevent.sleep(0.1)
+    latency = client.gw.metrics.get('TYPING_START', 'latency')
+    assert latency.count == 1
+    assert latency.max >= 50 * 1000 * 1000
+    assert client.gw.metrics.get('TYPING_START', 'dispatch').max >= 50 * 1000 * 1000
+
+
+def test_latency_waits_for_the_slowest_handler():
+    client = make_client()
+    client.events.on('TypingStart', lambda event: None)
+    client.events.on('TypingStart', lambda event: gevent.sleep(0.05))
+
+    dispatch(client)
+    gevent.sleep(0.1)
+
+    latency = client.gw.metrics.get('TYPING_START', 'latency')
+    assert latency.count == 1
+    assert latency.max >= 50 * 1000 * 1000
@@ -0,0 +1,51 @@
+import pytest
+
+from disco.util import hashmap
+from disco.util.hashmap import BoundedHashMap
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(hashmap, 'time', clock)
+    return clock
+
+
+def test_contains_and_getitem_agree_after_expiry(clock):
+    m = BoundedHashMap(0, 0.05)
+    m[1] = 'one'
+    assert 1 in m
+    assert m[1] == 'one'
+
+    clock.now += 0.1
+    assert 1 not in m
+    with pytest.raises(KeyError):
+        m[1]
+    assert m.evictions == 1
+
+
+def test_contains_keeps_entry_alive_for_lookup(clock):
+    m = BoundedHashMap(0, 0.05)
+    m[1] = 'one'
+
+    clock.now += 0.04
+    assert 1 in m
+    clock.now += 0.04
+    assert m[1] == 'one'
+
+
+def test_setdefault_replaces_expired_entry(clock):
+    m = BoundedHashMap(0, 0.05)
+    m[1] = 'old'
+
+    clock.now += 0.1
+    assert m.setdefault(1, 'new') == 'new'
+    assert m[1] == 'new'
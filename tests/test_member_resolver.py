@@ -0,0 +1,98 @@
+import gevent
+import pytest
+
+from disco.client import Client, ClientConfig
+from disco.gateway.events import GuildMembersChunk
+
+
+@pytest.fixture
+def client():
+    client = Client(ClientConfig())
+    client.state.config.resolve_members_window = 0.01
+    client.state.config.resolve_members_timeout = 0.2
+    client.requests = []
+    client.gw.request_guild_members_by_id = lambda guild_id, user_ids, **kwargs: client.requests.append(
+        (guild_id, list(user_ids), kwargs['nonce']))
+    return client
+
+
+def chunk(client, nonce, user_ids, not_found=(), index=0, count=1):
+    return GuildMembersChunk.create({
+        'guild_id': '1',
+        'members': [{'user': {'id': str(user_id), 'username': f'user{user_id}'}} for user_id in user_ids],
+        'chunk_index': index,
+        'chunk_count': count,
+        'not_found': [str(i) for i in not_found],
+        'nonce': nonce,
+    }, client)
+
+
+def test_lookups_are_coalesced_into_one_request(client):
+    resolver = client.state.member_resolver
+    results = [resolver.resolve(1, user_id) for user_id in (10, 11, 10)]
+    assert results[0] is results[2]
+
+    gevent.sleep(0.05)
+    assert len(client.requests) == 1
+    guild_id, user_ids, nonce = client.requests[0]
+    assert (guild_id, user_ids) == (1, [10, 11])
+    assert nonce.startswith('resolve:')
+
+    resolver.on_chunk(chunk(client, nonce, [10], not_found=[11]))
+    assert results[0].get(timeout=1).id == 10
+    assert results[1].get(timeout=1) is None
+    assert not resolver.inflight
+
+
+def test_requests_hold_at_most_100_users(client):
+    resolver = client.state.member_resolver
+    for user_id in range(250):
+        resolver.resolve(1, user_id)
+
+    gevent.sleep(0.05)
+    assert [len(user_ids) for _, user_ids, _ in client.requests] == [100, 100, 50]
+    assert len({nonce for _, _, nonce in client.requests}) == 3
+
+
+def test_lookups_wait_for_every_chunk(client):
+    resolver = client.state.member_resolver
+    first, second = resolver.resolve(1, 10), resolver.resolve(1, 11)
+    gevent.sleep(0.05)
+    nonce = client.requests[0][2]
+
+    resolver.on_chunk(chunk(client, nonce, [10], index=0, count=2))
+    assert first.get(timeout=1).id == 10
+    assert not second.ready()
+
+    resolver.on_chunk(chunk(client, nonce, [11], index=1, count=2))
+    assert second.get(timeout=1).id == 11
+
+
+def test_unanswered_lookups_are_released_on_timeout(client):
+    resolver = client.state.member_resolver
+    result = resolver.resolve(1, 10)
+
+    assert result.get(timeout=1) is None
+    assert resolver.timed_out == 1
+    assert not resolver.inflight
+
+
+def test_chunks_for_other_nonces_are_ignored(client):
+    resolver = client.state.member_resolver
+    result = resolver.resolve(1, 10)
+    gevent.sleep(0.05)
+
+    resolver.on_chunk(chunk(client, 'sync:0', [10]))
+    assert not result.ready()
+
+
+def test_get_member_does_not_block_the_dispatch_worker(client):
+    from disco.types.guild import Guild
+
+    guild = Guild({'id': '1'}, client)
+    client.gw.session_id = 'session'
+    client.gw.in_dispatch_worker = lambda: True
+    client.api.guilds_members_get = lambda guild_id, user_id: 'rest'
+
+    assert guild.get_member(10) == 'rest'
+    assert not client.requests
@@ -0,0 +1,94 @@
+from disco.client import Client, ClientConfig
+from disco.gateway.events import GatewayEvent
+from disco.types.channel import Channel
+from disco.types.message import Message
+
+
+def make_client(**state):
+    return Client(ClientConfig({'state': dict({'cache_messages_size': 10}, **state)}))
+
+
+def message_payload(**kwargs):
+    payload = {
+        'id': '100',
+        'channel_id': '10',
+        'guild_id': '1',
+        'author': {'id': '5', 'username': 'author'},
+        'content': 'hello',
+        'timestamp': '2024-01-01T00:00:00.000000+00:00',
+        'attachments': [{'id': '7', 'filename': 'a.png', 'url': 'https://example.com/a.png'}],
+        'mentions': [{'id': '6', 'username': 'mentioned'}],
+        'embeds': [],
+    }
+    payload.update(kwargs)
+    return payload
+
+
+def dispatch(client, name, data):
+    event = GatewayEvent.from_dispatch(client, {'t': name, 'd': data})
+    getattr(client.state, 'on_' + name.lower())(event)
+    return event
+
+
+def dispatch_update(client, data):
+    return dispatch(client, 'MESSAGE_UPDATE', data)
+
+
+def test_created_messages_are_cached_until_deleted():
+    client = make_client()
+    client.state.channels[10] = Channel({'id': '10', 'guild_id': '1', 'type': 0}, client)
+    cache = client.state.message_cache
+    for message_id in ('100', '101', '102'):
+        dispatch(client, 'MESSAGE_CREATE', message_payload(id=message_id))
+
+    assert len(cache) == 3
+    assert cache.get(10, 101).content == 'hello'
+
+    event = dispatch(client, 'MESSAGE_DELETE', {'id': '101', 'channel_id': '10', 'guild_id': '1'})
+    assert event.cached_message.id == 101
+    assert cache.get(10, 101) is None
+    assert len(cache) == 2
+
+
+def test_partial_update_keeps_cached_fields():
+    client = make_client()
+    cache = client.state.message_cache
+    cache.put(Message(message_payload(), client))
+
+    event = dispatch_update(client, {
+        'id': '100',
+        'channel_id': '10',
+        'guild_id': '1',
+        'embeds': [{'title': 'Link preview'}],
+    })
+
+    assert event.before.content == 'hello'
+    assert not event.before.embeds
+
+    cached = cache.get(10, 100)
+    assert cached.author.id == 5
+    assert cached.content == 'hello'
+    assert list(cached.attachments) == [7]
+    assert list(cached.mentions) == [6]
+    assert [embed.title for embed in cached.embeds] == ['Link preview']
+
+
+def test_full_update_replaces_content():
+    client = make_client()
+    cache = client.state.message_cache
+    cache.put(Message(message_payload(), client))
+
+    dispatch_update(client, message_payload(content='edited', attachments=[]))
+
+    cached = cache.get(10, 100)
+    assert cached.content == 'edited'
+    assert not cached.attachments
+    assert cached.author.id == 5
+
+
+def test_updates_of_uncached_messages_are_ignored():
+    client = make_client()
+    event = dispatch_update(client, message_payload(id='101'))
+
+    assert event.before is None
+    assert client.state.message_cache.get(10, 101) is None
@@ -0,0 +1,71 @@
+from collections import deque
+
+from disco.gateway.scheduler import GatewaySendScheduler
+from disco.util import limiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def max_in_window(timestamps, window):
+    best = 0
+    recent = deque()
+    for ts in timestamps:
+        recent.append(ts)
+        while ts - recent[0] >= window:
+            recent.popleft()
+        best = max(best, len(recent))
+    return best
+
+
+def saturate(clock, scheduler, duration):
+    """
+    Sends as fast as the scheduler allows, polling every 10ms, plus a heartbeat
+    every 41.25s. Returns the times of all sends and those of queued sends.
+    """
+    sent, queued = [], []
+    end = clock.now + duration
+    next_heartbeat = clock.now
+    while clock.now < end:
+        if clock.now >= next_heartbeat:
+            scheduler.budget.acquire()
+            sent.append(clock.now)
+            next_heartbeat += 41.25
+        while scheduler.try_acquire():
+            sent.append(clock.now)
+            queued.append(clock.now)
+        clock.now += 0.01
+    return sent, queued
+
+
+def test_send_budget_holds_in_every_sliding_window(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(limiter, 'time', clock)
+
+    scheduler = GatewaySendScheduler(lambda op, data: None, limit=120, per=60, reserved=5)
+    sent, queued = saturate(clock, scheduler, 300)
+
+    assert max_in_window(sent, 60) <= 120
+    # The queued lanes can burst through their whole share at once
+    assert queued[114] == queued[0]
+
+
+def test_sustained_send_rate_uses_the_unreserved_budget(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(limiter, 'time', clock)
+
+    scheduler = GatewaySendScheduler(lambda op, data: None, limit=120, per=60, reserved=5)
+    start = clock.now
+    sent, queued = saturate(clock, scheduler, 600)
+
+    # Every 60s window after the first burst carries the full 120 - 5 queued sends
+    for minute in range(1, 9):
+        window = [ts for ts in queued if start + minute * 60 + 30 <= ts < start + minute * 60 + 90]
+        assert len(window) == 115
+    assert len(queued) >= 115 * 10
+    assert max_in_window(sent, 60) <= 120